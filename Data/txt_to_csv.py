@@ -1,8 +1,15 @@
+import html
 import pandas as pd
 import re
-from bs4 import BeautifulSoup
 from pathlib import Path
 
+# Compiled once; reused by the scalar helpers and the vectorized path.
+# HTML in Anki cards is shallow, so a tag regex stands in for a full parser.
+_SOUND_RE = re.compile(r"\[sound:[^\]]+\]")
+_TAG_RE = re.compile(r"<[^>]+>")
+_WS_RE = re.compile(r"\s+")
+_CJK_RE = re.compile(r"[一-龯，。！？、；：“”‘’（）…—]+")
+
 
 def clean_html(text: str) -> str:
     """Remove HTML, sound tags, and extra whitespace."""
@@ -10,14 +17,13 @@ def clean_html(text: str) -> str:
         return ""
 
     # Remove [sound:...] tags
-    text = re.sub(r"\[sound:[^\]]+\]", "", text)
+    text = _SOUND_RE.sub("", text)
 
-    # Parse HTML
-    soup = BeautifulSoup(text, "html.parser")
-    text = soup.get_text(separator=" ")
+    # Strip tags + decode entities
+    text = html.unescape(_TAG_RE.sub(" ", text))
 
     # Normalize whitespace
-    text = re.sub(r"\s+", " ", text).strip()
+    text = _WS_RE.sub(" ", text).strip()
 
     return text
 
@@ -27,39 +33,56 @@ def extract_chinese_sentence(text: str) -> str:
     Extract the first Chinese sentence.
     Assumes Chinese appears before pinyin / English.
     """
-    # Keep only CJK + punctuation
-    matches = re.findall(r"[一-龯，。！？、；：“”‘’（）…—]+", text)
-    if matches:
-        return matches[0].strip()
-    return ""
+    # First run of CJK + punctuation; search stops there instead of collecting all runs
+    m = _CJK_RE.search(text)
+    return m.group(0).strip() if m else ""
+
+
+CHUNK_ROWS = 50_000
+
+
+def extract_chunk(df: pd.DataFrame) -> pd.Series:
+    """Vectorized clean + first Chinese run for one chunk of cards."""
+    # Column-level string ops instead of a per-row loop
+    combined = df["front"].fillna("").astype(str) + " " + df["back"].fillna("").astype(str)
+    combined = combined.str.replace(_SOUND_RE, "", regex=True)
+    combined = combined.str.replace(_TAG_RE, " ", regex=True).map(html.unescape)
+    combined = combined.str.replace(_WS_RE, " ", regex=True).str.strip()
 
+    # First Chinese run (CJK + punctuation) per card
+    zh = combined.str.extract(f"({_CJK_RE.pattern})", expand=False).fillna("").str.strip()
+    return zh[zh != ""]
 
-def txt_to_csv(txt_path, csv_path):
+
+def txt_to_csv(txt_path, csv_path, chunksize: int = CHUNK_ROWS):
     txt_path = Path(txt_path)
     csv_path = Path(csv_path)
 
-    # Read tab-separated file
-    df = pd.read_csv(
+    # Read tab-separated file in chunks so large exports stay bounded in memory
+    reader = pd.read_csv(
         txt_path,
         sep="\t",
         header=None,
         names=["front", "back"],
         encoding="utf-8",
+        chunksize=chunksize,
     )
 
-    records = []
-    for _, row in df.iterrows():
-        combined = f"{row['front']} {row['back']}"
-        cleaned = clean_html(combined)
-        zh = extract_chinese_sentence(cleaned)
-
-        if zh:
-            records.append({"sentence_zh": zh})
-
-    out = pd.DataFrame(records).drop_duplicates()
-    out.to_csv(csv_path, index=False, encoding="utf-8")
-
-    print(f"✅ Extracted {len(out)} Chinese sentences → {csv_path}")
+    # De-dup across chunks with a running set; rows are written as they come
+    seen = set()
+    n_out = 0
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        pd.DataFrame(columns=["sentence_zh"]).to_csv(f, index=False)
+        for chunk in reader:
+            zh = extract_chunk(chunk).drop_duplicates()
+            new = zh[~zh.isin(seen)]
+            if new.empty:
+                continue
+            seen.update(new)
+            n_out += len(new)
+            new.to_frame("sentence_zh").to_csv(f, index=False, header=False)
+
+    print(f"✅ Extracted {n_out} Chinese sentences → {csv_path}")
 
 
 if __name__ == "__main__":
@@ -56,6 +56,10 @@ Notes
 -----
 - Corpus should be one sentence per line (or at least one "unit" per line).
 - Tokenization uses jieba if available, otherwise it falls back to character-level tokens.
+- --matcher aho skips segmentation: candidates are found with an Aho-Corasick automaton
+  (pyahocorasick) and neighbor entropy is computed over adjacent characters.
+- Tokenization runs in --workers processes over byte ranges of the corpus (default: all CPUs);
+  per-anchor partial stats are merged in the parent.
 """
 
 from __future__ import annotations
@@ -63,12 +67,23 @@ from __future__ import annotations
 import argparse
 import json
 import math
+import mmap
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from array import array
 from collections import Counter, defaultdict
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+try:
+    import orjson  # type: ignore
+except Exception:  # optional speedup; stdlib json is the fallback
+    orjson = None
 
 
 def try_import_jieba():
@@ -79,17 +94,38 @@ def try_import_jieba():
         return None
 
 
-def entropy(counts: Counter[str]) -> float:
-    """Shannon entropy in nats (natural log)."""
-    total = sum(counts.values())
+def try_import_ahocorasick():
+    try:
+        import ahocorasick  # type: ignore
+        return ahocorasick
+    except Exception:
+        return None
+
+
+def build_automaton(candidates: Sequence[str]):
+    """Automaton over `candidates`; each match yields (anchor_id, len)."""
+    ac = try_import_ahocorasick()
+    if ac is None:
+        raise RuntimeError("--matcher aho requires pyahocorasick (pip install pyahocorasick)")
+    A = ac.Automaton()
+    for i, c in enumerate(candidates):
+        A.add_word(c, (i, len(c)))
+    A.make_automaton()
+    return A
+
+
+def entropy(counts: np.ndarray) -> float:
+    """Shannon entropy in nats (natural log) of a count vector."""
+    counts = counts[counts > 0]
+    total = counts.sum()
     if total <= 0:
         return 0.0
-    h = 0.0
-    for c in counts.values():
-        p = c / total
-        if p > 0:
-            h -= p * math.log(p)
-    return h
+    p = counts / total
+    return float(-(p * np.log(p)).sum())
+
+
+def counter_entropy(c: Counter[str]) -> float:
+    return entropy(np.fromiter(c.values(), dtype=np.int64, count=len(c)))
 
 
 def load_candidates(path: Path) -> List[str]:
@@ -101,8 +137,11 @@ def load_candidates(path: Path) -> List[str]:
     raise ValueError(f"Unrecognized candidate format: {path}")
 
 
+READ_BUFFER = 1 << 20  # 1 MiB reads for multi-GB corpora
+
+
 def iter_corpus_lines(path: Path, limit: Optional[int] = None) -> Iterable[str]:
-    with path.open("r", encoding="utf-8") as f:
+    with path.open("r", encoding="utf-8", buffering=READ_BUFFER) as f:
         for i, line in enumerate(f):
             if limit is not None and i >= limit:
                 break
@@ -112,26 +151,185 @@ def iter_corpus_lines(path: Path, limit: Optional[int] = None) -> Iterable[str]:
             yield s
 
 
-def tokenize_sentence(text: str, jieba_mod) -> List[str]:
+def iter_corpus_range(path: Path, start: int, end: int) -> Iterable[str]:
+    """
+    Yield stripped, non-empty lines whose first byte lies in [start, end).
+    Byte ranges let workers split one file without coordinating.
+    """
+    with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        size = len(mm)
+        pos = start
+        if start > 0:
+            # finish the line that straddles `start`
+            nl = mm.find(b"\n", start - 1)
+            pos = size if nl < 0 else nl + 1
+        while pos < end:
+            nl = mm.find(b"\n", pos)
+            stop = size if nl < 0 else nl
+            s = mm[pos:stop].decode("utf-8").strip()
+            pos = stop + 1
+            if s:
+                yield s
+
+
+def byte_ranges(path: Path, n: int) -> List[Tuple[int, int]]:
+    size = path.stat().st_size
+    if size <= 0:
+        return []
+    step = max(1, -(-size // max(1, n)))
+    return [(lo, min(size, lo + step)) for lo in range(0, size, step)]
+
+
+def iter_tokens(text: str, jieba_mod, hmm: bool = True) -> Iterator[str]:
+    """Yield non-empty tokens lazily (no per-sentence token list)."""
     if jieba_mod is not None:
         # precise mode is fine for this statistical scoring
-        return [t.strip() for t in jieba_mod.lcut(text) if t.strip()]
+        for t in jieba_mod.cut(text, HMM=hmm):
+            t = t.strip()
+            if t:
+                yield t
+        return
     # fallback: char tokens
-    return [ch for ch in text if not ch.isspace()]
+    for ch in text:
+        if not ch.isspace():
+            yield ch
 
 
 @dataclass
-class AnchorStats:
+class AnchorTotals:
+    """Mergeable per-anchor totals (string-keyed neighbor counts)."""
     df: int = 0
     tf: int = 0
-    left: Counter[str] = None  # type: ignore
-    right: Counter[str] = None  # type: ignore
+    left: Counter[str] = field(default_factory=Counter)
+    right: Counter[str] = field(default_factory=Counter)
+
+    def merge(self, other: "AnchorTotals") -> None:
+        self.df += other.df
+        self.tf += other.tf
+        self.left.update(other.left)
+        self.right.update(other.right)
+
+
+def _neighbor_counter(ids: array, id2tok: List[str]) -> Counter[str]:
+    if len(ids) == 0:
+        return Counter()
+    counts = np.bincount(np.frombuffer(ids, dtype=np.intc))
+    nz = np.flatnonzero(counts)
+    return Counter({id2tok[i]: int(counts[i]) for i in nz})
+
+
+def scan_sentences(
+    sentences: Iterable[str],
+    candidates: Sequence[str],
+    jieba_mod,
+    hmm: bool = True,
+    automaton=None,
+) -> Tuple[int, Dict[str, AnchorTotals]]:
+    """
+    One pass over `sentences`; returns (num_sentences, totals for anchors seen).
+
+    Accumulators are struct-of-arrays indexed by anchor id (position in
+    `candidates`): flat df/tf int lists plus one append-only neighbor-id
+    buffer per anchor.
+
+    With an Aho-Corasick `automaton` (see build_automaton), candidates are
+    matched directly in the raw string (no segmentation): every occurrence
+    counts, and neighbors are the characters just before/after the match.
+    """
+    n_cand = len(candidates)
+    anchor_id = {c: i for i, c in enumerate(candidates)}
+    df = [0] * n_cand
+    tf = [0] * n_cand
+    left_ids = [array("i") for _ in range(n_cand)]
+    right_ids = [array("i") for _ in range(n_cand)]
+    num_sentences = 0
 
-    def __post_init__(self):
-        if self.left is None:
-            self.left = Counter()
-        if self.right is None:
-            self.right = Counter()
+    aid_of = anchor_id.get
+
+    # Neighbor tokens are int-encoded once; counts come from a bincount per anchor.
+    tok2id: Dict[str, int] = {"<BOS>": 0, "<EOS>": 1}
+    tok_id = tok2id.setdefault
+    n_tok = tok2id.__len__
+    BOS_ID, EOS_ID = 0, 1
+
+    if automaton is not None:
+        # One linear scan per sentence; overlapping matches all count.
+        for sent in sentences:
+            num_sentences += 1
+            seen_aids: Set[int] = set()
+            n = len(sent)
+            for end, (aid, alen) in automaton.iter(sent):
+                start = end - alen + 1
+                tf[aid] += 1
+                left_ids[aid].append(tok_id(sent[start - 1], n_tok()) if start > 0 else BOS_ID)
+                right_ids[aid].append(tok_id(sent[end + 1], n_tok()) if end + 1 < n else EOS_ID)
+                seen_aids.add(aid)
+            for aid in seen_aids:
+                df[aid] += 1
+    else:
+        # Sentinel-padded token list: the (prev, cur, nxt) window needs no
+        # bounds checks, and <BOS>/<EOS> already map to their reserved ids.
+        for sent in sentences:
+            num_sentences += 1
+            seen_aids = set()
+            toks = ["<BOS>", *iter_tokens(sent, jieba_mod, hmm=hmm), "<EOS>"]
+            for prev, cur, nxt in zip(toks, toks[1:], toks[2:]):
+                aid = aid_of(cur)
+                if aid is None:
+                    continue
+                tf[aid] += 1
+                left_ids[aid].append(tok_id(prev, n_tok()))
+                right_ids[aid].append(tok_id(nxt, n_tok()))
+                seen_aids.add(aid)
+            for aid in seen_aids:
+                df[aid] += 1
+
+    id2tok = list(tok2id)
+    totals = {
+        candidates[aid]: AnchorTotals(
+            df=df[aid],
+            tf=tf[aid],
+            left=_neighbor_counter(left_ids[aid], id2tok),
+            right=_neighbor_counter(right_ids[aid], id2tok),
+        )
+        for aid in range(n_cand)
+        if tf[aid]
+    }
+    return num_sentences, totals
+
+
+# Per-worker state, set once by the pool initializer.
+_W_CAND: List[str] = []
+_W_JIEBA = None
+_W_HMM = True
+_W_AUTOMATON = None
+
+
+def _init_worker(candidates: List[str], hmm: bool, matcher: str) -> None:
+    global _W_CAND, _W_JIEBA, _W_HMM, _W_AUTOMATON
+    _W_CAND = candidates
+    _W_JIEBA = try_import_jieba() if matcher == "jieba" else None
+    _W_HMM = hmm
+    _W_AUTOMATON = build_automaton(candidates) if matcher == "aho" else None
+
+
+def _scan_range(job: Tuple[str, int, int]) -> Tuple[int, Dict[str, AnchorTotals]]:
+    path, start, end = job
+    return scan_sentences(
+        iter_corpus_range(Path(path), start, end), _W_CAND, _W_JIEBA, _W_HMM, automaton=_W_AUTOMATON
+    )
+
+
+def merge_partials(
+    stats: Dict[str, AnchorTotals],
+    parts: Iterable[Tuple[int, Dict[str, AnchorTotals]]],
+) -> int:
+    num_sentences = 0
+    for n, part in parts:
+        num_sentences += n
+        for a, t in part.items():
+            stats[a].merge(t)
+    return num_sentences
 
 
 def main() -> None:
@@ -146,6 +344,11 @@ def main() -> None:
     ap.add_argument("--min-entropy", type=float, default=1.8, help="Minimum neighbor entropy (default: 1.8 nats)")
     ap.add_argument("--limit-lines", type=int, default=0, help="Debug: only read first N lines (0 = all)")
     ap.add_argument("--no-stats", action="store_true", help="If set, omit per-anchor stats in output JSON")
+    ap.add_argument("--no-hmm", action="store_true", help="Disable jieba HMM for new words (faster, slightly different segmentation)")
+    ap.add_argument("--matcher", choices=["jieba", "aho"], default="jieba",
+                    help="jieba: segment then count tokens (default). aho: Aho-Corasick substring matching "
+                         "of candidates with character neighbors (much faster; needs pyahocorasick)")
+    ap.add_argument("--workers", type=int, default=0, help="Tokenizer processes (0 = all CPUs, 1 = in-process)")
     args = ap.parse_args()
 
     cand_path = Path(args.candidates)
@@ -164,33 +367,30 @@ def main() -> None:
     # length filter early
     candidates = [c for c in candidates if len(c) <= args.max_len]
 
-    cand_set = set(candidates)
-    stats: Dict[str, AnchorStats] = {c: AnchorStats() for c in candidates}
+    stats: Dict[str, AnchorTotals] = {c: AnchorTotals() for c in candidates}
 
-    jieba_mod = try_import_jieba()
-    if jieba_mod is None:
-        print("⚠️  jieba not available; falling back to character tokenization", file=sys.stderr)
+    automaton = build_automaton(candidates) if args.matcher == "aho" else None
+    jieba_mod = None
+    if automaton is None:
+        jieba_mod = try_import_jieba()
+        if jieba_mod is None:
+            print("⚠️  jieba not available; falling back to character tokenization", file=sys.stderr)
 
     limit = None if args.limit_lines == 0 else args.limit_lines
-    num_sentences = 0
-
-    for sent in iter_corpus_lines(corpus_path, limit=limit):
-        num_sentences += 1
-        toks = tokenize_sentence(sent, jieba_mod)
-        present = set(toks) & cand_set
-        for a in present:
-            stats[a].df += 1
-
-        # TF + neighbor context
-        for i, t in enumerate(toks):
-            if t not in cand_set:
-                continue
-            st = stats[t]
-            st.tf += 1
-            left_tok = toks[i - 1] if i - 1 >= 0 else "<BOS>"
-            right_tok = toks[i + 1] if i + 1 < len(toks) else "<EOS>"
-            st.left[left_tok] += 1
-            st.right[right_tok] += 1
+    hmm = not args.no_hmm
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+
+    if workers == 1 or limit is not None:
+        # --limit-lines counts raw lines from the top, so it stays in-process
+        part = scan_sentences(
+            iter_corpus_lines(corpus_path, limit=limit), candidates, jieba_mod, hmm=hmm, automaton=automaton
+        )
+        num_sentences = merge_partials(stats, [part])
+    else:
+        # Several ranges per worker so uneven chunks still balance out
+        jobs = [(str(corpus_path), lo, hi) for lo, hi in byte_ranges(corpus_path, workers * 4)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(candidates, hmm, args.matcher)) as pool:
+            num_sentences = merge_partials(stats, pool.map(_scan_range, jobs))
 
     if num_sentences == 0:
         raise ValueError("Corpus appears empty after stripping lines.")
@@ -198,8 +398,8 @@ def main() -> None:
     scored: List[Tuple[str, float, Dict[str, float]]] = []
     for a, st in stats.items():
         df_rate = st.df / num_sentences
-        H_l = entropy(st.left)
-        H_r = entropy(st.right)
+        H_l = counter_entropy(st.left)
+        H_r = counter_entropy(st.right)
         H_lr = 0.5 * (H_l + H_r)
 
         # A conservative, tunable score:
@@ -250,18 +450,20 @@ def main() -> None:
                 "min_df_rate": args.min_df_rate,
                 "min_entropy": args.min_entropy,
             },
-            "tokenizer": "jieba" if jieba_mod is not None else "char_fallback",
+            "tokenizer": "aho_corasick" if automaton is not None else ("jieba" if jieba_mod is not None else "char_fallback"),
+            "jieba_hmm": hmm,
+            "workers": workers,
         },
     }
 
     if not args.no_stats:
-        out_stats: Dict[str, Dict[str, float]] = {}
-        for a, score, aux in kept:
-            out_stats[a] = {k: float(v) for k, v in aux.items()}
-        out["stats"] = out_stats
+        out["stats"] = {a: aux for a, _, aux in kept}
 
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
+    if orjson is not None:
+        out_path.write_bytes(orjson.dumps(out, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        out_path.write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
 
     print(f"✅ Wrote: {out_path}")
     print(f"   corpus sentences: {num_sentences}")
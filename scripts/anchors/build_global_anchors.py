@@ -25,31 +25,65 @@ from __future__ import annotations
 
 import argparse
 import json
-import re
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set, Tuple
-
-LEVEL_RE = re.compile(r"^(new|old)-(\d+)$")
-
-
-def parse_level(level_list: List[str]) -> Optional[int]:
-    new_levels: List[int] = []
-    old_levels: List[int] = []
-    for s in level_list or []:
-        m = LEVEL_RE.match(str(s).strip())
-        if not m:
-            continue
-        scheme, num = m.group(1), int(m.group(2))
-        if scheme == "new":
-            new_levels.append(num)
-        else:
-            old_levels.append(num)
-
-    if new_levels:
-        return min(new_levels)
-    if old_levels:
-        return min(old_levels)
-    return None
+from typing import Any, Dict, List, Set, Tuple
+
+import pandas as pd
+
+try:
+    import orjson  # type: ignore
+except Exception:  # optional speedup; stdlib json is the fallback
+    orjson = None
+
+def _freq_rank(freq_raw: Any) -> int:
+    # frequency is a rank-like number in your JSON; smaller usually = more frequent
+    try:
+        return int(freq_raw)
+    except Exception:
+        return 10**9
+
+
+def _as_list(x: Any) -> list:
+    return x if isinstance(x, list) else []
+
+
+def select_candidates(
+    data: List[Any],
+    wanted_pos: Set[str],
+    max_len: int,
+    min_level: int,
+    max_level: int,
+) -> pd.DataFrame:
+    """
+    Filter HSK entries down to anchor candidates with column-level ops.
+
+    Returns a frame with columns (word, freq), de-duplicated by word
+    (first occurrence wins), in input order.
+    """
+    entries = [e for e in data if isinstance(e, dict)]
+    df = pd.DataFrame.from_records(entries, columns=["simplified", "level", "pos", "frequency"])
+
+    df["word"] = df["simplified"].where(df["simplified"].notna() & (df["simplified"] != ""), "").astype(str).str.strip()
+    df = df[(df["word"] != "") & (df["word"].str.len() <= max_len)]
+
+    # level: smallest "new-N", else smallest "old-N"; unparseable -> no level (kept)
+    lv = df["level"].map(_as_list).explode().dropna().astype(str).str.strip().str.partition("-")
+    # (an empty Series partitions into a frame with no columns)
+    lv = lv.reindex(columns=[0, 1, 2], fill_value="").astype(str)
+    lv.columns = ["scheme", "sep", "num"]
+    lv = lv[lv["scheme"].isin(("new", "old")) & (lv["sep"] == "-") & lv["num"].str.isdecimal()]
+    lv["num"] = lv["num"].astype(int)
+    new_min = lv.loc[lv["scheme"] == "new", "num"].groupby(level=0).min()
+    old_min = lv.loc[lv["scheme"] == "old", "num"].groupby(level=0).min()
+    level = new_min.reindex(df.index).fillna(old_min.reindex(df.index))
+    in_range = level.isna() | level.between(min_level, max_level)
+
+    # pos: at least one wanted tag (one C-level set op per row)
+    wants_none_of = wanted_pos.isdisjoint
+    pos_ok = df["pos"].map(lambda x: isinstance(x, list) and not wants_none_of(map(str, x))).astype(bool)
+
+    df = df[in_range & pos_ok].drop_duplicates("word", keep="first")
+    return pd.DataFrame({"word": df["word"], "freq": df["frequency"].map(_freq_rank)})
 
 
 def main() -> None:
@@ -75,54 +109,33 @@ def main() -> None:
     wanted_pos = {p.strip() for p in args.pos.split(",") if p.strip()}
     max_len = args.max_len
 
-    data = json.loads(json_path.read_text(encoding="utf-8"))
+    raw = json_path.read_bytes()
+    data = orjson.loads(raw) if orjson is not None else json.loads(raw.decode("utf-8"))
     if not isinstance(data, list):
         raise ValueError("Expected JSON root to be a list of entries.")
 
-    anchors: List[Tuple[str, int]] = []  # (word, frequency_rank_or_big)
-    seen: Set[str] = set()
-
-    for e in data:
-        if not isinstance(e, dict):
-            continue
-
-        word = str(e.get("simplified") or "").strip()
-        if not word:
-            continue
-        if len(word) > max_len:
-            continue
-
-        lvl = parse_level(list(e.get("level") or []))
-        if lvl is not None:
-            if lvl < args.min_level or lvl > args.max_level:
-                continue
-
-        pos_list = e.get("pos") or []
-        if not isinstance(pos_list, list) or not pos_list:
-            continue
-
-        if not any(str(p) in wanted_pos for p in pos_list):
-            continue
-
-        # frequency is a rank-like number in your JSON; smaller usually = more frequent
-        freq_raw = e.get("frequency")
-        try:
-            freq = int(freq_raw)
-        except Exception:
-            freq = 10**9
-
-        if word not in seen:
-            anchors.append((word, freq))
-            seen.add(word)
+    cands = select_candidates(
+        data,
+        wanted_pos=wanted_pos,
+        max_len=max_len,
+        min_level=args.min_level,
+        max_level=args.max_level,
+    )
 
     if args.sort_by == "frequency":
-        anchors.sort(key=lambda x: x[1])  # smaller freq rank first
+        cands = cands.sort_values("freq", kind="stable")  # smaller freq rank first
     else:
-        anchors.sort(key=lambda x: x[0])
+        cands = cands.sort_values("word", kind="stable")
+
+    anchors: List[Tuple[str, int]] = list(zip(cands["word"].tolist(), cands["freq"].tolist()))
 
     out_path = Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_text(json.dumps({"anchors": [w for w, _ in anchors]}, ensure_ascii=False, indent=2), encoding="utf-8")
+    payload = {"anchors": [w for w, _ in anchors]}
+    if orjson is not None:
+        out_path.write_bytes(orjson.dumps(payload, option=orjson.OPT_INDENT_2))
+    else:
+        out_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
 
     print(f"✅ Wrote: {out_path}")
     print(f"   anchors: {len(anchors)}")
@@ -24,16 +24,25 @@ from __future__ import annotations
 import argparse
 import json
 import os
-import re
 import sqlite3
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
-LEVEL_RE = re.compile(r"^(new|old)-(\d+)$")
+try:
+    import orjson  # type: ignore
+except Exception:  # optional speedup; stdlib json is the fallback
+    orjson = None
 
+try:
+    import ijson  # type: ignore
+except Exception:  # optional: true streaming parse of the entry list
+    ijson = None
 
 DDL = """
 PRAGMA journal_mode=WAL;
+PRAGMA synchronous=OFF;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-200000;
 
 DROP TABLE IF EXISTS chinese_words;
 
@@ -46,11 +55,21 @@ CREATE TABLE chinese_words (
   pos          TEXT,
   traditional  TEXT
 );
+"""
 
+# Secondary indexes are built once after the bulk insert (not maintained per row).
+INDEX_DDL = """
 CREATE INDEX idx_chinese_words_level ON chinese_words(level);
 CREATE INDEX idx_chinese_words_frequency ON chinese_words(frequency);
 """
 
+INSERT_SQL = """
+INSERT INTO chinese_words(simplified, level, frequency, pinyin, meanings, pos, traditional)
+VALUES(?,?,?,?,?,?,?)
+"""
+
+HSKRow = Tuple[str, Optional[int], Optional[int], Optional[str], Optional[str], Optional[str], Optional[str]]
+
 
 def parse_level(level_list: List[str]) -> Optional[int]:
     """
@@ -62,14 +81,14 @@ def parse_level(level_list: List[str]) -> Optional[int]:
     new_levels: List[int] = []
     old_levels: List[int] = []
     for s in level_list or []:
-        m = LEVEL_RE.match(str(s).strip())
-        if not m:
+        # "<scheme>-<N>": partition is cheaper than a regex match per string
+        scheme, sep, num = str(s).strip().partition("-")
+        if not sep or not num.isdecimal():
             continue
-        scheme, num = m.group(1), int(m.group(2))
         if scheme == "new":
-            new_levels.append(num)
-        else:
-            old_levels.append(num)
+            new_levels.append(int(num))
+        elif scheme == "old":
+            old_levels.append(int(num))
 
     if new_levels:
         return min(new_levels)
@@ -79,17 +98,11 @@ def parse_level(level_list: List[str]) -> Optional[int]:
 
 
 def uniq_join(items: Iterable[str], sep: str = "; ") -> Optional[str]:
-    out: List[str] = []
-    seen = set()
-    for x in items:
-        x = (x or "").strip()
-        if not x or x in seen:
-            continue
-        seen.add(x)
-        out.append(x)
-    if not out:
+    # dict.fromkeys: order-preserving de-dup in one pass
+    parts = dict.fromkeys(filter(None, ((x or "").strip() for x in items)))
+    if not parts:
         return None
-    return sep.join(out)
+    return sep.join(parts)
 
 
 def extract_forms(entry: Dict[str, Any]) -> Tuple[Optional[str], Optional[str], Optional[str]]:
@@ -121,13 +134,34 @@ def extract_forms(entry: Dict[str, Any]) -> Tuple[Optional[str], Optional[str],
     )
 
 
-def build_rows(json_path: Path) -> List[Tuple[str, Optional[int], Optional[int], Optional[str], Optional[str], Optional[str], Optional[str]]]:
-    data = json.loads(json_path.read_text(encoding="utf-8"))
+def iter_entries(json_path: Path) -> Iterator[Any]:
+    """
+    Yield top-level entries of complete_hsk.json.
+    Streams with ijson when installed (O(1) entries in memory),
+    else parses the whole file with orjson (or stdlib json).
+    """
+    if ijson is not None:
+        with json_path.open("rb") as f:
+            head = f.read(64).lstrip(b"\xef\xbb\xbf \t\r\n")
+            if not head.startswith(b"["):
+                raise ValueError("Expected JSON root to be a list of entries.")
+            f.seek(0)
+            yield from ijson.items(f, "item", use_float=True)
+        return
+
+    raw = json_path.read_bytes()
+    data = orjson.loads(raw) if orjson is not None else json.loads(raw.decode("utf-8"))
     if not isinstance(data, list):
         raise ValueError("Expected JSON root to be a list of entries.")
+    yield from data
+
 
-    rows: List[Tuple[str, Optional[int], Optional[int], Optional[str], Optional[str], Optional[str], Optional[str]]] = []
-    for e in data:
+def build_rows(json_path: Path) -> Iterator[HSKRow]:
+    """
+    Yield one chinese_words row per usable JSON entry.
+    Feeds executemany directly so rows are never materialized as a list.
+    """
+    for e in iter_entries(json_path):
         if not isinstance(e, dict):
             continue
         simp = str(e.get("simplified") or "").strip()
@@ -145,9 +179,7 @@ def build_rows(json_path: Path) -> List[Tuple[str, Optional[int], Optional[int],
 
         traditional, pinyin, meanings = extract_forms(e)
 
-        rows.append((simp, level, freq, pinyin, meanings, pos, traditional))
-
-    return rows
+        yield (simp, level, freq, pinyin, meanings, pos, traditional)
 
 
 def main() -> None:
@@ -165,24 +197,25 @@ def main() -> None:
     if out_path.exists():
         out_path.unlink()
 
-    rows = build_rows(json_path)
-
-    conn = sqlite3.connect(str(out_path))
+    # Autocommit mode: the driver issues no implicit BEGINs, so the bulk load
+    # is exactly one transaction that we open and close ourselves.
+    conn = sqlite3.connect(str(out_path), isolation_level=None)
     try:
         conn.executescript(DDL)
-        conn.executemany(
-            """
-            INSERT INTO chinese_words(simplified, level, frequency, pinyin, meanings, pos, traditional)
-            VALUES(?,?,?,?,?,?,?)
-            """,
-            rows,
-        )
-        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cur = conn.executemany(INSERT_SQL, build_rows(json_path))
+            inserted = cur.rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.executescript(INDEX_DDL)
     finally:
         conn.close()
 
     print(f"✅ Built DB: {out_path}")
-    print(f"   rows inserted: {len(rows)}")
+    print(f"   rows inserted: {inserted}")
     print("   table: chinese_words (simplified, level, frequency, pinyin, meanings, pos, traditional)")
 
 
@@ -12,10 +12,12 @@ Output:
   - SQLite DB: data/chinese_prior.db
 
 Stores:
-  - pattern_global_stats(pattern_key, family, count_sentences, count_occurrences, distinct_realization_count, p_global)
+  - pattern_global_stats(pkey_hash, pattern_key, family, count_sentences, count_occurrences,
+                         distinct_realization_count, p_global)
+      * pkey_hash = signed 64-bit BLAKE2b of pattern_key (INTEGER PRIMARY KEY)
       * distinct_realization_count is "distinct realizations observed up to cap"
-  - pattern_global_realizations(pattern_key, realization)
-      * capped per pattern for size control
+  - pattern_global_realizations(pkey_hash, realization)
+      * capped per pattern for size control; look up by pattern_key_hash(pattern_key)
   - meta: config + provenance
 
 Usage example:
@@ -29,40 +31,147 @@ Usage example:
     --add-anchor-skip3 0 \
     --cap-realizations-per-pattern 30 \
     --commit-every 5000
+
+  Add --exclusive to hold an exclusive DB lock for the build (faster, but no
+  concurrent readers).
 """
 
 from __future__ import annotations
 
 import argparse
 import json
+import os
+import sys
 import time
-from collections import Counter
+from collections import Counter, deque
+from functools import lru_cache
+from itertools import chain, islice
+from multiprocessing import Pool
 from pathlib import Path
-from typing import Dict, Optional, Set
-
-from zh_sentence_learning_pipeline.grammar.tokenize import tokenize_words_jieba
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+  import orjson  # type: ignore
+except Exception:  # optional speedup; stdlib json is the fallback
+  orjson = None
+
+from zh_sentence_learning_pipeline.grammar.tokenize import (
+  tokenize_words_jieba,
+  use_jieba_backend,
+  use_jieba_fast,
+  use_rjieba,
+)
 from zh_sentence_learning_pipeline.grammar.patterns import extract_patterns_from_tokens
 from zh_sentence_learning_pipeline.grammar.pattern_key import family_from_key
-from zh_sentence_learning_pipeline.store.prior_db import connect, init_prior_db
+from zh_sentence_learning_pipeline.store.prior_db import (
+  INDEX_DDL,
+  connect,
+  drop_secondary_indexes,
+  init_prior_db,
+  pattern_key_hash,
+  tune_for_bulk_build,
+)
+
+
+REALIZATION_ROWS_PER_INSERT = 499  # 2 params per row; old SQLite caps a statement at 999
+READ_CHUNK = 1 << 20  # corpus is read as 1 MiB binary blocks
 
+# Pattern keys recur across flushes; memoize (hash, family) (sized to avoid eviction).
+@lru_cache(maxsize=1 << 20)
+def _key_cols(pkey: str) -> Tuple[int, str]:
+  return pattern_key_hash(pkey), family_from_key(pkey)
 
-def load_anchors(path: str | Path) -> Set[str]:
+
+def load_anchors(path: str | Path) -> FrozenSet[str]:
   p = Path(path)
   if not p.exists():
     raise FileNotFoundError(f"Anchors file not found: {p}")
-  data = json.loads(p.read_text(encoding="utf-8"))
+  raw = p.read_bytes()
+  data = orjson.loads(raw) if orjson is not None else json.loads(raw.decode("utf-8"))
   if isinstance(data, dict) and "anchors" in data:
     arr = data["anchors"]
   else:
     arr = data
   if not isinstance(arr, list) or not arr:
     raise ValueError(f"Invalid anchors JSON in {p}. Expected {{'anchors':[...]}}, or a raw list.")
-  out = {str(x).strip() for x in arr if str(x).strip()}
+  # Frozen + interned: read-only membership set for the extractor hot path.
+  out = frozenset(sys.intern(a) for a in (str(x).strip() for x in arr) if a)
   if not out:
     raise ValueError(f"Anchors JSON produced empty set: {p}")
   return out
 
 
+def iter_corpus_lines(path: Path) -> Iterator[str]:
+  """
+  Lines of a UTF-8 corpus, read as binary blocks and split on b"\n"
+  (skips the TextIOWrapper decoder). Undecodable bytes become U+FFFD.
+  """
+  tail = b""
+  with path.open("rb", buffering=READ_CHUNK) as f:
+    while True:
+      block = f.read(READ_CHUNK)
+      if not block:
+        break
+      lines = (tail + block).split(b"\n")
+      tail = lines.pop()
+      for raw in lines:
+        yield raw.decode("utf-8", "replace")
+  if tail:
+    yield tail.decode("utf-8", "replace")
+
+
+# Mixed corpora repeat sentences; cache segmentations (tuples: compact + immutable).
+@lru_cache(maxsize=200_000)
+def _tokenize_cached(s: str) -> Tuple[str, ...]:
+  return tuple(tokenize_words_jieba(s))
+
+
+def sentence_patterns(s: str, anchors: FrozenSet[str], extract_cfg: Dict[str, Any]) -> Optional[List[Tuple[str, str]]]:
+  """(pattern_key, realization) pairs for one sentence; None if it has no tokens."""
+  toks = _tokenize_cached(s)
+  if not toks:
+    return None
+  pats, _ = extract_patterns_from_tokens(list(toks), anchors=anchors, **extract_cfg)
+  return [(p.pattern_key, p.realization) for p in pats]
+
+
+# Per-worker state (set once by the pool initializer, shared via fork on Linux)
+_W_ANCHORS: FrozenSet[str] = frozenset()
+_W_CFG: Dict[str, Any] = {}
+
+
+def _init_worker(anchors: FrozenSet[str], extract_cfg: Dict[str, Any], jieba_backend: str) -> None:
+  global _W_ANCHORS, _W_CFG
+  _W_ANCHORS = anchors
+  _W_CFG = extract_cfg
+  # The segmenter choice is a module global: re-apply it (spawned workers start on plain jieba)
+  use_jieba_backend(jieba_backend)
+
+
+def _work(batch: List[str]) -> List[Optional[List[Tuple[str, str]]]]:
+  return [sentence_patterns(s, _W_ANCHORS, _W_CFG) for s in batch]
+
+
+def iter_chunks(it: Iterable[str], n: int) -> Iterator[List[str]]:
+  it = iter(it)
+  while True:
+    chunk = list(islice(it, n))
+    if not chunk:
+      return
+    yield chunk
+
+
+def imap_bounded(pool, fn, chunks: Iterable[List[str]], window: int) -> Iterator[Any]:
+  """Ordered pool.imap with at most `window` chunks in flight, so a fast reader can't queue the whole corpus."""
+  pending: deque = deque()
+  for chunk in chunks:
+    pending.append(pool.apply_async(fn, (chunk,)))
+    if len(pending) >= window:
+      yield pending.popleft().get()
+  while pending:
+    yield pending.popleft().get()
+
+
 def meta_put(conn, key: str, value: object) -> None:
   conn.execute("INSERT OR REPLACE INTO meta(key,value) VALUES(?,?)", (key, str(value)))
 
@@ -90,7 +199,34 @@ def main() -> None:
 
   ap.add_argument("--cap-realizations-per-pattern", type=int, default=9999)
   ap.add_argument("--commit-every", type=int, default=5000)
+  ap.add_argument(
+    "--max-batch-patterns",
+    type=int,
+    default=50_000,
+    help="Also flush once the batch holds this many distinct patterns (0 = sentence count only).",
+  )
+  ap.add_argument(
+    "--exclusive",
+    action="store_true",
+    help="Hold an exclusive SQLite lock for the whole build (no concurrent readers).",
+  )
   ap.add_argument("--max-lines", type=int, default=0, help="Debug: stop after N lines (0 = no limit)")
+  ap.add_argument(
+    "--jieba-fast",
+    action="store_true",
+    help="Segment with jieba_fast if installed (falls back to jieba with a warning).",
+  )
+  ap.add_argument(
+    "--rjieba",
+    action="store_true",
+    help="Segment with rjieba (Rust) if installed; takes precedence over --jieba-fast.",
+  )
+  ap.add_argument(
+    "--workers",
+    type=int,
+    default=0,
+    help="Tokenize/extract processes (0 = all CPUs, 1 = in-process). The DB writer stays single-threaded.",
+  )
   args = ap.parse_args()
 
   corpus_path = Path(args.corpus)
@@ -98,11 +234,30 @@ def main() -> None:
     raise FileNotFoundError(f"Corpus not found: {corpus_path}")
 
   anchors = load_anchors(args.anchors)
+  jieba_backend = "jieba"
+  if args.rjieba:
+    if use_rjieba():
+      jieba_backend = "rjieba"
+    else:
+      print("⚠️  rjieba not available; using " + ("jieba_fast/jieba" if args.jieba_fast else "jieba"), file=sys.stderr)
+  if args.jieba_fast and jieba_backend == "jieba":
+    if use_jieba_fast():
+      jieba_backend = "jieba_fast"
+    else:
+      print("⚠️  jieba_fast not available; using jieba", file=sys.stderr)
   out_path = Path(args.out)
   out_path.parent.mkdir(parents=True, exist_ok=True)
 
   conn = connect(out_path)
-  init_prior_db(conn)
+  tune_for_bulk_build(conn, exclusive=args.exclusive)
+  # Secondary indexes are built once over the final rows instead of maintained per UPSERT.
+  init_prior_db(conn, create_indexes=False)
+  drop_secondary_indexes(conn)
+  # Explicit transactions: commit-every windows are the only sync points.
+  conn.isolation_level = None
+  # Plain tuple rows: the build only reads a single aggregate, positionally.
+  conn.row_factory = None
+  conn.execute("BEGIN")
 
   # Store provenance + config
   meta_put(conn, "built_at_unix", int(time.time()))
@@ -127,6 +282,7 @@ def main() -> None:
 
   meta_put(conn, "cap_realizations_per_pattern", args.cap_realizations_per_pattern)
   conn.commit()
+  conn.execute("BEGIN")
 
   # Aggregation:
   # - counts can be flushed incrementally
@@ -138,25 +294,18 @@ def main() -> None:
   # value = None means "already full, stop tracking"
   realizations_cache: Dict[str, Optional[Set[str]]] = {}
   realization_count: Dict[str, int] = {}  # monotonic up to cap
+  pending_realizations: Dict[str, Dict[str, None]] = {}  # distinct candidates this batch
+  realization_inserts: List[Tuple[int, str]] = []  # rows to write this flush
 
   total_lines = 0
   kept_lines = 0
+  last_flush_line = 0
   t0 = time.time()
 
-  def ensure_row(pkey: str) -> None:
-    # Make sure a stats row exists so later UPSERT works smoothly.
-    conn.execute(
-      """
-      INSERT OR IGNORE INTO pattern_global_stats(
-        pattern_key, family, count_sentences, count_occurrences, distinct_realization_count, p_global
-      )
-      VALUES(?, ?, 0, 0, 0, 0.0)
-      """,
-      (pkey, family_from_key(pkey)),
-    )
+  cap = int(args.cap_realizations_per_pattern)
 
   def maybe_add_realization(pkey: str, realization: str) -> None:
-    cap = int(args.cap_realizations_per_pattern)
+    # Hot path: only collect distinct candidates for this batch; caps are applied at flush.
     if cap <= 0:
       return
 
@@ -166,110 +315,164 @@ def main() -> None:
     if box is None and pkey in realizations_cache:
       return
 
-    if box is None:
-      box = set()
-      realizations_cache[pkey] = box
-
-    if len(box) >= cap:
-      realizations_cache[pkey] = None
+    if box is not None and realization in box:
       return
 
-    if realization in box:
-      return
-
-    # Insert into DB (ignore duplicates)
-    conn.execute(
-      "INSERT OR IGNORE INTO pattern_global_realizations(pattern_key, realization) VALUES(?,?)",
-      (pkey, realization),
-    )
+    # Insertion-ordered (dict), so the cap keeps the first-seen realizations.
+    pend = pending_realizations.get(pkey)
+    if pend is None:
+      pending_realizations[pkey] = {realization: None}
+    elif len(pend) < cap - (len(box) if box is not None else 0):
+      pend[realization] = None
+
+  def apply_pending_realizations() -> None:
+    # One cap-aware pass per distinct (pkey, realization) pair seen this batch.
+    for pkey, pend in pending_realizations.items():
+      box = realizations_cache.get(pkey, None)
+      if box is None:
+        box = set()
+        realizations_cache[pkey] = box
+      h = _key_cols(pkey)[0]
+      for realization in pend:
+        if len(box) >= cap:
+          break
+        box.add(realization)
+        realization_inserts.append((h, realization))
+
+      realization_count[pkey] = min(cap, len(box))
+      if len(box) >= cap:
+        realizations_cache[pkey] = None
+    pending_realizations.clear()
 
-    # Track uniqueness only if it was new in our cache
-    box.add(realization)
-    realization_count[pkey] = min(cap, len(box))
+  def flush_counts() -> None:
+    apply_pending_realizations()
 
-    if len(box) >= cap:
-      realizations_cache[pkey] = None
+    # Multi-row VALUES lists, sized to stay under the bound-parameter limit.
+    for i in range(0, len(realization_inserts), REALIZATION_ROWS_PER_INSERT):
+      chunk = realization_inserts[i : i + REALIZATION_ROWS_PER_INSERT]
+      conn.execute(
+        "INSERT OR IGNORE INTO pattern_global_realizations(pkey_hash, realization) VALUES "
+        + ",".join(["(?,?)"] * len(chunk)),
+        [x for row in chunk for x in row],
+      )
+    realization_inserts.clear()
 
-  def flush_counts() -> None:
     if not count_occ_batch and not count_sent_batch:
       return
 
     keys = set(count_occ_batch.keys()) | set(count_sent_batch.keys())
 
-    # For speed: do stats inserts/updates in a tight loop.
+    upsert_rows = []
     for pkey in keys:
-      ensure_row(pkey)
-
-      occ = int(count_occ_batch.get(pkey, 0))
-      sent = int(count_sent_batch.get(pkey, 0))
-      div = int(realization_count.get(pkey, 0))
+      h, family = _key_cols(pkey)
+      upsert_rows.append(
+        (
+          h,
+          pkey,
+          family,
+          int(count_sent_batch.get(pkey, 0)),
+          int(count_occ_batch.get(pkey, 0)),
+          int(realization_count.get(pkey, 0)),
+        )
+      )
 
-      conn.execute(
-        """
-        UPDATE pattern_global_stats
-        SET count_occurrences = count_occurrences + ?,
-            count_sentences = count_sentences + ?,
-            distinct_realization_count = CASE
-              WHEN distinct_realization_count < ? THEN ? ELSE distinct_realization_count
-            END
-        WHERE pattern_key = ?
-        """,
-        (occ, sent, div, div, pkey),
+    # One UPSERT per pattern: new rows start from the batch counts, existing rows accumulate.
+    # Only a row with the same pattern_key accumulates; a different key with the same pkey_hash
+    # (a hash collision) changes nothing, which the change count below catches.
+    changes_before = conn.total_changes
+    conn.executemany(
+      """
+      INSERT INTO pattern_global_stats(
+        pkey_hash, pattern_key, family, count_sentences, count_occurrences, distinct_realization_count, p_global
       )
+      VALUES(?, ?, ?, ?, ?, ?, 0.0)
+      ON CONFLICT(pkey_hash) DO UPDATE SET
+        count_sentences = count_sentences + excluded.count_sentences,
+        count_occurrences = count_occurrences + excluded.count_occurrences,
+        distinct_realization_count = max(distinct_realization_count, excluded.distinct_realization_count)
+      WHERE pattern_global_stats.pattern_key = excluded.pattern_key
+      """,
+      upsert_rows,
+    )
+    if conn.total_changes - changes_before != len(upsert_rows):
+      for h, pkey, *_ in upsert_rows:
+        (stored,) = conn.execute("SELECT pattern_key FROM pattern_global_stats WHERE pkey_hash = ?", (h,)).fetchone()
+        if stored != pkey:
+          raise ValueError(f"pkey_hash collision between pattern keys {stored!r} and {pkey!r} (hash {h})")
 
     count_occ_batch.clear()
     count_sent_batch.clear()
 
-  with corpus_path.open("r", encoding="utf-8") as f:
-    for line in f:
+  extract_cfg: Dict[str, Any] = dict(
+    max_ngram_n=int(args.max_ngram_n),
+    add_tok_ngrams=bool(args.add_tok_ngrams),
+    add_anchor_windows=bool(args.add_anchor_windows),
+    add_skeleton=bool(args.add_skeleton),
+    add_compressed_skeleton=bool(args.add_cskel),
+    add_anchor_pairs=bool(args.add_anchor_pairs),
+    add_anchor_skip2=bool(args.add_anchor_skip2),
+    add_anchor_skip3=bool(args.add_anchor_skip3),
+    add_anchor_sequence=bool(args.add_anchor_seq),
+    add_anchor_spans=bool(args.add_anchor_spans),
+    add_span_signatures=bool(args.add_span_sigs),
+    span_max_gap=int(args.span_max_gap),
+    skip_max_jump=int(args.skip_max_jump),
+  )
+  workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+
+  def read_sentences() -> Iterator[str]:
+    nonlocal total_lines
+    for line in iter_corpus_lines(corpus_path):
       total_lines += 1
       if args.max_lines and total_lines > args.max_lines:
         break
-
       s = (line or "").strip()
-      if not s:
-        continue
-
+      if s:
+        yield s
+
+  intern = sys.intern
+  pool = None
+  if workers == 1:
+    results: Iterable[Optional[List[Tuple[str, str]]]] = (
+      sentence_patterns(s, anchors, extract_cfg) for s in read_sentences()
+    )
+  else:
+    # Workers tokenize + extract; results come back in corpus order so the realization caps
+    # fill exactly as in a single-process run, with at most 4 chunks per worker queued.
+    pool = Pool(workers, initializer=_init_worker, initargs=(anchors, extract_cfg, jieba_backend))
+    results = chain.from_iterable(imap_bounded(pool, _work, iter_chunks(read_sentences(), 512), 4 * workers))
+
+  ok = False
+  try:
+    for pats in results:
       kept_lines += 1
-      toks = tokenize_words_jieba(s)
-      if not toks:
+      if pats is None:
         continue
 
-      pats, _ = extract_patterns_from_tokens(
-        toks,
-        anchors=anchors,
-        max_ngram_n=int(args.max_ngram_n),
-        add_tok_ngrams=bool(args.add_tok_ngrams),
-        add_anchor_windows=bool(args.add_anchor_windows),
-        add_skeleton=bool(args.add_skeleton),
-        add_compressed_skeleton=bool(args.add_cskel),
-        add_anchor_pairs=bool(args.add_anchor_pairs),
-        add_anchor_skip2=bool(args.add_anchor_skip2),
-        add_anchor_skip3=bool(args.add_anchor_skip3),
-        add_anchor_sequence=bool(args.add_anchor_seq),
-        add_anchor_spans=bool(args.add_anchor_spans),
-        add_span_signatures=bool(args.add_span_sigs),
-        span_max_gap=int(args.span_max_gap),
-        skip_max_jump=int(args.skip_max_jump),
-      )
-
-      # Update counts and store capped realizations
+      # Update counts and store capped realizations. Keys are interned: every sentence
+      # (and every worker result) brings fresh copies of the same few strings.
       sentence_keys: Set[str] = set()
-      for p in pats:
-        pkey = p.pattern_key
+      for pkey, realization in pats:
+        pkey = intern(pkey)
         count_occ_batch[pkey] += 1
         sentence_keys.add(pkey)
         # store realization sample (capped per pid)
-        if p.realization:
-          maybe_add_realization(pkey, p.realization)
+        if realization:
+          maybe_add_realization(pkey, realization)
 
       for pkey in sentence_keys:
         count_sent_batch[pkey] += 1
 
-      if kept_lines % int(args.commit_every) == 0:
+      # Flush on whichever comes first: commit-every sentences, or a batch wide enough
+      # that its UPSERTs would sweep the stats b-tree out of the page cache.
+      if kept_lines - last_flush_line >= int(args.commit_every) or (
+        args.max_batch_patterns and len(count_occ_batch) >= args.max_batch_patterns
+      ):
+        last_flush_line = kept_lines
         flush_counts()
         meta_put(conn, "sentences_processed", kept_lines)
         conn.commit()
+        conn.execute("BEGIN")
 
         dt = time.time() - t0
         rate = kept_lines / dt if dt > 0 else 0.0
@@ -277,6 +480,15 @@ def main() -> None:
           f"[prior-db] processed={kept_lines:,} lines | "
           f"patterns_batch={len(count_occ_batch):,} | rate={rate:,.1f} lines/s"
         )
+    ok = True
+  finally:
+    # On an error (or Ctrl-C) don't wait for the queued chunks: kill the workers.
+    if pool is not None:
+      if ok:
+        pool.close()
+      else:
+        pool.terminate()
+      pool.join()
 
   # Final flush
   flush_counts()
@@ -285,8 +497,8 @@ def main() -> None:
   meta_put(conn, "build_seconds", round(time.time() - t0, 2))
 
   # Compute p_global over all patterns (DF-weighted distribution)
-  row = conn.execute("SELECT SUM(count_sentences) AS s FROM pattern_global_stats").fetchone()
-  total_df_sum = int(row["s"] or 0)
+  (total_df_sum,) = conn.execute("SELECT SUM(count_sentences) FROM pattern_global_stats").fetchone()
+  total_df_sum = int(total_df_sum or 0)
   meta_put(conn, "total_df_sum", total_df_sum)
   if total_df_sum > 0:
     conn.execute(
@@ -297,6 +509,7 @@ def main() -> None:
     conn.execute("UPDATE pattern_global_stats SET p_global = 0.0")
 
   conn.commit()
+  conn.executescript(INDEX_DDL)
   conn.close()
 
   print(f"✅ Built global grammar prior DB: {out_path}")
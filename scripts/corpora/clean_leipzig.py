@@ -15,22 +15,34 @@ Output:
   - A UTF-8 text file: one sentence per line
   - Guarantees:
       * Strict simplified-only (drops sentences that OpenCC t2s would change)
-      * No duplicates (global dedup within this corpus)
+      * No duplicates (global dedup within this corpus, via 64-bit hashes)
       * Basic cleaning + length/noise filtering
 
 Usage:
-  python scripts/clean_leipzig.py data/raw/leipzig/zho_news_2007-2009_1M-sentences.txt data/processed/leipzig_news.sentences.txt
+  python scripts/clean_leipzig.py data/raw/leipzig/zho_news_2007-2009_1M-sentences.txt data/processed/leipzig_news.sentences.txt [workers]
+
+  workers defaults to 0 (= all CPUs); 1 runs in-process.
 """
 
 from __future__ import annotations
 
+import hashlib
+import os
 import re
 import sys
+from functools import lru_cache
+from itertools import chain, islice
+from multiprocessing import Pool
 from pathlib import Path
-from typing import Optional
+from typing import FrozenSet, Iterable, Iterator, List, Optional
 
+import opencc
 from opencc import OpenCC
 
+# Compiled once; whitespace + common quote marks are stripped in a single pass.
+_STRIP_RE = re.compile(r"[\s“”\"'‘’]")
+_ALNUM6_RE = re.compile(r"[A-Za-z0-9]{6,}")
+
 
 def normalize(s: str) -> str:
     s = s.strip()
@@ -39,22 +51,49 @@ def normalize(s: str) -> str:
     # Many Leipzig sentence files are "ID<TAB>sentence"
     if "\t" in s:
         s = s.split("\t", 1)[1].strip()
-    # Remove whitespace inside Chinese sentences
-    s = re.sub(r"\s+", "", s)
-    # Remove common quote marks
-    s = re.sub(r'[“”"\'‘’]', "", s)
+    # Remove whitespace inside Chinese sentences + common quote marks
+    s = _STRIP_RE.sub("", s)
     return s
 
 
 def good_sentence_basic(s: str, min_len: int, max_len: int) -> bool:
     if not (min_len <= len(s) <= max_len):
         return False
-    if re.search(r"[A-Za-z0-9]{6,}", s):
+    if _ALNUM6_RE.search(s):
         return False
     return True
 
 
+@lru_cache(maxsize=1)
+def t2s_suspect_chars() -> Optional[FrozenSet[str]]:
+    """
+    Every character that some OpenCC t2s entry (char or phrase) rewrites.
+    A sentence with none of them is unchanged by t2s, so it skips OpenCC.
+    None if the text dictionaries can't be found (always convert then).
+    """
+    dict_dir = Path(opencc.__file__).parent / "dictionary"
+    files = [dict_dir / "TSCharacters.txt", dict_dir / "TSPhrases.txt"]
+    if not all(fp.exists() for fp in files):
+        return None
+    out = set()
+    for fp in files:
+        with fp.open("r", encoding="utf-8") as f:
+            for line in f:
+                key, _, vals = line.rstrip("\n").partition("\t")
+                val = vals.split(" ", 1)[0]
+                if key == val:
+                    continue
+                if len(key) == len(val):
+                    out.update(k for k, v in zip(key, val) if k != v)
+                else:
+                    out.update(key)
+    return frozenset(out)
+
+
 def is_simplified_strict(s: str, cc_t2s: OpenCC) -> bool:
+    suspects = t2s_suspect_chars()
+    if suspects is not None and suspects.isdisjoint(s):
+        return True
     return s == cc_t2s.convert(s)
 
 
@@ -69,29 +108,79 @@ def process_sentence(s: str, cc_t2s: OpenCC, min_len: int, max_len: int) -> Opti
     return s
 
 
-def main(in_path: str, out_path: str, min_len: int = 6, max_len: int = 60) -> None:
+def dedup_key(s: str) -> int:
+    """64-bit BLAKE2b digest; the seen-set holds these instead of full sentences."""
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+CHUNK_LINES = 10_000
+
+# Per-worker state (OpenCC handles are not picklable; built in the initializer)
+_W_CC = None
+_W_MIN_LEN = 6
+_W_MAX_LEN = 60
+
+
+def _init_worker(min_len: int, max_len: int) -> None:
+    global _W_CC, _W_MIN_LEN, _W_MAX_LEN
+    _W_CC = OpenCC("t2s")
+    _W_MIN_LEN = min_len
+    _W_MAX_LEN = max_len
+
+
+def _process_chunk(lines: List[str]) -> List[str]:
+    return [s for s in (process_sentence(x, _W_CC, _W_MIN_LEN, _W_MAX_LEN) for x in lines) if s]
+
+
+def iter_chunks(f: Iterable[str], n: int) -> Iterator[List[str]]:
+    it = iter(f)
+    while True:
+        chunk = list(islice(it, n))
+        if not chunk:
+            return
+        yield chunk
+
+
+def main(in_path: str, out_path: str, min_len: int = 6, max_len: int = 60, workers: int = 0) -> None:
     in_path = Path(in_path)
     out_path = Path(out_path)
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
 
-    cc_t2s = OpenCC("t2s")
-
-    seen = set()
+    seen: set[int] = set()
     kept = 0
 
     with in_path.open("r", encoding="utf-8", errors="ignore") as f, \
          out_path.open("w", encoding="utf-8") as out:
-        for line in f:
-            s = process_sentence(line, cc_t2s, min_len, max_len)
-            if s and s not in seen:
-                seen.add(s)
+        if workers == 1:
+            cc_t2s = OpenCC("t2s")
+            results: Iterable[Optional[str]] = (process_sentence(line, cc_t2s, min_len, max_len) for line in f)
+            pool = None
+        else:
+            # Workers clean + filter; dedup stays here. imap keeps input order,
+            # so the output matches a single-process run.
+            pool = Pool(workers, initializer=_init_worker, initargs=(min_len, max_len))
+            results = chain.from_iterable(pool.imap(_process_chunk, iter_chunks(f, CHUNK_LINES)))
+
+        try:
+            for s in results:
+                if not s:
+                    continue
+                h = dedup_key(s)
+                if h in seen:
+                    continue
+                seen.add(h)
                 out.write(s + "\n")
                 kept += 1
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
 
     print(f"✅ wrote {kept} unique simplified sentences to {out_path}", file=sys.stderr)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("usage: clean_leipzig.py <in.txt> <out.txt>", file=sys.stderr)
+    if len(sys.argv) not in (3, 4):
+        print("usage: clean_leipzig.py <in.txt> <out.txt> [workers (0 = all CPUs)]", file=sys.stderr)
         sys.exit(2)
-    main(sys.argv[1], sys.argv[2])
+    main(sys.argv[1], sys.argv[2], workers=int(sys.argv[3]) if len(sys.argv) == 4 else 0)
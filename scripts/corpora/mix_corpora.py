@@ -33,53 +33,87 @@ Usage:
 from __future__ import annotations
 
 import argparse
+import itertools
+import math
 import random
 import sys
 from pathlib import Path
-from typing import Iterable, List, Set
+from typing import Iterator, List
 
+IO_BUFFER = 1 << 20
 
-def iter_lines(path: Path) -> Iterable[str]:
-    with path.open("r", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            s = line.strip()
-            if s:
-                yield s
 
+def _decode_line(raw: bytes) -> str:
+    return raw.decode("utf-8", errors="ignore").strip()
 
-def reservoir_sample(path: Path, k: int, rng: random.Random) -> List[str]:
+
+def _kept_line(raw: bytes) -> bytes:
+    # canonical UTF-8 of the stripped line: equal bytes <=> equal sentences for the dedup
+    return _decode_line(raw).encode("utf-8")
+
+
+def _is_nonblank(raw: bytes) -> bool:
+    """Same answer as bool(_decode_line(raw)), usually from the first character alone."""
+    t = raw.strip()
+    if not t:
+        return False
+    if t[0] < 0x80:
+        return True
+    first = t[:4].decode("utf-8", errors="ignore")[:1]
+    if first and not first.isspace():
+        return True
+    return bool(_decode_line(raw))
+
+
+def iter_lines(path: Path) -> Iterator[bytes]:
+    """Raw non-blank lines (undecoded) through a large binary read buffer."""
+    with path.open("rb", buffering=IO_BUFFER) as f:
+        yield from filter(_is_nonblank, f)
+
+
+def reservoir_sample(path: Path, k: int, rng: random.Random) -> List[bytes]:
     """
     Reservoir sample k items from an iterable without loading whole file.
     Assumes lines are already clean and deduplicated within the corpus.
+
+    Algorithm L: after the reservoir fills, jump ahead a geometric number of non-blank
+    lines between replacements, so skipped lines are never fully decoded and cost no RNG draws.
+    Kept lines are returned as stripped UTF-8 bytes.
     """
-    res: List[str] = []
-    n = 0
-    for s in iter_lines(path):
-        n += 1
-        if len(res) < k:
-            res.append(s)
-        else:
-            j = rng.randrange(n)
-            if j < k:
-                res[j] = s
+    res: List[bytes] = []
+    if k <= 0:
+        return res
+    lines = iter_lines(path)
+    try:
+        for raw in lines:
+            res.append(_kept_line(raw))
+            if len(res) == k:
+                break
+
+        if len(res) == k:
+            w = math.exp(math.log(1.0 - rng.random()) / k)
+            while w < 1.0:
+                skip = int(math.log(1.0 - rng.random()) / math.log(1.0 - w))
+                raw = next(itertools.islice(lines, skip, None), None)
+                if raw is None:
+                    break
+                res[rng.randrange(k)] = _kept_line(raw)
+                w *= math.exp(math.log(1.0 - rng.random()) / k)
+    finally:
+        lines.close()
 
     if len(res) < k:
         print(f"⚠️  {path} had only {len(res)} lines available (target {k}).", file=sys.stderr)
     return res
 
 
-def write_shuffled_global_dedup(samples: List[str], out_path: Path, rng: random.Random) -> int:
-    rng.shuffle(samples)
-    seen: Set[str] = set()
-    written = 0
-    with out_path.open("w", encoding="utf-8") as out:
-        for s in samples:
-            if s in seen:
-                continue
-            seen.add(s)
-            out.write(s + "\n")
-            written += 1
-    return written
+def write_shuffled_global_dedup(samples: List[bytes], out_path: Path, rng: random.Random) -> int:
+    # dict.fromkeys dedups in C (first occurrence kept); only the unique lines get shuffled
+    unique = list(dict.fromkeys(samples))
+    rng.shuffle(unique)
+    with out_path.open("wb", buffering=IO_BUFFER) as out:
+        out.writelines(s + b"\n" for s in unique)
+    return len(unique)
 
 
 def main():
@@ -17,35 +17,74 @@ Output:
       * Basic cleaning + length/noise filtering
 
 Usage:
-  python scripts/wiki_to_sentences.py data/raw/wiki/extracted data/processed/wiki.sentences.txt
+  python scripts/wiki_to_sentences.py data/raw/wiki/extracted data/processed/wiki.sentences.txt [workers]
+
+  workers defaults to 0 (= all CPUs); 1 runs in-process.
 """
 
 from __future__ import annotations
 
 import json
+import os
 import re
 import sys
+from functools import lru_cache
+from multiprocessing import Pool
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import FrozenSet, Iterable, Iterator, List, Optional
 
+import opencc
 from opencc import OpenCC
 
+try:
+    import orjson  # type: ignore
+except Exception:  # optional speedup; stdlib json is the fallback
+    orjson = None
+
 # Sentence split: keep end punctuation
-SENT_SPLIT = re.compile(r"(?<=[。！？])")
+SUB_SPLIT = re.compile(r"(?<=[！？])")
+
+# normalize(): whitespace, quote marks and parentheticals are removed in one scan.
+# Parentheticals use [^）]* / [^)]* (no backtracking); since every whitespace char is removed anyway,
+# this matches exactly what `.*?` found after the whitespace pass.
+NORMALIZE_RE = re.compile(r"""\s+|[“”"'‘’]|（[^）]*）|\([^)]*\)""")
+# Citation markers run as a second pass: removing the above can join e.g. "[1 2]" into "[12]".
+CITATION_RE = re.compile(r"\[[0-9]+\]")
+# Long latin/digit runs (URLs, codes, romanized names) mark noisy sentences.
+ALNUM6_RE = re.compile(r"[A-Za-z0-9]{6,}")
+
+
+def split_sentences(text: str) -> Iterator[str]:
+    """
+    Same pieces as re.split(r"(?<=[。！？])", text). The text is cut with str.split("。"),
+    which runs in C without a per-position lookbehind; only the (rare) pieces holding
+    ！ or ？ go through the regex.
+    """
+    parts = text.split("。")
+    last = parts.pop()
+    for p in parts:
+        if "！" in p or "？" in p:
+            pieces = SUB_SPLIT.split(p)
+            pieces[-1] += "。"
+            yield from pieces
+        else:
+            yield p + "。"
+    if "！" in last or "？" in last:
+        yield from SUB_SPLIT.split(last)
+    else:
+        yield last
 
 
 def normalize(s: str) -> str:
     s = s.strip()
     if not s:
         return ""
-    # Remove whitespace inside Chinese sentences
-    s = re.sub(r"\s+", "", s)
-    # Remove common quote marks
-    s = re.sub(r'[“”"\'‘’]', "", s)
-    # Remove parentheticals (often citations/explanations)
-    s = re.sub(r"（.*?）|\(.*?\)", "", s)
+    # Remove whitespace inside Chinese sentences, common quote marks and
+    # parentheticals (often citations/explanations)
+    s = NORMALIZE_RE.sub("", s)
     # Remove citation markers like [1], [23]
-    s = re.sub(r"\[[0-9]+\]", "", s)
+    if "[" in s:
+        s = CITATION_RE.sub("", s)
     return s
 
 
@@ -53,23 +92,68 @@ def good_sentence_basic(s: str, min_len: int, max_len: int) -> bool:
     if not (min_len <= len(s) <= max_len):
         return False
     # Avoid long latin/digit runs
-    if re.search(r"[A-Za-z0-9]{6,}", s):
+    if ALNUM6_RE.search(s):
         return False
     return True
 
 
+@lru_cache(maxsize=1)
+def t2s_suspect_chars() -> Optional[FrozenSet[str]]:
+    """
+    Every character that some OpenCC t2s entry (char or phrase) rewrites.
+    A sentence with none of them is unchanged by t2s, so it skips OpenCC.
+    None if the text dictionaries can't be found (always convert then).
+    """
+    dict_dir = Path(opencc.__file__).parent / "dictionary"
+    files = [dict_dir / "TSCharacters.txt", dict_dir / "TSPhrases.txt"]
+    if not all(fp.exists() for fp in files):
+        return None
+    out = set()
+    for fp in files:
+        with fp.open("r", encoding="utf-8") as f:
+            for line in f:
+                key, _, vals = line.rstrip("\n").partition("\t")
+                val = vals.split(" ", 1)[0]
+                if key == val:
+                    continue
+                if len(key) == len(val):
+                    out.update(k for k, v in zip(key, val) if k != v)
+                else:
+                    out.update(key)
+    return frozenset(out)
+
+
 def is_simplified_strict(s: str, cc_t2s: OpenCC) -> bool:
     """
     Strict simplified check:
       If converting Traditional->Simplified changes the string,
       we treat it as containing Traditional and drop it.
+    Sentences without any t2s suspect character are accepted without converting.
     """
+    suspects = t2s_suspect_chars()
+    if suspects is not None and suspects.isdisjoint(s):
+        return True
     return s == cc_t2s.convert(s)
 
 
+def load_record(line: bytes) -> dict:
+    """
+    Parse one JSONL record straight from bytes (orjson when available).
+    Lines orjson rejects (invalid UTF-8, lone surrogate escapes) go through the lenient
+    decode + stdlib path, so they are handled exactly as before.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(line)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(line.decode("utf-8", errors="ignore"))
+
+
 def iter_jsonl_files(root: Path) -> Iterable[Path]:
+    # empty files hold no records; skipping them saves a worker round-trip each
     for p in root.rglob("*"):
-        if p.is_file():
+        if p.is_file() and p.stat().st_size > 0:
             yield p
 
 
@@ -89,37 +173,85 @@ def process_sentence(
     return sent
 
 
-def main(extracted_dir: str, out_path: str, min_len: int = 6, max_len: int = 60) -> None:
+def process_file(fp: Path, cc_t2s: OpenCC, min_len: int, max_len: int) -> List[str]:
+    """
+    Cleaned + filtered sentences of one WikiExtractor file, in file order (not deduped).
+    An unreadable file / malformed JSON chunk ends the file; sentences before it are kept.
+    """
+    out: List[str] = []
+    try:
+        with fp.open("rb") as f:
+            for line in f:
+                obj = load_record(line)
+                text = obj.get("text", "")
+                for sent in split_sentences(text):
+                    cleaned = process_sentence(sent, cc_t2s, min_len, max_len)
+                    if cleaned:
+                        out.append(cleaned)
+    except Exception:
+        pass
+    return out
+
+
+# Per-worker state (set once per process by _init_worker; OpenCC is built there, not pickled)
+_W_CC = None
+_W_MIN_LEN = 6
+_W_MAX_LEN = 60
+
+
+def _init_worker(min_len: int, max_len: int) -> None:
+    global _W_CC, _W_MIN_LEN, _W_MAX_LEN
+    _W_CC = OpenCC("t2s")
+    _W_MIN_LEN = min_len
+    _W_MAX_LEN = max_len
+
+
+def _process_file(fp: Path) -> List[str]:
+    return process_file(fp, _W_CC, _W_MIN_LEN, _W_MAX_LEN)
+
+
+def main(extracted_dir: str, out_path: str, min_len: int = 6, max_len: int = 60, workers: int = 0) -> None:
     extracted_dir = Path(extracted_dir)
     out_path = Path(out_path)
-
-    cc_t2s = OpenCC("t2s")
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
 
     seen = set()
     kept = 0
 
-    with out_path.open("w", encoding="utf-8") as out:
-        for fp in iter_jsonl_files(extracted_dir):
-            try:
-                with fp.open("r", encoding="utf-8", errors="ignore") as f:
-                    for line in f:
-                        obj = json.loads(line)
-                        text = obj.get("text", "")
-                        for sent in SENT_SPLIT.split(text):
-                            cleaned = process_sentence(sent, cc_t2s, min_len, max_len)
-                            if cleaned and cleaned not in seen:
-                                seen.add(cleaned)
-                                out.write(cleaned + "\n")
-                                kept += 1
-            except Exception:
-                # skip any unreadable file / malformed JSON chunk
-                continue
+    files = iter_jsonl_files(extracted_dir)
+    if workers == 1:
+        cc_t2s = OpenCC("t2s")
+        results: Iterable[List[str]] = (process_file(fp, cc_t2s, min_len, max_len) for fp in files)
+        pool = None
+    else:
+        # Workers parse + clean + filter whole files; dedup stays here. imap keeps file order,
+        # so the output matches a single-process run.
+        pool = Pool(workers, initializer=_init_worker, initargs=(min_len, max_len))
+        results = pool.imap(_process_file, files)
+
+    try:
+        with out_path.open("w", encoding="utf-8") as out:
+            for sents in results:
+                try:
+                    for s in sents:
+                        if s in seen:
+                            continue
+                        seen.add(s)
+                        out.write(s + "\n")
+                        kept += 1
+                except UnicodeEncodeError:
+                    # unwritable sentence (lone surrogate): skip the rest of that file, as before
+                    continue
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
     print(f"✅ wrote {kept} unique simplified sentences to {out_path}", file=sys.stderr)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("usage: wiki_to_sentences.py <extracted_dir> <out.txt>", file=sys.stderr)
+    if len(sys.argv) not in (3, 4):
+        print("usage: wiki_to_sentences.py <extracted_dir> <out.txt> [workers (0 = all CPUs)]", file=sys.stderr)
         sys.exit(2)
-    main(sys.argv[1], sys.argv[2])
+    main(sys.argv[1], sys.argv[2], workers=int(sys.argv[3]) if len(sys.argv) == 4 else 0)
@@ -3,6 +3,7 @@ import csv
 
 conn = sqlite3.connect("data/state.db")
 cur = conn.cursor()
+cur.arraysize = 10_000
 
 cur.execute("""
 SELECT word, count, hsk_level, hsk_frequency
@@ -13,7 +14,8 @@ ORDER BY count DESC
 with open("data/vocab_stats_full.csv", "w", newline="", encoding="utf-8") as f:
     writer = csv.writer(f)
     writer.writerow(["word", "count", "hsk_level", "hsk_frequency"])
-    writer.writerows(cur.fetchall())
+    # Stream rows straight from the cursor (no full-table list in memory)
+    writer.writerows(cur)
 
 conn.close()
 print("✅ Wrote data/vocab_stats_full.csv")
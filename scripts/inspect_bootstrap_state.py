@@ -19,7 +19,7 @@ Report sections
 2) Anchor diagnostics:
    - activated anchors from meta
    - optional: global candidate anchors file (allowed set)
-   - DF stats across corpus
+   - DF stats across corpus (only with --deck-df, --global-anchors or --recompute-anchors)
    - sanity checks: did activated anchors come from candidates? are they high DF?
 3) Random sentence spot-checks (jieba/hsk/char tokens + pattern count + skeleton)
 4) Pattern health:
@@ -41,15 +41,33 @@ PYTHONPATH=src python scripts/inspect_bootstrap_state.py --db data/state.db --gl
 from __future__ import annotations
 
 import argparse
+import functools
+import heapq
 import json
 import math
 import os
 import random
 import sqlite3
+import sys
+from array import array
 from collections import Counter, defaultdict
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+try:
+    import orjson  # type: ignore
+except Exception:  # optional speedup; stdlib json is the fallback
+    orjson = None
+
+try:
+    import numba  # type: ignore
+    import numpy as np
+except Exception:  # optional JIT for DF/TF counting; the Counter path is the fallback
+    numba = None
+
+# Token/pattern JSON columns are decoded once per row; orjson does it in C.
+_json_loads = orjson.loads if orjson is not None else json.loads
 
 
 # ---------------------------
@@ -69,7 +87,7 @@ def take(n: int, it: Sequence[Any]) -> Sequence[Any]:
 
 def safe_json_loads(s: str, fallback: Any) -> Any:
     try:
-        return json.loads(s)
+        return _json_loads(s)
     except Exception:
         return fallback
 
@@ -86,9 +104,19 @@ EXPECTED_TABLES = {
     "pattern_personal_realizations",
 }
 
+# Read-only analytical scan: big page cache + mmap for the full sentences read.
+# journal_mode is left alone -- switching to WAL would write to the inspected DB.
+READ_PRAGMAS = """
+PRAGMA query_only=ON;
+PRAGMA cache_size=-262144;
+PRAGMA temp_store=MEMORY;
+PRAGMA mmap_size=268435456;
+"""
+
 def connect(db_path: Path) -> sqlite3.Connection:
     conn = sqlite3.connect(str(db_path))
     conn.row_factory = sqlite3.Row
+    conn.executescript(READ_PRAGMAS)
     return conn
 
 def list_tables(conn: sqlite3.Connection) -> List[str]:
@@ -104,17 +132,118 @@ def read_meta(conn: sqlite3.Connection) -> Dict[str, str]:
     rows = conn.execute("SELECT key, value FROM meta").fetchall()
     return {r["key"]: r["value"] for r in rows}
 
+def _keep_chars(zh_text: str) -> List[str]:
+    # Same rule as the project's tokenize_chars: CJK Unified Ideographs or digits
+    return [ch for ch in (zh_text or "") if "\u4e00" <= ch <= "\u9fff" or ch.isdigit()]
+
+@functools.lru_cache(maxsize=None)
+def _char_tokenizer():
+    """The project's tokenize_chars if importable, else the local keep-char filter."""
+    try:
+        from zh_sentence_learning_pipeline.grammar.tokenize import tokenize_chars
+        return tokenize_chars
+    except Exception:
+        return _keep_chars
+
+def derive_char_tokens(zh_text: str) -> List[str]:
+    # tokens_char_json is NULL in newer DBs: char tokens are recomputed from the text
+    return _char_tokenizer()(zh_text)
+
+def decode_token_bundle(conn: sqlite3.Connection, row: sqlite3.Row) -> Tuple[Any, Any, Any]:
+    """(jieba, hsk, char) tokens from one decode of the bundled columns; per-column fallback if malformed."""
+    bundle = safe_json_loads(row["tokens_bundle"], fallback=None)
+    if isinstance(bundle, list) and len(bundle) == 3:
+        tc = bundle[2] if bundle[2] is not None else derive_char_tokens(row["zh_text"])
+        return bundle[0], bundle[1], tc
+    r = conn.execute(
+        "SELECT tokens_jieba_json, tokens_hsk_json, tokens_char_json FROM sentences WHERE id = ?",
+        (row["id"],),
+    ).fetchone()
+    tj, th = (safe_json_loads(c, fallback=[]) for c in r[:2])
+    tc = safe_json_loads(r[2], fallback=[]) if r[2] is not None else derive_char_tokens(row["zh_text"])
+    return tj, th, tc
+
+def has_json1(conn: sqlite3.Connection) -> bool:
+    try:
+        conn.execute("SELECT json_array_length('[]')").fetchone()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+SQLITE_MAX_PARAMS = 999
+
+def _sample_rowids(conn: sqlite3.Connection, table: str, k: int, max_rounds: int = 8) -> List[int]:
+    """
+    Uniform sample of up to k existing rowids without a full-table random sort; uses the seeded `random`.
+    Dense rowids: draw ids from [MIN(rowid), MAX(rowid)] and keep the ones that exist
+    (rejection on gaps). Sparse rowids: draw k ranks in [0, COUNT) and step to them with
+    OFFSET in one forward pass (a `rowid >= random` seek would weight each id by the gap before it).
+    """
+    lo, hi, n = conn.execute(f"SELECT MIN(rowid), MAX(rowid), COUNT(*) FROM {table}").fetchone()
+    if not n or k <= 0:
+        return []
+    if n <= k:
+        return [r[0] for r in conn.execute(f"SELECT rowid FROM {table}")]
+
+    span = hi - lo + 1
+    if span > 4 * n:
+        # each step resumes after the previous hit, so the OFFSETs add up to at most n rows
+        step = f"SELECT rowid FROM {table} WHERE rowid >= ? ORDER BY rowid LIMIT 1 OFFSET ?"
+        found: List[int] = []
+        start, prev_rank = lo, -1
+        for rank in sorted(random.sample(range(n), k)):
+            r = conn.execute(step, (start, rank - prev_rank - 1)).fetchone()
+            if r is None:
+                break
+            found.append(r[0])
+            start, prev_rank = r[0] + 1, rank
+        random.shuffle(found)
+        return found
+
+    picked: List[int] = []
+    tried: Set[int] = set()
+    for _ in range(max_rounds):
+        need = k - len(picked)
+        if need <= 0:
+            break
+        # oversample by the gap ratio so one round is usually enough
+        want = min(span, int(need * span / n * 1.25) + 8)
+        draw = [i for i in random.sample(range(lo, hi + 1), want) if i not in tried]
+        tried.update(draw)
+        hits: Set[int] = set()
+        for i in range(0, len(draw), SQLITE_MAX_PARAMS):
+            part = draw[i:i + SQLITE_MAX_PARAMS]
+            qmarks = ",".join("?" * len(part))
+            hits.update(r[0] for r in conn.execute(f"SELECT rowid FROM {table} WHERE rowid IN ({qmarks})", part))
+        # keep draw order so truncating to k stays uniform
+        picked.extend(i for i in draw if i in hits)
+    return picked[:k]
+
 def sample_sentences(conn: sqlite3.Connection, k: int) -> List[sqlite3.Row]:
-    # Random sample without loading all rows into python
-    return conn.execute(
-        """
-        SELECT id, zh_text, tokens_jieba_json, tokens_hsk_json, tokens_char_json, patterns_json, skeleton
-        FROM sentences
-        ORDER BY RANDOM()
-        LIMIT ?
-        """,
-        (k,),
-    ).fetchall()
+    # Uniform random sample of up to k sentences (see _sample_rowids), in sampled order.
+    # `npat` is the patterns_json length computed by SQLite when JSON1 is available,
+    # otherwise the raw patterns_json text (caller decodes it).
+    npat_sql = (
+        "CASE WHEN json_valid(patterns_json) THEN json_array_length(patterns_json) ELSE 0 END"
+        if has_json1(conn)
+        else "patterns_json"
+    )
+    ids = _sample_rowids(conn, "sentences", k)
+    by_id: Dict[int, sqlite3.Row] = {}
+    for i in range(0, len(ids), SQLITE_MAX_PARAMS):
+        part = ids[i:i + SQLITE_MAX_PARAMS]
+        rows = conn.execute(
+            """
+            SELECT id, zh_text,
+                   '[' || tokens_jieba_json || ',' || tokens_hsk_json || ',' || COALESCE(tokens_char_json, 'null') || ']' AS tokens_bundle,
+                   {npat_sql} AS npat, skeleton
+            FROM sentences
+            WHERE id IN ({qmarks})
+            """.format(npat_sql=npat_sql, qmarks=",".join("?" * len(part))),
+            part,
+        )
+        by_id.update((r["id"], r) for r in rows)
+    return [by_id[i] for i in ids]
 
 
 # ---------------------------
@@ -126,11 +255,12 @@ def load_global_candidates(path: Optional[Path]) -> Optional[Set[str]]:
         return None
     if not path.exists():
         raise FileNotFoundError(f"global anchors file not found: {path}")
-    payload = json.loads(path.read_text(encoding="utf-8"))
+    payload = _json_loads(path.read_bytes())
     anchors = payload.get("anchors", None)
     if not isinstance(anchors, list):
         raise ValueError(f"Invalid global anchors payload in {path}: expected {{'anchors':[...]}}, got keys={list(payload.keys())}")
-    out = {str(a).strip() for a in anchors if str(a).strip()}
+    # interned so set ops against activated anchors / df keys short-circuit on identity
+    out = {sys.intern(t) for t in (str(a).strip() for a in anchors) if t}
     return out
 
 def load_activated_anchors(meta: Dict[str, str]) -> Optional[Set[str]]:
@@ -140,7 +270,7 @@ def load_activated_anchors(meta: Dict[str, str]) -> Optional[Set[str]]:
     arr = safe_json_loads(s, fallback=None)
     if not isinstance(arr, list):
         return None
-    return {str(x) for x in arr}
+    return {sys.intern(str(x)) for x in arr}
 
 def parse_int_meta(meta: Dict[str, str], key: str, default: int) -> int:
     try:
@@ -154,33 +284,84 @@ def parse_bool_meta(meta: Dict[str, str], key: str, default: bool) -> bool:
         return default
     return str(v).strip() in {"1", "true", "True", "yes", "YES"}
 
-def corpus_df(tokens_jieba_all: List[List[str]], max_len: Optional[int] = None) -> Counter[str]:
-    df = Counter()
+def _df_tf_kernel(flat, offsets, df_out, tf_out, seen, touched):
+    # flat: token ids of all sentences back to back; sentence s is flat[offsets[s]:offsets[s+1]]
+    # seen: shared per-id bitmap (all zero between sentences); touched: scratch of ids set this sentence
+    for s in range(len(offsets) - 1):
+        ntouched = 0
+        for i in range(offsets[s], offsets[s + 1]):
+            tok = flat[i]
+            tf_out[tok] += 1
+            if seen[tok] == 0:
+                seen[tok] = 1
+                touched[ntouched] = tok
+                ntouched += 1
+                df_out[tok] += 1
+        for j in range(ntouched):
+            seen[touched[j]] = 0
+
+
+if numba is not None:
+    _df_tf_kernel = numba.njit(cache=True)(_df_tf_kernel)
+
+
+def _corpus_df_tf_ids(
+    tokens_jieba_all: Iterable[List[str]], max_len: Optional[int]
+) -> Tuple[Counter[str], Counter[str], int]:
+    # Intern tokens to int ids while streaming, then count in the compiled kernel.
+    vocab: Dict[str, int] = {}
+    tok_id = vocab.setdefault
+    flat = array("i")
+    offsets = array("q", [0])
     for sent in tokens_jieba_all:
-        if max_len is None:
-            uniq = set(sent)
-        else:
-            uniq = {t for t in sent if len(t) <= max_len}
-        df.update(uniq)
-    return df
-
-def corpus_tf(tokens_jieba_all: List[List[str]], max_len: Optional[int] = None) -> Counter[str]:
-    tf = Counter()
+        for t in sent:
+            if max_len is None or len(t) <= max_len:
+                flat.append(tok_id(t, len(vocab)))
+        offsets.append(len(flat))
+
+    offs = np.frombuffer(offsets, dtype=np.int64)
+    max_sent = int(np.diff(offs).max()) if len(offs) > 1 else 0
+    df_out = np.zeros(len(vocab), dtype=np.int64)
+    tf_out = np.zeros(len(vocab), dtype=np.int64)
+    _df_tf_kernel(
+        np.frombuffer(flat, dtype=np.int32) if flat else np.zeros(0, dtype=np.int32),
+        offs,
+        df_out,
+        tf_out,
+        np.zeros(len(vocab), dtype=np.uint8),
+        np.empty(max_sent, dtype=np.int32),
+    )
+    df = Counter(dict(zip(vocab, df_out.tolist())))
+    tf = Counter(dict(zip(vocab, tf_out.tolist())))
+    return df, tf, len(offsets) - 1
+
+
+def corpus_df_tf(
+    tokens_jieba_all: Iterable[List[str]], max_len: Optional[int] = None
+) -> Tuple[Counter[str], Counter[str], int]:
+    """One pass over the token lists -> (DF, TF, number of sentences)."""
+    if numba is not None:
+        return _corpus_df_tf_ids(tokens_jieba_all, max_len)
+
+    df: Counter[str] = Counter()
+    tf: Counter[str] = Counter()
+    n_docs = 0
     for sent in tokens_jieba_all:
-        if max_len is None:
-            tf.update(sent)
-        else:
-            tf.update([t for t in sent if len(t) <= max_len])
-    return tf
-
-def read_all_jieba_tokens(conn: sqlite3.Connection) -> List[List[str]]:
-    rows = conn.execute("SELECT tokens_jieba_json FROM sentences").fetchall()
-    out: List[List[str]] = []
-    for r in rows:
-        toks = safe_json_loads(r["tokens_jieba_json"], fallback=[])
+        n_docs += 1
+        if max_len is not None:
+            sent = [t for t in sent if len(t) <= max_len]
+        df.update(set(sent))
+        tf.update(sent)
+    return df, tf, n_docs
+
+def iter_jieba_tokens(conn: sqlite3.Connection) -> Iterator[List[str]]:
+    """Stream decoded jieba token lists straight off the cursor (no fetchall)."""
+    cur = conn.execute("SELECT tokens_jieba_json FROM sentences")
+    cur.arraysize = 1000
+    for r in cur:
+        toks = safe_json_loads(r[0], fallback=[])
         if isinstance(toks, list):
-            out.append([str(x) for x in toks])
-    return out
+            yield [str(x) for x in toks]
 
 
 # ---------------------------
@@ -194,28 +375,24 @@ class PatternRow:
     distinct_sentence_count: int
     emerged: int
 
+TOP_PATTERNS_SQL = """
+SELECT pattern_key, count_seen, distinct_sentence_count, emerged
+FROM pattern_personal_stats
+ORDER BY count_seen DESC, distinct_sentence_count DESC
+LIMIT ?
+"""
+# Served by idx_pattern_personal_counts (store/db.py) on DBs built with the current schema
+TOP_EMERGED_PATTERNS_SQL = """
+SELECT pattern_key, count_seen, distinct_sentence_count, emerged
+FROM pattern_personal_stats
+WHERE emerged = 1
+ORDER BY count_seen DESC, distinct_sentence_count DESC
+LIMIT ?
+"""
+
 def top_patterns(conn: sqlite3.Connection, limit: int = 20, emerged_only: bool = True) -> List[PatternRow]:
-    if emerged_only:
-        rows = conn.execute(
-            """
-            SELECT pattern_key, count_seen, distinct_sentence_count, emerged
-            FROM pattern_personal_stats
-            WHERE emerged = 1
-            ORDER BY count_seen DESC, distinct_sentence_count DESC
-            LIMIT ?
-            """,
-            (limit,),
-        ).fetchall()
-    else:
-        rows = conn.execute(
-            """
-            SELECT pattern_key, count_seen, distinct_sentence_count, emerged
-            FROM pattern_personal_stats
-            ORDER BY count_seen DESC, distinct_sentence_count DESC
-            LIMIT ?
-            """,
-            (limit,),
-        ).fetchall()
+    sql = TOP_EMERGED_PATTERNS_SQL if emerged_only else TOP_PATTERNS_SQL
+    rows = conn.execute(sql, (limit,)).fetchall()
     return [
         PatternRow(
             r["pattern_key"],
@@ -226,33 +403,61 @@ def top_patterns(conn: sqlite3.Connection, limit: int = 20, emerged_only: bool =
         for r in rows
     ]
 
-def sample_realizations(conn: sqlite3.Connection, pkey: str, k: int = 6) -> List[str]:
+def sample_realizations(conn: sqlite3.Connection, pkeys: Sequence[str], k: int = 6) -> Dict[str, List[str]]:
+    """Up to k random realizations per pattern key, fetched for all keys in one query."""
+    if not pkeys:
+        return {}
+    qmarks = ",".join(["?"] * len(pkeys))
     rows = conn.execute(
-        """
-        SELECT realization
+        f"""
+        SELECT pattern_key, realization
         FROM pattern_personal_realizations
-        WHERE pattern_key = ?
-        ORDER BY RANDOM()
-        LIMIT ?
+        WHERE pattern_key IN ({qmarks})
+        ORDER BY pattern_key, realization
         """,
-        (pkey, k),
-    ).fetchall()
-    return [r["realization"] for r in rows]
+        list(pkeys),
+    )
+    by_key: Dict[str, List[str]] = defaultdict(list)
+    for pkey, realization in rows:
+        by_key[pkey].append(realization)
+    # Sampled with the seeded `random` so --seed reproduces the report
+    out: Dict[str, List[str]] = {}
+    for pkey in pkeys:
+        pool = by_key.get(pkey, [])
+        out[pkey] = random.sample(pool, min(k, len(pool)))
+    return out
 
-def pattern_count_hist(conn: sqlite3.Connection) -> Counter[int]:
-    rows = conn.execute("SELECT count_seen AS c FROM pattern_personal_stats").fetchall()
-    hist = Counter(int(r["c"]) for r in rows)
-    return hist
+def pattern_summary(conn: sqlite3.Connection) -> Tuple[int, int, Counter[int]]:
+    """(total, emerged, count_seen histogram) from one grouped scan."""
+    rows = conn.execute(
+        """
+        SELECT count_seen, COUNT(*), SUM(emerged = 1)
+        FROM pattern_personal_stats
+        GROUP BY count_seen
+        """
+    ).fetchall()
+    hist: Counter[int] = Counter()
+    total = emerged = 0
+    for c, n, e in rows:
+        hist[int(c)] += n
+        total += n
+        emerged += int(e or 0)
+    return total, emerged, hist
 
 
 # ---------------------------
 # Vocab health
 # ---------------------------
 
-def vocab_unknown_ratio(conn: sqlite3.Connection) -> Tuple[int, int]:
-    total = table_count(conn, "vocab_stats")
-    unk = int(conn.execute("SELECT COUNT(*) AS n FROM vocab_stats WHERE hsk_level IS NULL").fetchone()["n"])
-    return unk, total
+def vocab_summary(conn: sqlite3.Connection) -> Tuple[int, int, int]:
+    """(total, NULL hsk_level, single-character) vocab counts in one table scan."""
+    row = conn.execute(
+        """
+        SELECT COUNT(*), SUM(hsk_level IS NULL), SUM(LENGTH(word) = 1)
+        FROM vocab_stats
+        """
+    ).fetchone()
+    return int(row[0]), int(row[1] or 0), int(row[2] or 0)
 
 def top_vocab(conn: sqlite3.Connection, k: int = 20) -> List[sqlite3.Row]:
     return conn.execute(
@@ -265,11 +470,6 @@ def top_vocab(conn: sqlite3.Connection, k: int = 20) -> List[sqlite3.Row]:
         (k,),
     ).fetchall()
 
-def single_char_vocab_count(conn: sqlite3.Connection) -> Tuple[int, int]:
-    total = table_count(conn, "vocab_stats")
-    one = int(conn.execute("SELECT COUNT(*) AS n FROM vocab_stats WHERE LENGTH(word) = 1").fetchone()["n"])
-    return one, total
-
 
 # ---------------------------
 # Length robustness demo
@@ -292,8 +492,9 @@ def jaccard(a: Set[str], b: Set[str]) -> float:
         return 1.0
     if not a or not b:
         return 0.0
+    # |A ∪ B| = |A| + |B| - |A ∩ B|; no union set is built
     inter = len(a & b)
-    union = len(a | b)
+    union = len(a) + len(b) - inter
     return inter / union if union else 0.0
 
 
@@ -310,6 +511,7 @@ def main() -> None:
     ap.add_argument("--print-anchors", type=int, default=120, help="Print first N anchors (sorted)")
     ap.add_argument("--top-patterns", type=int, default=20, help="How many top patterns to print")
     ap.add_argument("--top-vocab", type=int, default=20, help="How many top vocab to print")
+    ap.add_argument("--deck-df", action="store_true", help="Print top tokens by DF/TF even without --global-anchors/--recompute-anchors")
 
     # Optional: recompute what anchors would be (without changing DB)
     ap.add_argument("--recompute-anchors", action="store_true", help="Recompute anchors from corpus for comparison")
@@ -417,86 +619,71 @@ def main() -> None:
                 if bad:
                     print("⚠️ Some activated anchors are not in candidate set (unexpected):", sorted(list(bad))[:50])
 
-        # Compute DF over your deck (from stored jieba tokens)
-        tokens_jieba_all = read_all_jieba_tokens(conn)
-        df = corpus_df(tokens_jieba_all)
-        tf = corpus_tf(tokens_jieba_all)
-        total_docs = len(tokens_jieba_all)
-
-        # show top df short tokens
-        top_df = df.most_common(25)
-        print("\nTop tokens by DF (coverage across sentences):")
-        for t, c in top_df:
-            print(f"  - {t}: df={c} ({fmt_pct(c, total_docs)}), tf={tf.get(t,0)}")
-
-        if global_candidates is not None:
-            # top df among candidates
-            df_cand = [(t, df.get(t, 0)) for t in global_candidates]
-            df_cand.sort(key=lambda x: x[1], reverse=True)
-            print("\nTop candidate tokens by DF in YOUR deck:")
-            for t, c in df_cand[:25]:
-                print(f"  - {t}: df={c} ({fmt_pct(c, total_docs)})")
-
-        if args.recompute_anchors:
-            print("\n=== Anchor recomputation (comparison) ===")
-            # recompute using settings, optionally restricted to candidates
-            max_len = args.anchor_max_len
-            method = args.anchor_method
-            k = args.anchors_top_k
-
-            if method == "df":
-                df2 = corpus_df(tokens_jieba_all, max_len=max_len)
-                items = df2.most_common(k)
-                recomputed = {t for t, _ in items if (global_candidates is None or t in global_candidates)}
-                # if candidates exist, we may have fewer than k due to restriction; fill by scanning
-                if global_candidates is not None and len(recomputed) < k:
-                    # scan next best until filled
-                    for t, _ in df2.most_common(5000):
-                        if len(t) <= max_len and t in global_candidates:
-                            recomputed.add(t)
-                            if len(recomputed) >= k:
-                                break
-            else:
-                tf2 = corpus_tf(tokens_jieba_all, max_len=max_len)
-                items = tf2.most_common(5000)
-                recomputed = set()
-                for t, _ in items:
-                    if len(t) <= max_len and (global_candidates is None or t in global_candidates):
-                        recomputed.add(t)
-                        if len(recomputed) >= k:
-                            break
-
-            print(f"Recomputed anchors: {len(recomputed)} (method={method}, top_k={k}, max_len={max_len}, restricted_to_candidates={global_candidates is not None})")
-            print("first 120 sorted:", sorted(list(recomputed))[:120])
-
-            if activated is not None:
-                inter = activated & recomputed
-                print(f"Activated ∩ recomputed: {len(inter)} ({fmt_pct(len(inter), len(activated))})")
-                print(f"Jaccard(activated, recomputed) = {jaccard(activated, recomputed):.3f}")
+        # DF/TF is a full pass over every stored token list; only pay for it when a section uses it
+        need_full_df = args.deck_df or args.recompute_anchors or global_candidates is not None
+        if not need_full_df:
+            print("\n(DF/TF over your deck skipped; pass --deck-df, --global-anchors or --recompute-anchors)")
+        else:
+            # Compute DF + TF over your deck in one streamed pass (from stored jieba tokens)
+            df, tf, total_docs = corpus_df_tf(iter_jieba_tokens(conn))
+
+            # show top df short tokens
+            top_df = df.most_common(25)
+            print("\nTop tokens by DF (coverage across sentences):")
+            for t, c in top_df:
+                print(f"  - {t}: df={c} ({fmt_pct(c, total_docs)}), tf={tf.get(t,0)}")
+
+            if global_candidates is not None:
+                # top df among candidates (bounded heap; same order as a stable full sort)
+                top_cand = heapq.nlargest(25, global_candidates, key=lambda t: df.get(t, 0))
+                print("\nTop candidate tokens by DF in YOUR deck:")
+                for t in top_cand:
+                    c = df.get(t, 0)
+                    print(f"  - {t}: df={c} ({fmt_pct(c, total_docs)})")
+
+            if args.recompute_anchors:
+                print("\n=== Anchor recomputation (comparison) ===")
+                # recompute using settings, optionally restricted to candidates
+                max_len = args.anchor_max_len
+                method = args.anchor_method
+                k = args.anchors_top_k
+                # DF/TF are per token, so the max_len-capped counts are just the short keys of df/tf
+                counts = df if method == "df" else tf
+                keys = [
+                    t for t in counts
+                    if len(t) <= max_len and (global_candidates is None or t in global_candidates)
+                ]
+                recomputed = set(heapq.nlargest(k, keys, key=counts.__getitem__))
+
+                print(f"Recomputed anchors: {len(recomputed)} (method={method}, top_k={k}, max_len={max_len}, restricted_to_candidates={global_candidates is not None})")
+                print("first 120 sorted:", sorted(list(recomputed))[:120])
+
+                if activated is not None:
+                    inter = activated & recomputed
+                    print(f"Activated ∩ recomputed: {len(inter)} ({fmt_pct(len(inter), len(activated))})")
+                    print(f"Jaccard(activated, recomputed) = {jaccard(activated, recomputed):.3f}")
 
         # --- Random sentence spot-checks
         print("\n=== Random sentence spot-checks ===")
         rows = sample_sentences(conn, args.pairs)
         for r in rows:
-            tj = safe_json_loads(r["tokens_jieba_json"], fallback=[])
-            th = safe_json_loads(r["tokens_hsk_json"], fallback=[])
-            tc = safe_json_loads(r["tokens_char_json"], fallback=[])
-            pats = safe_json_loads(r["patterns_json"], fallback=[])
+            tj, th, tc = decode_token_bundle(conn, r)
+            npat = r["npat"]
+            if not isinstance(npat, int):
+                npat = len(safe_json_loads(npat, fallback=[]))
             print("\n--- id=%s ---" % r["id"])
             print("zh:   ", r["zh_text"])
             print("jieba:", tj)
             print("hsk:  ", th)
             print("char: ", tc)
-            print("patterns:", len(pats), "| skeleton:", r["skeleton"])
+            print("patterns:", npat, "| skeleton:", r["skeleton"])
 
         # --- Pattern health
         print("\n=== Pattern health ===")
-        total_patterns = table_count(conn, "pattern_personal_stats")
-        emerged_patterns = int(conn.execute("SELECT COUNT(*) AS n FROM pattern_personal_stats WHERE emerged=1").fetchone()["n"])
+        total_patterns, emerged_patterns, hist = pattern_summary(conn)
         print("patterns total:  ", total_patterns)
         print("patterns emerged:", emerged_patterns, f"({fmt_pct(emerged_patterns, total_patterns)})")
 
-        hist = pattern_count_hist(conn)
         c1 = hist.get(1, 0)
         c2 = hist.get(2, 0)
         c5 = sum(v for k, v in hist.items() if k >= 5)
@@ -506,23 +693,21 @@ def main() -> None:
 
         print("\nTop emerged patterns (by count_seen) with sample realizations:")
         tops = top_patterns(conn, limit=args.top_patterns, emerged_only=True)
+        samples = sample_realizations(conn, [pr.pattern_key for pr in tops], k=6)
         for pr in tops:
             print(
                 f"\n- {pr.pattern_key} | count_seen={pr.count_seen} "
                 f"distinct_sentences={pr.distinct_sentence_count}"
             )
-            exs = sample_realizations(conn, pr.pattern_key, k=6)
-            for e in exs:
+            for e in samples.get(pr.pattern_key, []):
                 print("    •", e)
 
         # --- Vocab health
         print("\n=== Vocab health (HSK tokens) ===")
-        unk, total = vocab_unknown_ratio(conn)
+        total, unk, one = vocab_summary(conn)
         print(f"vocab total: {total}")
         print(f"vocab with NULL hsk_level (fallback/unknown): {unk} ({fmt_pct(unk, total)})")
-
-        one, total2 = single_char_vocab_count(conn)
-        print(f"Single-character tokens in vocab_stats: {one} ({fmt_pct(one, total2)})")
+        print(f"Single-character tokens in vocab_stats: {one} ({fmt_pct(one, total)})")
 
         print("\nTop vocab tokens by count:")
         for r in top_vocab(conn, k=args.top_vocab):
@@ -554,25 +739,27 @@ def main() -> None:
             add_anchor_spans = not args.no_spans and parse_bool_meta(meta, "add_anchor_spans", False)
             add_span_sigs = not args.no_span_sigs and parse_bool_meta(meta, "add_span_signatures", False)
 
+            # Bind the frozen anchors + extractor config once for every demo sentence
+            extract = functools.partial(
+                extract_patterns_from_tokens,
+                anchors=frozenset(activated),
+                max_ngram_n=max_ngram_n,
+                add_tok_ngrams=add_tok_ngrams,
+                add_anchor_windows=add_anchor_windows,
+                add_skeleton=add_skeleton,
+                add_compressed_skeleton=add_cskel,
+                add_anchor_pairs=add_anchor_pairs,
+                add_anchor_skip2=add_anchor_skip2,
+                add_anchor_skip3=add_anchor_skip3,
+                add_anchor_sequence=add_anchor_sequence,
+                add_anchor_spans=add_anchor_spans,
+                add_span_signatures=add_span_sigs,
+                span_max_gap=span_max_gap,
+                skip_max_jump=skip_max_jump,
+            )
+
             def pats_of(s: str) -> Set[str]:
-                tj = tokenize_words_jieba(s)
-                pats, _ = extract_patterns_from_tokens(
-                    tj,
-                    anchors=activated,
-                    max_ngram_n=max_ngram_n,
-                    add_tok_ngrams=add_tok_ngrams,
-                    add_anchor_windows=add_anchor_windows,
-                    add_skeleton=add_skeleton,
-                    add_compressed_skeleton=add_cskel,
-                    add_anchor_pairs=add_anchor_pairs,
-                    add_anchor_skip2=add_anchor_skip2,
-                    add_anchor_skip3=add_anchor_skip3,
-                    add_anchor_sequence=add_anchor_sequence,
-                    add_anchor_spans=add_anchor_spans,
-                    add_span_signatures=add_span_sigs,
-                    span_max_gap=span_max_gap,
-                    skip_max_jump=skip_max_jump,
-                )
+                pats, _ = extract(tokenize_words_jieba(s))
                 return {p.pattern_key for p in pats}
 
             examples = [
@@ -584,9 +771,9 @@ def main() -> None:
             for A, B in examples:
                 pa = pats_of(A)
                 pb = pats_of(B)
-                j = jaccard(pa, pb)
                 shared = len(pa & pb)
-                union = len(pa | pb)
+                union = len(pa) + len(pb) - shared
+                j = shared / union if union else 1.0
                 print(f"\nA: {A}")
                 print(f"B: {B}")
                 print(f"  Jaccard(pattern_keys) = {j:.3f} | shared={shared} union={union}")
@@ -17,12 +17,15 @@ Usage:
 from __future__ import annotations
 
 import argparse
+import functools
 import json
 import math
+import random
 import sqlite3
+import sys
 from collections import Counter
 from pathlib import Path
-from typing import Dict, List, Optional, Sequence, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
 
 
 # ---------------------------
@@ -46,24 +49,77 @@ def safe_json_loads(s: str, fallback):
     except Exception:
         return fallback
 
-def connect(db_path: Path) -> sqlite3.Connection:
-    conn = sqlite3.connect(str(db_path))
+# Read-only analytical scans: open the file mode=ro, big page cache + mmap.
+READ_PRAGMAS = """
+PRAGMA query_only=ON;
+PRAGMA cache_size=-262144;
+PRAGMA temp_store=MEMORY;
+PRAGMA mmap_size=268435456;
+"""
+
+def connect(db_path: Path, immutable: bool = False) -> sqlite3.Connection:
+    """
+    Read-only connection. `immutable` (only for files nothing else is writing) also skips
+    SQLite's locking and change detection.
+    """
+    uri = Path(db_path).resolve().as_uri() + "?mode=ro" + ("&immutable=1" if immutable else "")
+    conn = sqlite3.connect(uri, uri=True)
     conn.row_factory = sqlite3.Row
+    conn.executescript(READ_PRAGMAS)
     return conn
 
+def begin_snapshot(conn: sqlite3.Connection) -> None:
+    # One read transaction for the whole report: every section sees the same DB state
+    conn.execute("BEGIN DEFERRED")
+
+def iter_tuples(conn: sqlite3.Connection, sql: str, params: Sequence[Any] = (), arraysize: int = 1000) -> Iterator[tuple]:
+    """Stream plain tuples off a cursor (no fetchall, no sqlite3.Row per row)."""
+    cur = conn.cursor()
+    cur.row_factory = None
+    cur.arraysize = arraysize
+    yield from cur.execute(sql, params)
+
+SQLITE_MAX_PARAMS = 999
+
+def has_json1(conn: sqlite3.Connection) -> bool:
+    try:
+        conn.execute("SELECT json_array_length('[]')").fetchone()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+# Connections are read-only, so schema lookups and row counts are cached per report
+@functools.lru_cache(maxsize=None)
 def list_tables(conn: sqlite3.Connection) -> List[str]:
     rows = conn.execute(
         "SELECT name FROM sqlite_master WHERE type='table' ORDER BY name"
     ).fetchall()
     return [r["name"] for r in rows]
 
+@functools.lru_cache(maxsize=None)
 def table_count(conn: sqlite3.Connection, table: str) -> int:
     return int(conn.execute(f"SELECT COUNT(*) AS n FROM {table}").fetchone()["n"])
 
+@functools.lru_cache(maxsize=None)
 def table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
     rows = conn.execute(f"PRAGMA table_info({table})").fetchall()
     return [r[1] for r in rows]
 
+def has_leading_index(conn: sqlite3.Connection, table: str, col: str) -> bool:
+    """True if some index on `table` (incl. PK autoindexes) starts with `col`."""
+    for idx in conn.execute(f"PRAGMA index_list({table})").fetchall():
+        info = conn.execute(f"PRAGMA index_info({idx[1]})").fetchall()
+        if info and info[0][2] == col:
+            return True
+    return False
+
+# (db, table, column) lookups the report relies on; the inspectors are read-only and never create them
+REPORT_INDEXES = [
+    ("prior", "pattern_global_stats", "pattern_key"),
+    ("prior", "pattern_global_stats", "count_sentences"),
+    ("state", "pattern_personal_stats", "emerged"),
+]
+
 def read_meta(conn: sqlite3.Connection) -> Dict[str, str]:
     if "meta" not in set(list_tables(conn)):
         return {}
@@ -82,16 +138,31 @@ def family_from_key(key: str) -> str:
 # Prior DB checks
 # ---------------------------
 
-def quantile_value(conn: sqlite3.Connection, table: str, col: str, q: float) -> int:
-    total = table_count(conn, table)
+def count_distribution(
+    conn: sqlite3.Connection, table: str, col: str, qs: Sequence[float]
+) -> Tuple[int, int, List[int]]:
+    """
+    (row total, rows with col=1, nearest-rank quantiles) of an integer column from one
+    grouped pass (walks the column index when there is one).
+    """
+    rows = conn.execute(f"SELECT {col}, COUNT(*) FROM {table} GROUP BY {col} ORDER BY {col}").fetchall()
+    total = sum(n for _, n in rows)
+    ones = sum(n for v, n in rows if v == 1)
+    out = [0] * len(qs)
     if total <= 0:
-        return 0
-    idx = max(0, int(math.ceil(total * q)) - 1)
-    row = conn.execute(
-        f"SELECT {col} AS c FROM {table} ORDER BY {col} LIMIT 1 OFFSET ?",
-        (idx,),
-    ).fetchone()
-    return int(row["c"]) if row else 0
+        return total, ones, out
+    # 1-based rank of each quantile, visited in ascending order
+    ranks = sorted((max(1, int(math.ceil(total * q))), i) for i, q in enumerate(qs))
+    seen = 0
+    j = 0
+    for v, n in rows:
+        seen += n
+        while j < len(ranks) and ranks[j][0] <= seen:
+            out[ranks[j][1]] = int(v)
+            j += 1
+        if j == len(ranks):
+            break
+    return total, ones, out
 
 def prior_top_patterns(conn: sqlite3.Connection, limit: int = 20) -> List[sqlite3.Row]:
     return conn.execute(
@@ -105,25 +176,115 @@ def prior_top_patterns(conn: sqlite3.Connection, limit: int = 20) -> List[sqlite
     ).fetchall()
 
 
+def coverage_mass(conn: sqlite3.Connection, pattern_keys: Sequence[str]) -> float:
+    """
+    Sum of p_global over pattern_keys via the pattern_key index. With JSON1 the keys travel as
+    one JSON parameter (no per-key placeholder limit); otherwise IN lists are chunked.
+    """
+    sql = "SELECT SUM(p_global) FROM pattern_global_stats WHERE pattern_key IN ({})"
+    if has_json1(conn):
+        keys_json = json.dumps(list(pattern_keys), ensure_ascii=False)
+        row = conn.execute(sql.format("SELECT value FROM json_each(?)"), (keys_json,)).fetchone()
+        return float(row[0] or 0.0)
+    total = 0.0
+    for i in range(0, len(pattern_keys), SQLITE_MAX_PARAMS):
+        part = list(pattern_keys[i:i + SQLITE_MAX_PARAMS])
+        row = conn.execute(sql.format(",".join("?" * len(part))), part).fetchone()
+        total += float(row[0] or 0.0)
+    return total
+
+
 # ---------------------------
 # State DB checks
 # ---------------------------
 
+def _sample_rowids(conn: sqlite3.Connection, table: str, k: int, max_rounds: int = 8) -> List[int]:
+    """
+    Uniform sample of up to k existing rowids without a full-table random sort.
+    Dense rowids: draw ids from [MIN(rowid), MAX(rowid)] and keep the ones that exist
+    (rejection on gaps). Sparse rowids (e.g. the prior's hashed INTEGER PRIMARY KEY): draw
+    k ranks in [0, COUNT) and step to them with OFFSET, in one forward pass over the rowid
+    b-tree (a `rowid >= random` seek would weight each id by the gap before it).
+    """
+    lo, hi, n = conn.execute(f"SELECT MIN(rowid), MAX(rowid), COUNT(*) FROM {table}").fetchone()
+    if not n or k <= 0:
+        return []
+    if n <= k:
+        return [r[0] for r in conn.execute(f"SELECT rowid FROM {table}")]
+
+    span = hi - lo + 1
+    if span > 4 * n:
+        # each step resumes after the previous hit, so the OFFSETs add up to at most n rows
+        step = f"SELECT rowid FROM {table} WHERE rowid >= ? ORDER BY rowid LIMIT 1 OFFSET ?"
+        found: List[int] = []
+        start, prev_rank = lo, -1
+        for rank in sorted(random.sample(range(n), k)):
+            r = conn.execute(step, (start, rank - prev_rank - 1)).fetchone()
+            if r is None:
+                break
+            found.append(r[0])
+            start, prev_rank = r[0] + 1, rank
+        random.shuffle(found)
+        return found
+
+    picked: List[int] = []
+    tried: Set[int] = set()
+    for _ in range(max_rounds):
+        need = k - len(picked)
+        if need <= 0:
+            break
+        # oversample by the gap ratio so one round is usually enough
+        want = min(span, int(need * span / n * 1.25) + 8)
+        draw = [i for i in random.sample(range(lo, hi + 1), want) if i not in tried]
+        tried.update(draw)
+        hits: Set[int] = set()
+        for i in range(0, len(draw), SQLITE_MAX_PARAMS):
+            part = draw[i:i + SQLITE_MAX_PARAMS]
+            qmarks = ",".join("?" * len(part))
+            hits.update(r[0] for r in conn.execute(f"SELECT rowid FROM {table} WHERE rowid IN ({qmarks})", part))
+        # keep draw order so truncating to k stays uniform
+        picked.extend(i for i in draw if i in hits)
+    return picked[:k]
+
+def _iter_col_by_rowids(conn: sqlite3.Connection, table: str, col: str, rowids: Sequence[int]) -> Iterator[Any]:
+    for i in range(0, len(rowids), SQLITE_MAX_PARAMS):
+        part = list(rowids[i:i + SQLITE_MAX_PARAMS])
+        qmarks = ",".join("?" * len(part))
+        for (v,) in iter_tuples(conn, f"SELECT {col} FROM {table} WHERE rowid IN ({qmarks})", part):
+            yield v
+
+def _json_array_or_empty(col: str) -> str:
+    # JSON1 raises on malformed input; route invalid / non-array values to '[]' first
+    return f"CASE WHEN json_valid({col}) THEN CASE WHEN json_type({col}) = 'array' THEN {col} ELSE '[]' END ELSE '[]' END"
+
 def sample_sentence_patterns(conn: sqlite3.Connection, k: int) -> List[List[str]]:
-    rows = conn.execute(
-        """
-        SELECT patterns_json
-        FROM sentences
-        ORDER BY RANDOM()
-        LIMIT ?
-        """,
-        (k,),
-    ).fetchall()
+    rowids = _sample_rowids(conn, "sentences", k)
     out: List[List[str]] = []
-    for r in rows:
-        arr = safe_json_loads(r["patterns_json"], fallback=[])
-        if isinstance(arr, list):
-            out.append([str(x) for x in arr])
+    if not has_json1(conn):
+        for s in _iter_col_by_rowids(conn, "sentences", "patterns_json", rowids):
+            arr = safe_json_loads(s, fallback=[])
+            if isinstance(arr, list):
+                out.append([str(x) for x in arr])
+        return out
+
+    # Unnest in SQLite; malformed JSON counts as an empty list, valid non-arrays are skipped (as above)
+    by_row: Dict[int, List[str]] = {}
+    for i in range(0, len(rowids), SQLITE_MAX_PARAMS):
+        part = list(rowids[i:i + SQLITE_MAX_PARAMS])
+        qmarks = ",".join("?" * len(part))
+        sql = f"""
+            SELECT s.rowid, j.value
+            FROM sentences s
+            LEFT JOIN json_each({_json_array_or_empty("s.patterns_json")}) j
+            WHERE s.rowid IN ({qmarks})
+              AND CASE WHEN json_valid(s.patterns_json) THEN json_type(s.patterns_json) = 'array' ELSE 1 END
+            ORDER BY s.rowid, j.id
+        """
+        for rid, v in iter_tuples(conn, sql, part):
+            pats = by_row.setdefault(rid, [])
+            if v is not None:
+                pats.append(str(v))
+    out.extend(by_row.values())
     return out
 
 def anchor_df_from_sentences(
@@ -131,23 +292,41 @@ def anchor_df_from_sentences(
     anchors: Sequence[str],
     k: int,
 ) -> Counter[str]:
-    rows = conn.execute(
-        """
-        SELECT tokens_jieba_json
-        FROM sentences
-        ORDER BY RANDOM()
-        LIMIT ?
-        """,
-        (k,),
-    ).fetchall()
+    rowids = _sample_rowids(conn, "sentences", k)
     df = Counter()
-    anchors_set = set(anchors)
-    for r in rows:
-        toks = safe_json_loads(r["tokens_jieba_json"], fallback=[])
-        if not isinstance(toks, list):
-            continue
-        present = {t for t in toks if t in anchors_set}
-        df.update(present)
+    if not has_json1(conn):
+        # per-anchor int slots + a per-sentence presence bitmask (no set per sentence)
+        uniq = list(dict.fromkeys(sys.intern(a) for a in anchors))
+        anchor_to_idx = {a: i for i, a in enumerate(uniq)}
+        idx_of = anchor_to_idx.get
+        counts = [0] * len(uniq)
+        for s in _iter_col_by_rowids(conn, "sentences", "tokens_jieba_json", rowids):
+            toks = safe_json_loads(s, fallback=[])
+            if not isinstance(toks, list):
+                continue
+            seen = 0
+            for t in toks:
+                i = idx_of(t) if isinstance(t, str) else None
+                if i is not None and not (seen >> i) & 1:
+                    counts[i] += 1
+                    seen |= 1 << i
+        df.update({a: c for a, c in zip(uniq, counts) if c})
+        return df
+
+    # Only anchor tokens cross back into Python: one (anchor, sentence-count) row per anchor
+    anchors_json = json.dumps(list(anchors), ensure_ascii=False)
+    for i in range(0, len(rowids), SQLITE_MAX_PARAMS - 1):
+        part = list(rowids[i:i + SQLITE_MAX_PARAMS - 1])
+        qmarks = ",".join("?" * len(part))
+        sql = f"""
+            SELECT j.value, COUNT(DISTINCT s.rowid)
+            FROM sentences s, json_each({_json_array_or_empty("s.tokens_jieba_json")}) j
+            WHERE s.rowid IN ({qmarks})
+              AND j.value IN (SELECT value FROM json_each(?))
+            GROUP BY j.value
+        """
+        for a, n in iter_tuples(conn, sql, [*part, anchors_json]):
+            df[a] += n
     return df
 
 
@@ -170,17 +349,24 @@ def load_anchors(path: Optional[Path], meta: Dict[str, str]) -> Optional[List[st
 
 
 def pattern_key_sanity(conn: sqlite3.Connection, table: str, key_col: str, limit: int) -> Tuple[int, int]:
-    rows = conn.execute(
-        f"SELECT {key_col} AS k FROM {table} ORDER BY RANDOM() LIMIT ?",
-        (limit,),
-    ).fetchall()
+    rowids = _sample_rowids(conn, table, limit)
     bad = 0
     total = 0
-    for r in rows:
-        total += 1
-        k = str(r["k"])
-        if not k or "|a=" not in k or "|p=" not in k:
-            bad += 1
+    # validate in SQLite: a key needs both the "|a=" and "|p=" sections
+    for i in range(0, len(rowids), SQLITE_MAX_PARAMS):
+        part = list(rowids[i:i + SQLITE_MAX_PARAMS])
+        qmarks = ",".join("?" * len(part))
+        b, t = conn.execute(
+            f"""
+            SELECT SUM(CASE WHEN instr({key_col}, '|a=') > 0 AND instr({key_col}, '|p=') > 0 THEN 0 ELSE 1 END),
+                   COUNT(*)
+            FROM {table}
+            WHERE rowid IN ({qmarks})
+            """,
+            part,
+        ).fetchone()
+        bad += int(b or 0)
+        total += int(t)
     return bad, total
 
 
@@ -191,7 +377,12 @@ def main() -> None:
     ap.add_argument("--anchors", default="", help="Optional anchors JSON for checks.")
     ap.add_argument("--sample-sentences", type=int, default=200, help="Sample size for sentence checks.")
     ap.add_argument("--sample-keys", type=int, default=1000, help="Sample size for pattern_key sanity checks.")
+    ap.add_argument("--immutable", action="store_true", help="Open both DBs as immutable (only if nothing is writing them).")
     args = ap.parse_args()
+    # Redirected reports are written in one go: block-buffer stdout (flushed at exit). A terminal
+    # keeps line buffering so sections stay in order with the stderr warnings.
+    if hasattr(sys.stdout, "reconfigure") and not sys.stdout.isatty():
+        sys.stdout.reconfigure(line_buffering=False)
 
     prior_path = Path(args.prior_db)
     state_path = Path(args.state_db)
@@ -201,10 +392,12 @@ def main() -> None:
     if not state_path.exists():
         raise FileNotFoundError(f"State DB not found: {state_path}")
 
-    prior = connect(prior_path)
-    state = connect(state_path)
+    prior = connect(prior_path, immutable=args.immutable)
+    state = connect(state_path, immutable=args.immutable)
 
     try:
+        begin_snapshot(prior)
+        begin_snapshot(state)
         print(hr("="))
         print("PIPELINE INSPECTION")
         print(hr("="))
@@ -229,21 +422,27 @@ def main() -> None:
             n = table_count(state, t) if t in state_tables else 0
             print(f"{t:<30} {status:<8} rows={fmt_int(n)}")
 
+        print("\n=== Index coverage ===")
+        dbs = {"prior": (prior, prior_tables), "state": (state, state_tables)}
+        for db, t, col in REPORT_INDEXES:
+            conn, tables = dbs[db]
+            ok = t in tables and has_leading_index(conn, t, col)
+            print(f"{db + ':' + t + '(' + col + ')':<48} {'OK' if ok else 'MISSING'}")
+            if not ok and t in tables:
+                print("   ⚠️ full scans for this lookup; rebuild/re-init the DB with the current schema to add it")
+
         # ---------------------------
         # Prior pattern distribution
         # ---------------------------
         print("\n=== Prior pattern distribution ===")
-        total_patterns = table_count(prior, "pattern_global_stats")
-        singletons = int(
-            prior.execute(
-                "SELECT COUNT(*) AS n FROM pattern_global_stats WHERE count_sentences=1"
-            ).fetchone()["n"]
+        total_patterns, singletons, (p50, p90, p99) = count_distribution(
+            prior, "pattern_global_stats", "count_sentences", (0.50, 0.90, 0.99)
         )
         print(f"patterns total:  {fmt_int(total_patterns)}")
         print(f"singletons:      {fmt_int(singletons)} ({fmt_pct(singletons, total_patterns)})")
-        print(f"p50 count_sentences: {quantile_value(prior, 'pattern_global_stats', 'count_sentences', 0.50)}")
-        print(f"p90 count_sentences: {quantile_value(prior, 'pattern_global_stats', 'count_sentences', 0.90)}")
-        print(f"p99 count_sentences: {quantile_value(prior, 'pattern_global_stats', 'count_sentences', 0.99)}")
+        print(f"p50 count_sentences: {p50}")
+        print(f"p90 count_sentences: {p90}")
+        print(f"p99 count_sentences: {p99}")
 
         print("\nTop patterns by count_sentences:")
         for i, r in enumerate(prior_top_patterns(prior, limit=20), 1):
@@ -259,27 +458,11 @@ def main() -> None:
         # Coverage mass
         # ---------------------------
         print("\n=== Coverage mass (emerged patterns) ===")
-        emerged_rows = state.execute(
-            "SELECT pattern_key FROM pattern_personal_stats WHERE emerged=1"
-        ).fetchall()
-        emerged_keys = [r["pattern_key"] for r in emerged_rows]
+        emerged_keys = [k for (k,) in iter_tuples(state, "SELECT pattern_key FROM pattern_personal_stats WHERE emerged=1")]
         emerged = len(emerged_keys)
         total_personal = table_count(state, "pattern_personal_stats")
 
-        if emerged_keys:
-            qmarks = ",".join(["?"] * len(emerged_keys))
-            rows = prior.execute(
-                f"""
-                SELECT pattern_key, p_global
-                FROM pattern_global_stats
-                WHERE pattern_key IN ({qmarks})
-                """,
-                emerged_keys,
-            ).fetchall()
-            p_map = {r["pattern_key"]: float(r["p_global"] or 0.0) for r in rows}
-            coverage = sum(p_map.get(k, 0.0) for k in emerged_keys)
-        else:
-            coverage = 0.0
+        coverage = coverage_mass(prior, emerged_keys) if emerged_keys else 0.0
 
         print(f"emerged patterns: {fmt_int(emerged)} / {fmt_int(total_personal)}")
         print(f"coverage_mass:    {coverage:.4f}")
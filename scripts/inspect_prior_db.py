@@ -28,12 +28,21 @@ If your DB uses different table/column names, pass:
 from __future__ import annotations
 
 import argparse
+import functools
+import hashlib
 import json
+import random
 import sqlite3
+import sys
 from collections import Counter
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import ahocorasick  # type: ignore
+except Exception:  # optional speedup; per-anchor substring search is the fallback
+    ahocorasick = None
 
 
 # ---------------------------
@@ -62,20 +71,49 @@ def safe_json_loads(s: str, fallback: Any = None) -> Any:
 # DB helpers
 # ---------------------------
 
-def connect(db_path: Path) -> sqlite3.Connection:
-    conn = sqlite3.connect(str(db_path))
+# Read-only analytical scans: open the file mode=ro, big page cache + mmap.
+READ_PRAGMAS = """
+PRAGMA query_only=ON;
+PRAGMA cache_size=-262144;
+PRAGMA temp_store=MEMORY;
+PRAGMA mmap_size=268435456;
+"""
+
+def connect(db_path: Path, immutable: bool = False) -> sqlite3.Connection:
+    """
+    Read-only connection. `immutable` (only for files nothing else is writing) also skips
+    SQLite's locking and change detection.
+    """
+    uri = Path(db_path).resolve().as_uri() + "?mode=ro" + ("&immutable=1" if immutable else "")
+    conn = sqlite3.connect(uri, uri=True)
     conn.row_factory = sqlite3.Row
+    conn.executescript(READ_PRAGMAS)
     return conn
 
+def begin_snapshot(conn: sqlite3.Connection) -> None:
+    # One read transaction for the whole report: every section sees the same DB state
+    conn.execute("BEGIN DEFERRED")
+
+def iter_tuples(conn: sqlite3.Connection, sql: str, params: Sequence[Any] = (), arraysize: int = 1000) -> Iterator[tuple]:
+    """Stream plain tuples off a cursor (no fetchall, no sqlite3.Row per row)."""
+    cur = conn.cursor()
+    cur.row_factory = None
+    cur.arraysize = arraysize
+    yield from cur.execute(sql, params)
+
+# Connections are read-only, so schema lookups and row counts are cached per report
+@functools.lru_cache(maxsize=None)
 def list_tables(conn: sqlite3.Connection) -> List[str]:
     rows = conn.execute(
         "SELECT name FROM sqlite_master WHERE type='table' ORDER BY name"
     ).fetchall()
     return [r["name"] for r in rows]
 
+@functools.lru_cache(maxsize=None)
 def table_count(conn: sqlite3.Connection, table: str) -> int:
     return int(conn.execute(f"SELECT COUNT(*) AS n FROM {table}").fetchone()["n"])
 
+@functools.lru_cache(maxsize=None)
 def table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
     rows = conn.execute(f"PRAGMA table_info({table})").fetchall()
     # columns: (cid, name, type, notnull, dflt_value, pk)
@@ -145,15 +183,16 @@ def read_top_patterns(
     if key_col not in cols or count_sent_col not in cols:
         raise ValueError(f"Stats table '{stats_table}' missing required columns. Has: {sorted(cols)}")
 
-    select_cols = [key_col, count_sent_col]
-    if count_occ_col:
-        select_cols.append(count_occ_col)
-    if div_col:
-        select_cols.append(div_col)
-    if p_global_col:
-        select_cols.append(p_global_col)
-
-    rows = conn.execute(
+    # fixed 5-column shape: absent optional columns become SQL literals
+    select_cols = [
+        key_col,
+        count_sent_col,
+        count_occ_col or "0",
+        div_col or "0",
+        p_global_col or "NULL",
+    ]
+    rows = iter_tuples(
+        conn,
         f"""
         SELECT {", ".join(select_cols)}
         FROM {stats_table}
@@ -161,27 +200,25 @@ def read_top_patterns(
         LIMIT ?
         """,
         (limit,),
-    ).fetchall()
-
-    out: List[PatternRow] = []
-    for r in rows:
-        out.append(
-            PatternRow(
-                pattern_key=str(r[key_col]),
-                count_sentences=int(r[count_sent_col]),
-                count_occurrences=int(r[count_occ_col]) if count_occ_col else 0,
-                distinct_realization_count=int(r[div_col]) if div_col else 0,
-                p_global=float(r[p_global_col]) if p_global_col is not None else None,
-            )
+    )
+    return [
+        PatternRow(
+            pattern_key=str(key),
+            count_sentences=int(cs),
+            count_occurrences=int(occ),
+            distinct_realization_count=int(div),
+            p_global=float(pg) if p_global_col is not None else None,
         )
-    return out
+        for key, cs, occ, div, pg in rows
+    ]
 
 
 def count_histogram(conn: sqlite3.Connection, stats_table: str) -> Counter[int]:
     cols = set(table_columns(conn, stats_table))
     col = "count_sentences" if "count_sentences" in cols else "count"
-    rows = conn.execute(f"SELECT {col} AS c FROM {stats_table}").fetchall()
-    return Counter(int(r["c"]) for r in rows)
+    # aggregate in SQLite: one row per distinct count value instead of one per pattern
+    rows = iter_tuples(conn, f"SELECT {col}, COUNT(*) FROM {stats_table} GROUP BY {col}")
+    return Counter({int(c): int(n) for c, n in rows})
 
 
 def pattern_family(pkey: str) -> str:
@@ -198,9 +235,29 @@ def pattern_family(pkey: str) -> str:
 def family_breakdown(conn: sqlite3.Connection, stats_table: str, top_k: int = 12) -> List[Tuple[str, int]]:
     cols = set(table_columns(conn, stats_table))
     key_col = "pattern_key" if "pattern_key" in cols else "pattern_id"
-    rows = conn.execute(f"SELECT {key_col} AS k FROM {stats_table}").fetchall()
-    c = Counter(pattern_family(r["k"]) for r in rows)
-    return c.most_common(top_k)
+    # Same rule as pattern_family(), evaluated inside SQLite so only one row per family comes back
+    rows = conn.execute(
+        f"""
+        SELECT CASE
+                 WHEN instr({key_col}, '|') > 0 THEN substr({key_col}, 1, instr({key_col}, '|') - 1)
+                 WHEN instr({key_col}, ':') > 0 THEN substr({key_col}, 1, instr({key_col}, ':') - 1)
+                 ELSE 'unknown'
+               END AS fam,
+               COUNT(*) AS n
+        FROM {stats_table}
+        GROUP BY fam
+        ORDER BY n DESC, fam
+        LIMIT ?
+        """,
+        (top_k,),
+    ).fetchall()
+    return [(fam, int(n)) for fam, n in rows]
+
+
+def pattern_key_hash(pattern_key: str) -> int:
+    """store.prior_db.pattern_key_hash (signed 64-bit BLAKE2b), kept here so the script runs standalone."""
+    digest = hashlib.blake2b(pattern_key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
 
 
 def sample_realizations(
@@ -210,21 +267,26 @@ def sample_realizations(
     k: int = 6,
 ) -> List[str]:
     cols = set(table_columns(conn, real_table))
-    key_col = "pattern_key" if "pattern_key" in cols else "pattern_id"
+    if "pkey_hash" in cols:
+        # Current layout: realizations are keyed by the pattern_key hash only
+        key_col, pkey = "pkey_hash", pattern_key_hash(pkey)
+    else:
+        key_col = "pattern_key" if "pattern_key" in cols else "pattern_id"
     if key_col not in cols or "realization" not in cols:
         raise ValueError(f"Realizations table '{real_table}' missing required columns. Has: {sorted(cols)}")
 
-    rows = conn.execute(
-        f"""
-        SELECT realization
-        FROM {real_table}
-        WHERE {key_col} = ?
-        ORDER BY RANDOM()
-        LIMIT ?
-        """,
-        (pkey, k),
-    ).fetchall()
-    return [r["realization"] for r in rows]
+    # Count the pattern's rows via the key index, then seek to k random offsets
+    # (no ORDER BY RANDOM() sort over every realization of the pattern)
+    n = int(conn.execute(f"SELECT COUNT(*) FROM {real_table} WHERE {key_col} = ?", (pkey,)).fetchone()[0])
+    if n <= k:
+        return [real for (real,) in iter_tuples(conn, f"SELECT realization FROM {real_table} WHERE {key_col} = ?", (pkey,))]
+    seek = f"SELECT realization FROM {real_table} WHERE {key_col} = ? LIMIT 1 OFFSET ?"
+    out: List[str] = []
+    for off in random.sample(range(n), k):
+        r = conn.execute(seek, (pkey, off)).fetchone()
+        if r is not None:
+            out.append(r[0])
+    return out
 
 
 def load_anchors(path: Optional[Path]) -> Optional[List[str]]:
@@ -257,13 +319,18 @@ def anchors_presence_quickcheck(
     tops = read_top_patterns(conn, stats_table, limit=200)
     blob = "\n".join(p.pattern_key for p in tops)
 
-    hit = []
-    miss = []
-    for a in anchors[:sample_n]:
-        if a in blob:
-            hit.append(a)
-        else:
-            miss.append(a)
+    checked = anchors[:sample_n]
+    if ahocorasick is not None and checked:
+        # one pass over the blob for all anchors instead of one substring search per anchor
+        automaton = ahocorasick.Automaton()
+        for a in checked:
+            automaton.add_word(a, a)
+        automaton.make_automaton()
+        found = {a for _, a in automaton.iter(blob)}
+    else:
+        found = {a for a in checked if a in blob}
+    hit = [a for a in checked if a in found]
+    miss = [a for a in checked if a not in found]
 
     print("\n=== Anchor presence quick-check (heuristic) ===")
     print(f"Anchors provided: {len(anchors)} (checking first {min(sample_n, len(anchors))})")
@@ -333,14 +400,20 @@ def main() -> None:
     ap.add_argument("--sample-real", type=int, default=6, help="How many realizations to sample per pattern")
     ap.add_argument("--show-realizations", action="store_true", help="Actually print sample realizations")
     ap.add_argument("--family-top", type=int, default=15, help="How many pattern families to show")
+    ap.add_argument("--immutable", action="store_true", help="Open the DB as immutable (only if nothing is writing it)")
     args = ap.parse_args()
+    # Redirected reports are written in one go: block-buffer stdout (flushed at exit). A terminal
+    # keeps line buffering so sections stay in order with the stderr warnings.
+    if hasattr(sys.stdout, "reconfigure") and not sys.stdout.isatty():
+        sys.stdout.reconfigure(line_buffering=False)
 
     db_path = Path(args.db)
     if not db_path.exists():
         raise FileNotFoundError(f"DB not found: {db_path}")
 
-    conn = connect(db_path)
+    conn = connect(db_path, immutable=args.immutable)
     try:
+        begin_snapshot(conn)
         print(hr("="))
         print("PRIOR DB INSPECTION REPORT (paste this back to ChatGPT if you want)")
         print(hr("="))
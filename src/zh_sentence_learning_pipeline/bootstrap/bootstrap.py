@@ -5,13 +5,14 @@ Orchestrates bootstrapping with HSK DB support:
   1) Init SQLite DB schema
   2) Load known Chinese sentences from CSV
   3) Load HSK lexicon from SQLite (chinese_words)
-  4) For each sentence:
-     - tokenize_jieba (grammar)
-     - tokenize_hsk_first (stable vocab units)
-     - tokenize_chars (fallback)
+  4) Pass 1: tokenize_jieba (grammar) for every sentence
   5) Build anchors (GLOBAL or LOCAL; local uses DF by default)
-  6) Extract Layer-B patterns from jieba tokens; update GrammarState
-  7) Write sentences + vocab_stats + pattern_personal_stats to SQLite
+  6) Pass 2, streamed per sentence:
+     - tokenize_hsk_first (stable vocab units)
+     - tokenize_chars (fallback; not stored, recomputed from zh_text on read)
+     - extract Layer-B patterns from jieba tokens; update GrammarState
+     - write the sentence row
+  7) Write vocab_stats + pattern_personal_stats to SQLite
 
 New in this version:
 - Stores anchors + extractor config into meta for reproducibility.
@@ -23,25 +24,85 @@ from __future__ import annotations
 import hashlib
 import json
 import math
+import os
+import sys
+from collections import Counter
 from datetime import datetime, timezone
+from multiprocessing import Pool
 from pathlib import Path
-
-from ..store.db import connect, init_db
+from typing import Callable, Iterator
+
+try:
+    import orjson  # type: ignore
+except Exception:  # optional speedup; stdlib json is the fallback
+    orjson = None
+
+from ..store.db import (
+    char_tokens_required,
+    connect,
+    connect_staged,
+    init_db,
+    tune_for_bulk_write,
+    write_back_staged,
+)
 from ..utils.io import read_csv_column
 
 from ..hsk.lexicon import HSKLexicon
 from ..grammar.tokenize import (
     tokenize_words_jieba,
-    tokenize_words_hsk_first,
+    tokenize_words_hsk_first_many,
     tokenize_chars,
+    use_jieba_backend,
+    use_jieba_fast,
+    use_rjieba,
+    warm_up_hsk,
+    warm_up_jieba,
 )
-from ..grammar.patterns import build_anchor_set, extract_patterns_from_tokens
+from ..grammar.patterns import build_anchor_set, extract_patterns_corpus
 from ..grammar.pattern_key import family_from_key
 from ..grammar.state import GrammarState
-from ..vocab.state import count_vocab
 
 EXTRACTOR_VERSION = "patterns_v4_keyed_core"
 
+# Sentence rows are buffered and written with one executemany per batch.
+INSERT_BATCH = 10_000
+
+INSERT_SENTENCE_SQL = """
+INSERT OR IGNORE INTO sentences(
+    zh_text,
+    tokens_jieba_json,
+    tokens_hsk_json,
+    tokens_char_json,
+    patterns_json,
+    skeleton,
+    source,
+    created_at
+)
+VALUES(?,?,?,?,?,?,?,?)
+"""
+INSERT_VOCAB_SQL = """
+INSERT OR REPLACE INTO vocab_stats(word, count, mastery, last_seen, hsk_level, hsk_frequency)
+VALUES(?,?,?,?,?,?)
+"""
+INSERT_PATTERN_SQL = """
+INSERT OR REPLACE INTO pattern_personal_stats(
+    pattern_key, family, count_seen, distinct_sentence_count, emerged, last_seen_at
+)
+VALUES(?,?,?,?,?,?)
+"""
+INSERT_REALIZATION_SQL = "INSERT OR IGNORE INTO pattern_personal_realizations(pattern_key, realization) VALUES(?,?)"
+
+TOKENIZE_CHUNK = 512
+
+# Per-row JSON columns (token/pattern lists). orjson writes compact JSON, the stdlib fallback
+# json.dumps-style; both decode to the same lists. Meta/config JSON stays on json.dumps, whose
+# exact text is hashed.
+if orjson is not None:
+    def _json_text(value: object) -> str:
+        return orjson.dumps(value).decode("utf-8")
+else:
+    _json_text = json.JSONEncoder(ensure_ascii=False).encode
+
 
 def _load_global_anchors(path: str | Path) -> set[str]:
     path = Path(path)
@@ -65,6 +126,53 @@ def _sha256_text(payload: str) -> str:
     return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
 
+# Per-worker state (set once by the pool initializer, shared via fork on Linux)
+_W_LEX: HSKLexicon | None = None
+_W_WITH_CHARS = False
+
+
+def _init_worker(lex: HSKLexicon, with_chars: bool, jieba_backend: str) -> None:
+    global _W_LEX, _W_WITH_CHARS
+    _W_LEX = lex
+    _W_WITH_CHARS = with_chars
+    # The segmenter choice is a module global: re-apply it (spawned workers start on plain jieba)
+    use_jieba_backend(jieba_backend)
+
+
+def _jieba_chunk(chunk: list[str]) -> list[list[str]]:
+    return [tokenize_words_jieba(s) for s in chunk]
+
+
+def _hsk_chunk(chunk: list[str]) -> list[tuple[list[str], list[str] | None]]:
+    hsk = tokenize_words_hsk_first_many(chunk, _W_LEX)
+    return [(h, tokenize_chars(s) if _W_WITH_CHARS else None) for h, s in zip(hsk, chunk)]
+
+
+def _chunks(items: list[str], n: int) -> Iterator[list[str]]:
+    for i in range(0, len(items), n):
+        yield items[i:i + n]
+
+
+def _map_sentences(fn: Callable, sentences: list[str], workers: int, initargs: tuple) -> Iterator:
+    """
+    fn over TOKENIZE_CHUNK-sized chunks of sentences, flattened back to one result per
+    sentence in input order. workers > 1 runs the chunks in a Pool (imap keeps order).
+    """
+    chunks = _chunks(sentences, TOKENIZE_CHUNK)
+    if workers <= 1:
+        _init_worker(*initargs)
+        for chunk in chunks:
+            yield from fn(chunk)
+        return
+    pool = Pool(workers, initializer=_init_worker, initargs=initargs)
+    try:
+        for res in pool.imap(fn, chunks):
+            yield from res
+    finally:
+        pool.close()
+        pool.join()
+
+
 def bootstrap(
     db_path: str | Path,
     csv_path: str | Path,
@@ -104,9 +212,35 @@ def bootstrap(
     # grammar emergence thresholds (Layer C)
     pattern_min_count_seen: int = 3,
     pattern_min_distinct_sentences: int = 2,
+
+    # stored example realizations per pattern (None = all distinct); counts are unaffected
+    max_realizations_per_pattern: int | None = None,
+
+    # tokenization processes (0 = all CPUs, 1 = in-process); the DB writer stays single-threaded
+    workers: int = 0,
+
+    # write into an in-memory copy of the DB and back it up to db_path once at the end
+    in_memory_staging: bool = False,
+
+    # segment with jieba_fast (Cython build, same algorithm) if installed
+    jieba_fast: bool = False,
+
+    # segment with rjieba (Rust build, same algorithm) if installed; takes precedence over jieba_fast
+    rjieba: bool = False,
+
+    # reuse a pickled copy of the loaded HSK lexicon (<hsk_db_path>.lex.pkl) while the DB is unchanged
+    hsk_lexicon_cache: bool = False,
 ) -> None:
-    conn = connect(db_path)
+    disk = None
+    if in_memory_staging:
+        conn, disk = connect_staged(db_path)
+    else:
+        conn = connect(db_path)
+        tune_for_bulk_write(conn)
     init_db(conn)
+    # Char tokens are a pure function of zh_text, so new DBs store NULL; a sentences table from the
+    # older schema (NOT NULL column) keeps getting the JSON.
+    store_chars = char_tokens_required(conn)
 
     sentences = read_csv_column(csv_path, zh_column)
     now = datetime.now(timezone.utc).isoformat()
@@ -116,20 +250,39 @@ def bootstrap(
         max_level=hsk_max_level,
         include_level7=include_level7,
         table=hsk_table,
+        cache=hsk_lexicon_cache,
     )
 
-    tokens_jieba_all: list[list[str]] = []
-    tokens_hsk_all: list[list[str]] = []
-    tokens_char_all: list[list[str]] = []
-
-    for s in sentences:
-        tj = tokenize_words_jieba(s)
-        th = tokenize_words_hsk_first(s, lex)
-        tc = tokenize_chars(s)
-
-        tokens_jieba_all.append(tj)
-        tokens_hsk_all.append(th)
-        tokens_char_all.append(tc)
+    jieba_backend = "jieba"
+    if rjieba:
+        if use_rjieba():
+            jieba_backend = "rjieba"
+        else:
+            print("⚠️  rjieba not available; using " + ("jieba_fast/jieba" if jieba_fast else "jieba"), file=sys.stderr)
+    if jieba_fast and jieba_backend == "jieba":
+        if use_jieba_fast():
+            jieba_backend = "jieba_fast"
+        else:
+            print("⚠️  jieba_fast not available; using jieba", file=sys.stderr)
+
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
+    # No more processes than chunks (small CSVs stay in-process)
+    workers = min(workers, math.ceil(len(sentences) / TOKENIZE_CHUNK))
+    worker_args = (lex, store_chars, jieba_backend)
+    if workers > 1:
+        # With fork, workers inherit the loaded jieba dictionary + lexicon (with its segmentation
+        # links); spawned workers get the backend name and load them on first use.
+        warm_up_jieba()
+        warm_up_hsk(lex)
+
+    # Pass 1: jieba tokens only (anchors need them for the whole deck). HSK/char tokens are
+    # produced in pass 2, streamed straight into the inserts instead of held for every sentence.
+    # Jieba tokens are interned so the extractor's `t in anchors` checks against the
+    # (interned) anchor set resolve on identity; it also collapses the repeated strings.
+    intern = sys.intern
+    tokens_jieba_all: list[list[str]] = [
+        [intern(t) for t in tj] for tj in _map_sentences(_jieba_chunk, sentences, workers, worker_args)
+    ]
 
     # -----------------------------
     # Anchors (GLOBAL vs LOCAL)
@@ -161,6 +314,8 @@ def bootstrap(
         anchors_source = "local_" + anchor_method
         _meta_put(conn, "anchors_source", anchors_source)
 
+    anchors = {intern(a) for a in anchors}
+
     _meta_put(conn, "anchors_top_k", anchors_top_k)
     _meta_put(conn, "anchor_method", anchor_method)
     _meta_put(conn, "anchor_max_token_len", anchor_max_token_len)
@@ -181,6 +336,7 @@ def bootstrap(
     _meta_put(conn, "bootstrapped_at", now)
     _meta_put(conn, "hsk_db_path", str(hsk_db_path))
     _meta_put(conn, "hsk_table", hsk_table)
+    _meta_put(conn, "jieba_backend", jieba_backend)
     _meta_put(conn, "hsk_max_level", hsk_max_level)
     _meta_put(conn, "include_level7", "1" if include_level7 else "0")
 
@@ -199,6 +355,7 @@ def bootstrap(
     _meta_put(conn, "skip_max_jump", skip_max_jump)
     _meta_put(conn, "pattern_min_count_seen", pattern_min_count_seen)
     _meta_put(conn, "pattern_min_distinct_sentences", pattern_min_distinct_sentences)
+    _meta_put(conn, "max_realizations_per_pattern", max_realizations_per_pattern)
     _meta_put(conn, "extractor_version", EXTRACTOR_VERSION)
 
     config_obj = {
@@ -221,6 +378,7 @@ def bootstrap(
         "skip_max_jump": skip_max_jump,
         "pattern_min_count_seen": pattern_min_count_seen,
         "pattern_min_distinct_sentences": pattern_min_distinct_sentences,
+        "max_realizations_per_pattern": max_realizations_per_pattern,
         "hsk_db_path": str(hsk_db_path),
         "hsk_table": hsk_table,
         "hsk_max_level": hsk_max_level,
@@ -243,93 +401,89 @@ def bootstrap(
     grammar = GrammarState(
         min_count_seen=pattern_min_count_seen,
         min_distinct_sentence_count=pattern_min_distinct_sentences,
+        max_realizations_per_pattern=max_realizations_per_pattern,
     )
 
-    # Insert sentences + patterns, update grammar state
-    for s, tj, th, tc in zip(sentences, tokens_jieba_all, tokens_hsk_all, tokens_char_all):
-        pats, skel = extract_patterns_from_tokens(
-            tj,
-            anchors=anchors,
-            max_ngram_n=max_ngram_n,
-            add_tok_ngrams=add_tok_ngrams,
-            add_anchor_windows=add_anchor_windows,
-            add_skeleton=add_skeleton,
-            add_compressed_skeleton=add_compressed_skeleton,
-            add_anchor_pairs=add_anchor_pairs,
-            add_anchor_skip2=add_anchor_skip2,
-            add_anchor_skip3=add_anchor_skip3,
-            add_anchor_sequence=add_anchor_sequence,
-            add_anchor_spans=add_anchor_spans,
-            add_span_signatures=add_span_signatures,
-            span_max_gap=span_max_gap,
-            skip_max_jump=skip_max_jump,
-        )
-
-        conn.execute(
-            """
-            INSERT OR IGNORE INTO sentences(
-                zh_text,
-                tokens_jieba_json,
-                tokens_hsk_json,
-                tokens_char_json,
-                patterns_json,
-                skeleton,
-                source,
-                created_at
-            )
-            VALUES(?,?,?,?,?,?,?,?)
-            """,
-            (
-                s,
-                json.dumps(tj, ensure_ascii=False),
-                json.dumps(th, ensure_ascii=False),
-                json.dumps(tc, ensure_ascii=False),
-                json.dumps([p.pattern_key for p in pats], ensure_ascii=False),
-                skel,
-                source,
-                now,
-            ),
-        )
-
-        grammar.observe_sentence([(p.pattern_key, p.realization) for p in pats])
-
+    # Pass 2: HSK (+ legacy char) tokens; insert sentences + patterns, update grammar + vocab counts
+    vocab_counts: Counter[str] = Counter()
+    sentence_rows: list[tuple] = []
+    hsk_tokens = _map_sentences(_hsk_chunk, sentences, workers, worker_args)
+    # Repeated token sequences are extracted once (extract_patterns_corpus reuses the result).
+    extracted = extract_patterns_corpus(
+        tokens_jieba_all,
+        anchors=anchors,
+        max_ngram_n=max_ngram_n,
+        add_tok_ngrams=add_tok_ngrams,
+        add_anchor_windows=add_anchor_windows,
+        add_skeleton=add_skeleton,
+        add_compressed_skeleton=add_compressed_skeleton,
+        add_anchor_pairs=add_anchor_pairs,
+        add_anchor_skip2=add_anchor_skip2,
+        add_anchor_skip3=add_anchor_skip3,
+        add_anchor_sequence=add_anchor_sequence,
+        add_anchor_spans=add_anchor_spans,
+        add_span_signatures=add_span_signatures,
+        span_max_gap=span_max_gap,
+        skip_max_jump=skip_max_jump,
+    )
+    for s, tj, (th, tc), (pats, skel) in zip(sentences, tokens_jieba_all, hsk_tokens, extracted):
+        vocab_counts.update(th)
+
+        sentence_rows.append((
+            s,
+            _json_text(tj),
+            _json_text(th),
+            _json_text(tc) if tc is not None else None,
+            _json_text([p.pattern_key for p in pats]),
+            skel,
+            source,
+            now,
+        ))
+        if len(sentence_rows) >= INSERT_BATCH:
+            conn.executemany(INSERT_SENTENCE_SQL, sentence_rows)
+            sentence_rows.clear()
+
+        grammar.observe_sentence(pats)  # Pattern unpacks as (key, realization)
+
+    if sentence_rows:
+        conn.executemany(INSERT_SENTENCE_SQL, sentence_rows)
+        sentence_rows.clear()
     conn.commit()
 
     # Vocab stats (HSK tokens)
-    vocab_counts = count_vocab(tokens_hsk_all)
-    for word, cnt in vocab_counts.items():
-        mastery = math.log1p(cnt)
-        meta = lex.meta(word)
-        hsk_level = meta.level if meta else None
-        hsk_freq = meta.frequency if meta else None
-
-        conn.execute(
-            """
-            INSERT OR REPLACE INTO vocab_stats(word, count, mastery, last_seen, hsk_level, hsk_frequency)
-            VALUES(?,?,?,?,?,?)
-            """,
-            (word, cnt, mastery, now, hsk_level, hsk_freq),
-        )
-
-    # Pattern stats + realizations
-    for pkey, st in grammar.patterns.items():
-        emerged = 1 if st.emerged(grammar.min_count_seen, grammar.min_distinct_sentence_count) else 0
-
-        conn.execute(
-            """
-            INSERT OR REPLACE INTO pattern_personal_stats(
-                pattern_key, family, count_seen, distinct_sentence_count, emerged, last_seen_at
-            )
-            VALUES(?,?,?,?,?,?)
-            """,
-            (pkey, family_from_key(pkey), st.count_seen, st.distinct_sentence_count, emerged, now),
-        )
-
-        for r in st.realizations:
-            conn.execute(
-                "INSERT OR IGNORE INTO pattern_personal_realizations(pattern_key, realization) VALUES(?,?)",
-                (pkey, r),
+    def vocab_rows():
+        for word, cnt in vocab_counts.items():
+            mastery = math.log1p(cnt)
+            meta = lex.meta(word)
+            hsk_level = meta.level if meta else None
+            hsk_freq = meta.frequency if meta else None
+            yield (word, cnt, mastery, now, hsk_level, hsk_freq)
+
+    conn.executemany(INSERT_VOCAB_SQL, vocab_rows())
+
+    # Pattern stats + realizations (executemany streams the generators; nothing is materialized)
+    min_count_seen = grammar.min_count_seen
+    min_distinct = grammar.min_distinct_sentence_count
+    conn.executemany(
+        INSERT_PATTERN_SQL,
+        (
+            (
+                pkey,
+                family_from_key(pkey),
+                st.count_seen,
+                st.distinct_sentence_count,
+                1 if st.emerged(min_count_seen, min_distinct) else 0,
+                now,
             )
+            for pkey, st in grammar.patterns.items()
+        ),
+    )
+    conn.executemany(
+        INSERT_REALIZATION_SQL,
+        ((pkey, r) for pkey, st in grammar.patterns.items() for r in st.realizations or ()),
+    )
 
     conn.commit()
+    if disk is not None:
+        write_back_staged(conn, disk)
     conn.close()
@@ -32,29 +32,74 @@ def coverage_mass(emerged_keys: Iterable[str], p_global_by_key: Mapping[str, flo
     return total
 
 
+def precompute_idf(df_by_key: Mapping[str, int], total_docs: int) -> dict[str, float]:
+    """IDF weight log(total_docs / df) per key; build once per ranking session."""
+    n = float(total_docs)
+    return {key: math.log(n / float(max(1, int(df)))) for key, df in df_by_key.items()}
+
+
+def _idf_of(keys: Iterable[str], df_by_key: Mapping[str, int], total_docs: int) -> dict[str, float]:
+    """IDF weights for just `keys` (missing keys weigh as df=1)."""
+    n = float(total_docs)
+    return {key: math.log(n / float(max(1, int(df_by_key.get(key, 1))))) for key in keys}
+
+
 def idf_weighted_jaccard(
     a: Set[str],
     b: Set[str],
     df_by_key: Mapping[str, int],
     total_docs: int,
+    idf: Mapping[str, float] | None = None,
 ) -> float:
+    """
+    Sum of IDF weights over a & b divided by the sum over a | b.
+    Pass idf=precompute_idf(df_by_key, total_docs) when scoring many pairs; keys
+    missing from df_by_key weigh as df=1.
+    """
     if not a and not b:
         return 1.0
     if not a or not b:
         return 0.0
 
-    denom = 0.0
-    numer = 0.0
     union = a | b
-    inter = a & b
-
-    for key in union:
-        df = max(1, int(df_by_key.get(key, 1)))
-        w = math.log(float(total_docs) / float(df))
-        denom += w
-        if key in inter:
-            numer += w
+    if idf is None:
+        idf = _idf_of(union, df_by_key, total_docs)
+    default_w = math.log(float(total_docs))
+    get = idf.get
 
+    denom = sum([get(key, default_w) for key in union])
     if denom <= 0.0:
         return 0.0
+    numer = sum([get(key, default_w) for key in a & b])
     return numer / denom
+
+
+def idf_weighted_jaccard_many(
+    query: Set[str],
+    candidates: Iterable[Set[str]],
+    df_by_key: Mapping[str, int],
+    total_docs: int,
+    idf: Mapping[str, float] | None = None,
+) -> list[float]:
+    """
+    idf_weighted_jaccard(query, c) for every candidate. The query's weight is computed
+    once; per candidate only its own keys are weighed, and the union weight is
+    w(query) + w(c) - w(query & c). Without idf=, weights are computed only for the
+    keys of the query and candidates.
+    """
+    if idf is None:
+        candidates = list(candidates)
+        idf = _idf_of(query.union(*candidates), df_by_key, total_docs)
+    default_w = math.log(float(total_docs))
+    get = idf.get
+    wq = sum([get(key, default_w) for key in query])
+
+    out: list[float] = []
+    for c in candidates:
+        if not query or not c:
+            out.append(1.0 if not query and not c else 0.0)
+            continue
+        numer = sum([get(key, default_w) for key in query & c])
+        denom = wq + sum([get(key, default_w) for key in c]) - numer
+        out.append(numer / denom if denom > 0.0 else 0.0)
+    return out
@@ -19,6 +19,8 @@ Notes:
 from __future__ import annotations
 
 from dataclasses import dataclass
+from functools import lru_cache
+from operator import itemgetter
 from typing import Iterable, Mapping, Sequence
 
 
@@ -28,13 +30,33 @@ _ESCAPE_TABLE = {
     ",": "\\,",
     "=": "\\=",
 }
+# All four escapes applied in one C-level pass (a backslash is never re-escaped)
+_ESCAPE_MAP = str.maketrans(_ESCAPE_TABLE)
 
 
 def _escape_component(text: str) -> str:
-    out = str(text)
-    for raw, repl in _ESCAPE_TABLE.items():
-        out = out.replace(raw, repl)
-    return out
+    return str(text).translate(_ESCAPE_MAP)
+
+
+# Anchor components come from a small set (activated anchors + "<END>"), so their escaped
+# form is memoized instead of re-translated for every key.
+@lru_cache(maxsize=4096)
+def _escape_anchor(anchor: str) -> str:
+    return str(anchor).translate(_ESCAPE_MAP)
+
+
+# Numeric params and gap buckets take a handful of values per run (e.g. max_jump=10 on every
+# skip-gram key); typed=True keeps True and 1 apart, as str() does.
+@lru_cache(maxsize=1024, typed=True)
+def _escape_param(value: object) -> str:
+    return str(value).translate(_ESCAPE_MAP)
+
+
+@lru_cache(maxsize=256)
+def _family_prefix(family: str) -> str:
+    if "|" in family:
+        raise ValueError(f"PatternKey family contains illegal '|': {family}")
+    return f"{family}|a="
 
 
 def _normalize_params(params: Mapping[str, object] | None) -> tuple[tuple[str, str], ...]:
@@ -57,13 +79,12 @@ class PatternKey:
     params: tuple[tuple[str, str], ...]
 
     def to_string(self) -> str:
-        if "|" in self.family:
-            raise ValueError(f"PatternKey family contains illegal '|': {self.family}")
+        prefix = _family_prefix(self.family)
         anchors_csv = ",".join(_escape_component(a) for a in self.anchors)
         params_csv = ",".join(
             f"{_escape_component(k)}={_escape_component(v)}" for k, v in self.params
         )
-        return f"{self.family}|a={anchors_csv}|p={params_csv}"
+        return f"{prefix}{anchors_csv}|p={params_csv}"
 
 
 def make_key(
@@ -71,12 +92,25 @@ def make_key(
     anchors: Sequence[str] | None = None,
     params: Mapping[str, object] | None = None,
 ) -> str:
-    pk = PatternKey(
-        family=family,
-        anchors=tuple(anchors or ()),
-        params=_normalize_params(params),
-    )
-    return pk.to_string()
+    """
+    Same string as PatternKey(...).to_string(), built directly: this runs for every
+    emitted pattern, so it skips the intermediate dataclass and params tuple.
+    """
+    params_csv = ""
+    if params:
+        items = []
+        for k, v in params.items():
+            key = str(k).strip()
+            if key == "":
+                raise ValueError("PatternKey param key cannot be empty.")
+            items.append((key, v))
+        if len(items) > 1:
+            items.sort(key=itemgetter(0))
+        params_csv = ",".join([
+            f"{k.translate(_ESCAPE_MAP)}={str(v).translate(_ESCAPE_MAP)}" for k, v in items
+        ])
+    anchors_csv = ",".join([_escape_anchor(a) for a in anchors]) if anchors else ""
+    return f"{_family_prefix(family)}{anchors_csv}|p={params_csv}"
 
 
 def family_from_key(pattern_key: str) -> str:
@@ -88,29 +122,24 @@ def family_from_key(pattern_key: str) -> str:
 # -------------------------
 # Family-specific helpers
 # -------------------------
+# These run once per emitted pattern, so each one formats its fixed shape directly:
+# the family is a constant and the param names are constant and already sorted.
+# The result is exactly make_key(family, anchors, params).
+
+def _anchors_csv(anchors_in_order: Sequence[str]) -> str:
+    return ",".join([_escape_anchor(a) for a in anchors_in_order])
+
 
 def key_skeleton(skeleton_sig: str, anchors_in_order: Sequence[str]) -> str:
-    return make_key(
-        family="skel",
-        anchors=anchors_in_order,
-        params={"sig": skeleton_sig},
-    )
+    return f"skel|a={_anchors_csv(anchors_in_order)}|p=sig={_escape_component(skeleton_sig)}"
 
 
 def key_compressed_skeleton(skeleton_sig: str, anchors_in_order: Sequence[str]) -> str:
-    return make_key(
-        family="cskel",
-        anchors=anchors_in_order,
-        params={"sig": skeleton_sig},
-    )
+    return f"cskel|a={_anchors_csv(anchors_in_order)}|p=sig={_escape_component(skeleton_sig)}"
 
 
 def key_anchor_pair(a1: str, a2: str, gap_bucket: str) -> str:
-    return make_key(
-        family="anch_pair",
-        anchors=[a1, a2],
-        params={"gap": gap_bucket},
-    )
+    return f"anch_pair|a={_escape_anchor(a1)},{_escape_anchor(a2)}|p=gap={_escape_param(gap_bucket)}"
 
 
 def key_anchor_window(
@@ -119,49 +148,37 @@ def key_anchor_window(
     left_len: int,
     right_len: int,
 ) -> str:
-    return make_key(
-        family="anch_win",
-        anchors=anchors_in_order,
-        params={"l": left_len, "r": right_len, "sig": window_sig},
+    return (
+        f"anch_win|a={_anchors_csv(anchors_in_order)}"
+        f"|p=l={_escape_param(left_len)},r={_escape_param(right_len)},"
+        f"sig={_escape_component(window_sig)}"
     )
 
 
 def key_anchor_skip(anchors_in_order: Sequence[str], max_jump: int) -> str:
-    family = f"a_skip{len(anchors_in_order)}"
-    return make_key(
-        family=family,
-        anchors=anchors_in_order,
-        params={"max_jump": max_jump},
+    return (
+        f"a_skip{len(anchors_in_order)}|a={_anchors_csv(anchors_in_order)}"
+        f"|p=max_jump={_escape_param(max_jump)}"
     )
 
 
 def key_anchor_sequence(anchors_in_order: Sequence[str]) -> str:
-    return make_key(
-        family="anch_seq",
-        anchors=anchors_in_order,
-        params=None,
-    )
+    return f"anch_seq|a={_anchors_csv(anchors_in_order)}|p="
 
 
 def key_token_ngram(slot_sig: str, anchors_in_order: Sequence[str], n: int) -> str:
-    return make_key(
-        family="tok_ng",
-        anchors=anchors_in_order,
-        params={"n": n, "sig": slot_sig},
+    return (
+        f"tok_ng|a={_anchors_csv(anchors_in_order)}"
+        f"|p=n={_escape_param(n)},sig={_escape_component(slot_sig)}"
     )
 
 
 def key_anchor_span(a1: str, tail: str, gap_bucket: str) -> str:
-    return make_key(
-        family="anch_span",
-        anchors=[a1, tail],
-        params={"gap": gap_bucket},
-    )
+    return f"anch_span|a={_escape_anchor(a1)},{_escape_anchor(tail)}|p=gap={_escape_param(gap_bucket)}"
 
 
 def key_span_signature(a1: str, tail: str, gap_bucket: str, kA: int, kX: int) -> str:
-    return make_key(
-        family="span_sig",
-        anchors=[a1, tail],
-        params={"gap": gap_bucket, "kA": kA, "kX": kX},
+    return (
+        f"span_sig|a={_escape_anchor(a1)},{_escape_anchor(tail)}"
+        f"|p=gap={_escape_param(gap_bucket)},kA={_escape_param(kA)},kX={_escape_param(kX)}"
     )
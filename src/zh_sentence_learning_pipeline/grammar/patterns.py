@@ -47,9 +47,9 @@ Notes on controlling explosion:
 
 from __future__ import annotations
 
-from dataclasses import dataclass
 from collections import Counter
-from typing import Iterable, List, Set, Tuple
+from itertools import accumulate, chain
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Sequence, Set, Tuple
 import re
 
 from .pattern_key import (
@@ -65,8 +65,9 @@ from .pattern_key import (
 )
 
 
-@dataclass(frozen=True)
-class Pattern:
+class Pattern(NamedTuple):
+    # A NamedTuple (one tuple allocation) rather than a frozen dataclass: extraction builds
+    # one per emitted pattern. Callers may use the attributes or unpack (key, realization).
     pattern_key: str
     realization: str
 
@@ -81,6 +82,7 @@ def build_anchor_set(
     method: str = "df",
     max_token_len: int = 2,
     allowed: Set[str] | None = None,
+    max_tracked: int | None = None,
 ) -> Set[str]:
     """
     Anchors = short, high-coverage tokens that tend to be structural "glue".
@@ -91,29 +93,66 @@ def build_anchor_set(
     method:
     - "tf": total frequency across corpus
     - "df": document frequency (#sentences containing token) (recommended)
+
+    max_tracked: None counts every token exactly. For corpora whose vocabulary does not fit
+    in memory, an int (>= top_k) bounds the counts to that many tokens with a Misra-Gries
+    summary (approximate: counts are low by at most N / (max_tracked + 1)).
     """
     if method not in {"tf", "df"}:
         raise ValueError(f"Unknown method={method}. Use 'tf' or 'df'.")
+    if max_tracked is not None and max_tracked < top_k:
+        raise ValueError(f"max_tracked={max_tracked} must be >= top_k={top_k}.")
+
+    if max_tracked is not None:
+        def eligible(t: str) -> bool:
+            return len(t) <= max_token_len and (allowed is None or t in allowed)
 
-    def ok(t: str) -> bool:
-        if len(t) > max_token_len:
-            return False
-        if allowed is not None and t not in allowed:
-            return False
-        return True
+        if method == "tf":
+            stream = filter(eligible, chain.from_iterable(corpus_tokens))
+        else:
+            stream = chain.from_iterable({t for t in sent if eligible(t)} for sent in corpus_tokens)
+        return set(t for t, _ in _misra_gries(stream, max_tracked).most_common(top_k))
 
     if method == "tf":
-        tf = Counter(t for sent in corpus_tokens for t in sent if ok(t))
+        # Count every token in C, then keep the eligible ones (insertion order, and so
+        # most_common tie-breaking, is unchanged by filtering afterwards).
+        tf = Counter(chain.from_iterable(corpus_tokens))
+        tf = Counter({
+            t: c for t, c in tf.items()
+            if len(t) <= max_token_len and (allowed is None or t in allowed)
+        })
         return set(t for t, _ in tf.most_common(top_k))
 
-    # method == "df"
-    df = Counter()
-    for sent in corpus_tokens:
-        short_unique = {t for t in sent if ok(t)}
-        df.update(short_unique)
+    # method == "df": one Counter pass over the per-sentence sets of eligible tokens.
+    # (A factorize + bincount version is slower: mapping the strings to codes costs more
+    # than this C-level counting, and argpartition would lose most_common's tie order.)
+    if allowed is None:
+        short_unique = ({t for t in sent if len(t) <= max_token_len} for sent in corpus_tokens)
+    else:
+        short_unique = (
+            {t for t in sent if len(t) <= max_token_len and t in allowed} for sent in corpus_tokens
+        )
+    df = Counter(chain.from_iterable(short_unique))
     return set(t for t, _ in df.most_common(top_k))
 
 
+def _misra_gries(items: Iterable[str], capacity: int) -> Counter[str]:
+    """
+    Misra-Gries heavy hitters in O(capacity) memory. Every item whose true count exceeds
+    N / (capacity + 1) survives, and each kept count is low by at most that much.
+    """
+    counts: Dict[str, int] = {}
+    for t in items:
+        if t in counts:
+            counts[t] += 1
+        elif len(counts) < capacity:
+            counts[t] = 1
+        else:
+            # full: the new item and every tracked count go down by one (amortized O(1))
+            counts = {k: c - 1 for k, c in counts.items() if c > 1}
+    return Counter(counts)
+
+
 # -------------------------
 # Token utilities
 # -------------------------
@@ -124,6 +163,8 @@ def ngrams(tokens: List[str], n: int) -> Iterable[Tuple[str, ...]]:
 
 
 _NUM_RE = re.compile(r"\d+(\.\d+)?")
+# \d is exactly str.isdecimal (Unicode Nd), so a token can only be <NUM> if t[:1].isdecimal();
+# that C-level check keeps the regex off the (mostly Chinese) non-numeric tokens.
 
 
 # -------------------------
@@ -131,11 +172,15 @@ _NUM_RE = re.compile(r"\d+(\.\d+)?")
 # -------------------------
 
 def skeletonize(tokens: List[str], anchors: Set[str]) -> str:
+    return _skeletonize(tokens, [t in anchors for t in tokens])
+
+
+def _skeletonize(tokens: List[str], is_anchor: List[bool]) -> str:
     out: List[str] = []
-    for t in tokens:
-        if t in anchors:
+    for t, anc in zip(tokens, is_anchor):
+        if anc:
             out.append(t)
-        elif _NUM_RE.fullmatch(t):
+        elif t[:1].isdecimal() and _NUM_RE.fullmatch(t):
             out.append("<NUM>")
         elif len(t) == 1:
             out.append("<C1>")
@@ -152,11 +197,15 @@ def skeletonize_compressed(tokens: List[str], anchors: Set[str]) -> str:
     - keep anchors as-is
     - collapse any run of non-anchor tokens into <SPAN>
     """
+    return _skeletonize_compressed(tokens, [t in anchors for t in tokens])
+
+
+def _skeletonize_compressed(tokens: List[str], is_anchor: List[bool]) -> str:
     out: List[str] = []
     in_span = False
 
-    for t in tokens:
-        if t in anchors:
+    for t, anc in zip(tokens, is_anchor):
+        if anc:
             out.append(t)
             in_span = False
         else:
@@ -164,30 +213,31 @@ def skeletonize_compressed(tokens: List[str], anchors: Set[str]) -> str:
                 out.append("<SPAN>")
                 in_span = True
 
-    # trim leading/trailing <SPAN>
-    while out and out[0] == "<SPAN>":
-        out.pop(0)
-    while out and out[-1] == "<SPAN>":
-        out.pop()
+    # trim leading/trailing <SPAN> (by index: no list shifting); compared by value, so an
+    # anchor spelled "<SPAN>" is trimmed the same way
+    lo, hi = 0, len(out)
+    while lo < hi and out[lo] == "<SPAN>":
+        lo += 1
+    while hi > lo and out[hi - 1] == "<SPAN>":
+        hi -= 1
 
-    return " ".join(out)
+    return " ".join(out[lo:hi])
 
 
 # -------------------------
 # Gap bucketing
 # -------------------------
 
+# Gap buckets for 0 <= g < 8 (8+ beyond); small buckets so lengths collapse into shared
+# patterns. Hot loops with g >= 0 index this directly instead of calling _bucket_gap.
+_GAP_BUCKETS = ("0", "1", "2-3", "2-3", "4-7", "4-7", "4-7", "4-7")
+
+
 def _bucket_gap(g: int) -> str:
-    # small buckets so lengths collapse into shared patterns
-    if g == 0:
-        return "0"
-    if g == 1:
-        return "1"
-    if g <= 3:
-        return "2-3"
-    if g <= 7:
-        return "4-7"
-    return "8+"
+    if 0 <= g < 8:
+        return _GAP_BUCKETS[g]
+    # a negative gap (only from a negative max_gap) has always landed in the <= 3 bucket
+    return "8+" if g > 0 else "2-3"
 
 
 def _anchor_sequence(tokens: List[str], anchors: Set[str]) -> List[Tuple[str, int]]:
@@ -204,9 +254,11 @@ def _anchor_skipgrams(
     max_jump: int = 10,
     add_bigrams: bool = True,
     add_trigrams: bool = True,
+    seq: List[Tuple[str, int]] | None = None,
 ) -> list[Pattern]:
     extracted: list[Pattern] = []
-    seq = _anchor_sequence(tokens, anchors)
+    if seq is None:
+        seq = _anchor_sequence(tokens, anchors)
 
     # 2-anchor skip-grams
     if add_bigrams:
@@ -241,33 +293,33 @@ def _anchor_span_patterns(
     tokens: List[str],
     anchors: Set[str],
     max_gap: int = 20,
+    seq: List[Tuple[str, int]] | None = None,
 ) -> list[Pattern]:
     """
     For each anchor token t, look forward to the NEXT anchor within max_gap.
     This is a "local long-distance" family.
+
+    The next anchor is the following entry of the anchor sequence (seq), so each
+    span is resolved in O(1) instead of scanning up to max_gap tokens.
     """
     extracted: list[Pattern] = []
     n = len(tokens)
+    if seq is None:
+        seq = _anchor_sequence(tokens, anchors)
 
-    for i, t in enumerate(tokens):
-        if t not in anchors:
-            continue
-
-        tail = "<END>"
-        tail_pos = None
-
+    # the next anchor after seq[k] is seq[k + 1]; it is the tail if it lies inside the window
+    for k, (t, i) in enumerate(seq):
         j_limit = min(n, i + 1 + max_gap)
-        for j in range(i + 1, j_limit):
-            if tokens[j] in anchors:
-                tail = tokens[j]
-                tail_pos = j
-                break
-
-        gap = (tail_pos - i - 1) if tail_pos is not None else min(max_gap, n - i - 1)
-        gapb = _bucket_gap(gap)
+        if k + 1 < len(seq) and seq[k + 1][1] < j_limit:
+            tail, tail_pos = seq[k + 1]
+            gap = tail_pos - i - 1
+            end = tail_pos + 1
+        else:
+            tail = "<END>"
+            gap = min(max_gap, n - i - 1)
+            end = j_limit
 
-        pkey = key_anchor_span(t, tail, gapb)
-        end = (tail_pos + 1) if tail_pos is not None else j_limit
+        pkey = key_anchor_span(t, tail, _bucket_gap(gap))
         realization = " ".join(tokens[i:end])
         extracted.append(Pattern(pkey, realization))
 
@@ -278,38 +330,42 @@ def _span_signature_patterns(
     tokens: List[str],
     anchors: Set[str],
     max_gap: int = 20,
+    seq: List[Tuple[str, int]] | None = None,
 ) -> list[Pattern]:
     """
     Like anch_span, but includes a coarse interior signature:
     how many anchors (kA) and non-anchors (kX) are inside the span.
+    The tail is resolved from seq as in _anchor_span_patterns; the interior then
+    never holds an anchor, so kA needs no count.
     """
     extracted: list[Pattern] = []
     n = len(tokens)
+    if seq is None:
+        seq = _anchor_sequence(tokens, anchors)
 
-    for i, t in enumerate(tokens):
-        if t not in anchors:
-            continue
-
-        tail = "<END>"
-        tail_pos = None
-
+    for k, (t, i) in enumerate(seq):
         j_limit = min(n, i + 1 + max_gap)
-        for j in range(i + 1, j_limit):
-            if tokens[j] in anchors:
-                tail = tokens[j]
-                tail_pos = j
-                break
-
-        end = (tail_pos if tail_pos is not None else j_limit)
-        inside = tokens[i + 1 : end]
-
-        kA = sum(1 for x in inside if x in anchors)
-        kX = len(inside) - kA
-        gap = len(inside)
+        if k + 1 < len(seq) and seq[k + 1][1] < j_limit:
+            tail, tail_pos = seq[k + 1]
+            end = tail_pos
+            stop = tail_pos + 1
+        else:
+            tail = "<END>"
+            end = stop = j_limit
+
+        if end > i:
+            # the span ends at the first anchor after t, so its interior never holds one
+            kA, kX = 0, end - i - 1
+        else:
+            # only with a negative max_gap; keep the slice semantics
+            inside = tokens[i + 1 : end]
+            kA = sum(1 for x in inside if x in anchors)
+            kX = len(inside) - kA
+        gap = kA + kX
         gapb = _bucket_gap(gap)
 
         pkey = key_span_signature(t, tail, gapb, kA=kA, kX=kX)
-        realization = " ".join(tokens[i : (tail_pos + 1 if tail_pos is not None else j_limit)])
+        realization = " ".join(tokens[i:stop])
         extracted.append(Pattern(pkey, realization))
 
     return extracted
@@ -319,6 +375,7 @@ def _anchor_pair_patterns(
     tokens: List[str],
     anchors: Set[str],
     max_gap: int = 20,
+    seq: List[Tuple[str, int]] | None = None,
 ) -> list[Pattern]:
     """
     NEW:
@@ -330,16 +387,18 @@ def _anchor_pair_patterns(
     without hardcoding those words.
     """
     extracted: list[Pattern] = []
-    seq = _anchor_sequence(tokens, anchors)  # [(anchor, index), ...]
+    if seq is None:
+        seq = _anchor_sequence(tokens, anchors)  # [(anchor, index), ...]
 
+    buckets = _GAP_BUCKETS
     for a in range(len(seq)):
         A1, i1 = seq[a]
         for b in range(a + 1, len(seq)):
             A2, i2 = seq[b]
-            gap = i2 - i1 - 1
+            gap = i2 - i1 - 1  # >= 0: positions are strictly increasing
             if gap > max_gap:
                 break  # indices increase, so further anchors only increase gap
-            pkey = key_anchor_pair(A1, A2, _bucket_gap(gap))
+            pkey = key_anchor_pair(A1, A2, buckets[gap] if gap < 8 else "8+")
             realization = " ".join(tokens[i1 : i2 + 1])
             extracted.append(Pattern(pkey, realization))
 
@@ -349,13 +408,14 @@ def _anchor_pair_patterns(
 def _anchor_sequence_signature(
     tokens: List[str],
     anchors: Set[str],
+    anchors_in_order: List[str] | None = None,
 ) -> list[Pattern]:
     """
     NEW:
     Ordered anchor signature of the sentence: anch_seq:a->b->c...
     Useful when anchor order defines the construction.
     """
-    seq = [t for t in tokens if t in anchors]
+    seq = anchors_in_order if anchors_in_order is not None else [t for t in tokens if t in anchors]
     if len(seq) < 2:
         return []
     pkey = key_anchor_sequence(seq)
@@ -387,69 +447,78 @@ def extract_patterns_from_tokens(
 ) -> tuple[list[Pattern], str]:
     extracted: list[Pattern] = []
 
+    # Anchor membership is resolved once per sentence; every family below reads these.
+    is_anchor = [t in anchors for t in tokens]
+    seq = [(t, i) for i, t in enumerate(tokens) if is_anchor[i]]  # [(anchor, index), ...]
+    sentence_anchors = [t for t, _ in seq]
+    if add_tok_ngrams or add_anchor_windows:
+        # anchor-specific slots (non-anchors -> <X>), shared by n-grams and windows
+        slots = [t if anc else "<X>" for t, anc in zip(tokens, is_anchor)]
+        # n_before[k] = anchors among tokens[:k]; the anchors of tokens[i:j] are
+        # sentence_anchors[n_before[i]:n_before[j]]
+        n_before = list(accumulate(is_anchor, initial=0))
+
     # 1) token n-grams (anchor-specific slots to avoid mega collapse)
     if add_tok_ngrams:
-        def slot(tok: str) -> str:
-            return tok if tok in anchors else "<X>"
-
         for n in range(2, max_ngram_n + 1):
-            for ng in ngrams(tokens, n):
-                if any(t in anchors for t in ng):
-                    sig = " ".join(slot(t) for t in ng)
-                    anchors_in_order = [t for t in ng if t in anchors]
+            for i in range(len(tokens) - n + 1):
+                lo, hi = n_before[i], n_before[i + n]
+                if hi > lo:
+                    sig = " ".join(slots[i : i + n])
+                    anchors_in_order = sentence_anchors[lo:hi]
                     pkey = key_token_ngram(sig, anchors_in_order, n=n)
-                    extracted.append(Pattern(pkey, " ".join(ng)))
+                    extracted.append(Pattern(pkey, " ".join(tokens[i : i + n])))
 
     # 2) anchor window patterns (±2)
     if add_anchor_windows:
-        def ph(x: str) -> str:
-            return x if x in anchors else "<X>"
-
-        for i, t in enumerate(tokens):
-            if t in anchors:
-                left = tokens[max(0, i - 2) : i]
-                right = tokens[i + 1 : i + 3]
-                sig_tokens = [ph(x) for x in left + [t] + right]
-                sig = " ".join(sig_tokens)
+        # window anchors are read off the signature, where an "<X>" anchor would also match
+        placeholder_is_anchor = "<X>" in anchors
+        n_tokens = len(tokens)
+
+        for t, i in seq:
+            lo = max(0, i - 2)
+            hi = min(n_tokens, i + 3)
+            sig_tokens = slots[lo:hi]
+            if placeholder_is_anchor:
                 anchors_in_order = [x for x in sig_tokens if x in anchors]
-                pkey = key_anchor_window(
-                    window_sig=sig,
-                    anchors_in_order=anchors_in_order,
-                    left_len=len(left),
-                    right_len=len(right),
-                )
-                extracted.append(Pattern(pkey, " ".join(left + [t] + right)))
+            else:
+                anchors_in_order = sentence_anchors[n_before[lo] : n_before[hi]]
+            pkey = key_anchor_window(
+                window_sig=" ".join(sig_tokens),
+                anchors_in_order=anchors_in_order,
+                left_len=i - lo,
+                right_len=hi - i - 1,
+            )
+            extracted.append(Pattern(pkey, " ".join(tokens[lo:hi])))
 
     # 3) anchor-to-anchor pairs (any later anchor within max gap)
     if add_anchor_pairs:
-        extracted.extend(_anchor_pair_patterns(tokens, anchors, max_gap=span_max_gap))
+        extracted.extend(_anchor_pair_patterns(tokens, anchors, max_gap=span_max_gap, seq=seq))
 
     # 4) anchor-sequence signature (ordered anchors)
     if add_anchor_sequence:
-        extracted.extend(_anchor_sequence_signature(tokens, anchors))
+        extracted.extend(_anchor_sequence_signature(tokens, anchors, anchors_in_order=sentence_anchors))
 
     # 5) original skeleton
-    skel = skeletonize(tokens, anchors)
+    skel = _skeletonize(tokens, is_anchor)
     if add_skeleton:
-        anchors_in_order = [t for t in tokens if t in anchors]
-        pkey = key_skeleton(skel, anchors_in_order)
+        pkey = key_skeleton(skel, sentence_anchors)
         extracted.append(Pattern(pkey, " ".join(tokens)))
 
     # 6) compressed skeleton
     if add_compressed_skeleton:
-        cskel = skeletonize_compressed(tokens, anchors)
+        cskel = _skeletonize_compressed(tokens, is_anchor)
         if cskel:
-            anchors_in_order = [t for t in tokens if t in anchors]
-            pkey = key_compressed_skeleton(cskel, anchors_in_order)
+            pkey = key_compressed_skeleton(cskel, sentence_anchors)
             extracted.append(Pattern(pkey, " ".join(tokens)))
 
     # 7) anchor-span patterns (next-anchor)
     if add_anchor_spans:
-        extracted.extend(_anchor_span_patterns(tokens, anchors, max_gap=span_max_gap))
+        extracted.extend(_anchor_span_patterns(tokens, anchors, max_gap=span_max_gap, seq=seq))
 
     # 8) span signatures (next-anchor + interior shape)
     if add_span_signatures:
-        extracted.extend(_span_signature_patterns(tokens, anchors, max_gap=span_max_gap))
+        extracted.extend(_span_signature_patterns(tokens, anchors, max_gap=span_max_gap, seq=seq))
 
     # 9) anchor skip-grams (anchor-only sequence)
     if add_anchor_skip2 or add_anchor_skip3:
@@ -460,7 +529,37 @@ def extract_patterns_from_tokens(
                 max_jump=skip_max_jump,
                 add_bigrams=add_anchor_skip2,
                 add_trigrams=add_anchor_skip3,
+                seq=seq,
             )
         )
 
     return extracted, skel
+
+
+def extract_patterns_corpus(
+    corpus_tokens: Sequence[List[str]],
+    anchors: Set[str],
+    **extract_kwargs: Any,
+) -> Iterator[tuple[list[Pattern], str]]:
+    """
+    extract_patterns_from_tokens for every sentence of a corpus, in corpus order.
+
+    Extraction is a pure function of (tokens, anchors, options), so repeated token
+    sequences reuse the first result (patterns and skeleton alike) instead of being
+    re-extracted. Only sequences that still have repeats ahead are kept in memory.
+    The yielded lists are shared between repeats; callers must not mutate them.
+    """
+    uses = Counter(tuple(tokens) for tokens in corpus_tokens)
+    cache: Dict[Tuple[str, ...], tuple[list[Pattern], str]] = {}
+
+    for tokens in corpus_tokens:
+        key = tuple(tokens)
+        out = cache.get(key)
+        if out is None:
+            out = extract_patterns_from_tokens(tokens, anchors, **extract_kwargs)
+        uses[key] -= 1
+        if uses[key] > 0:
+            cache[key] = out
+        else:
+            cache.pop(key, None)
+        yield out
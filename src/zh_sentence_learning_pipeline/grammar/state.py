@@ -9,24 +9,37 @@ Key idea:
 
 Emergence rule:
 - emerged if count_seen >= min_count_seen AND distinct_sentence_count >= min_distinct_sentence_count
+
+Realizations are example strings only (emergence never reads them); max_realizations_per_pattern
+bounds how many distinct ones each pattern keeps (the first seen), so memory stops growing with
+one-off realizations.
+
+With track_after_emergence=False a pattern's stats freeze once it has emerged (after the sentence
+that made it emerge); later occurrences are skipped. Emergence is unaffected, but count_seen /
+distinct_sentence_count then stop at their emergence-time values.
 """
 
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass
 from collections import defaultdict
-from typing import Dict, Iterable, Set
+from typing import Dict, Iterable, Optional, Set
 
 
-@dataclass
+@dataclass(slots=True)
 class PatternStats:
   count_seen: int = 0
   distinct_sentence_count: int = 0
-  realizations: Set[str] = field(default_factory=set)
+  # None until the first stored realization (no empty set per pattern, e.g. with a cap of 0)
+  realizations: Optional[Set[str]] = None
 
-  def observe_occurrence(self, realization: str) -> None:
+  def observe_occurrence(self, realization: str, max_realizations: int | None = None) -> None:
     self.count_seen += 1
-    if realization:
+    if not realization or max_realizations == 0:
+      return
+    if self.realizations is None:
+      self.realizations = {realization}
+    elif max_realizations is None or len(self.realizations) < max_realizations:
       self.realizations.add(realization)
 
   def observe_sentence(self) -> None:
@@ -50,10 +63,19 @@ class GrammarState:
     self,
     min_count_seen: int = 3,
     min_distinct_sentence_count: int = 2,
+    max_realizations_per_pattern: int | None = None,
+    track_after_emergence: bool = True,
   ) -> None:
     self.patterns: Dict[str, PatternStats] = defaultdict(PatternStats)
     self.min_count_seen = int(min_count_seen)
     self.min_distinct_sentence_count = int(min_distinct_sentence_count)
+    # None keeps every distinct realization
+    self.max_realizations_per_pattern = (
+      None if max_realizations_per_pattern is None else max(0, int(max_realizations_per_pattern))
+    )
+    self.track_after_emergence = bool(track_after_emergence)
+    # keys of emerged patterns whose stats are frozen (only filled when not tracking after emergence)
+    self.frozen: Set[str] = set()
 
   def observe_sentence(self, patterns: Iterable[tuple[str, str]]) -> None:
     """
@@ -61,15 +83,35 @@ class GrammarState:
     - count_seen increments per occurrence
     - distinct_sentence_count increments once per pattern per sentence
     """
-    seen_in_sentence: Set[str] = set()
-
+    stats = self.patterns
+    cap = self.max_realizations_per_pattern
+    frozen = self.frozen
+    # this sentence's patterns -> their stats (repeats skip the defaultdict lookup)
+    in_sentence: Dict[str, PatternStats] = {}
+
+    # PatternStats.observe_occurrence / observe_sentence, inlined: this runs per pattern occurrence.
+    # distinct_sentence_count is bumped on a key's first occurrence in the sentence.
     for key, realization in patterns:
-      st = self.patterns[key]
-      st.observe_occurrence(realization)
-      seen_in_sentence.add(key)
-
-    for key in seen_in_sentence:
-      self.patterns[key].observe_sentence()
+      if frozen and key in frozen:
+        continue
+      st = in_sentence.get(key)
+      if st is None:
+        st = in_sentence[key] = stats[key]
+        st.distinct_sentence_count += 1
+      st.count_seen += 1
+      if realization and cap != 0:
+        reals = st.realizations
+        if reals is None:
+          st.realizations = {realization}
+        elif cap is None or len(reals) < cap:
+          reals.add(realization)
+
+    if not self.track_after_emergence:
+      min_count_seen = self.min_count_seen
+      min_distinct = self.min_distinct_sentence_count
+      for key, st in in_sentence.items():
+        if st.emerged(min_count_seen, min_distinct):
+          frozen.add(key)
 
   def is_emerged(self, pattern_key: str) -> bool:
     st = self.patterns.get(pattern_key)
@@ -19,63 +19,126 @@ How it fits:
 from __future__ import annotations
 
 import re
+from sys import intern
 from typing import List
 
 import jieba
 
+# Segmenter backing tokenize_words_jieba; use_jieba_fast() / use_rjieba() can swap in a compiled build.
+_jieba = jieba
+
 # Common punctuation + whitespace (single chars and sequences)
 _PUNCT_RE = re.compile(
   r"[，。！？、；：…（）()“”\"'《》【】\[\]{}<>·—\-、\s"
   r",.!?;:]+"
 )
 
+# The same class as single chars, for per-char checks without entering the regex engine
+# (\s is covered by str.isspace, which is what the regex uses for it).
+_PUNCT_CHARS = frozenset("，。！？、；：…（）()“”\"'《》【】[]{}<>·—-、,.!?;:")
+
 def _is_keep_char(ch: str) -> bool:
-  o = ord(ch)
-  if 0x4E00 <= o <= 0x9FFF:  # CJK Unified Ideographs
-    return True
-  if ch.isdigit():
-    return True
-  return False
+  # CJK Unified Ideographs (U+4E00..U+9FFF) or any Unicode digit; single chars compare by code point
+  return "\u4e00" <= ch <= "\u9fff" or ch.isdigit()
 
 def normalize_zh(text: str) -> str:
   text = (text or "").strip()
   text = re.sub(r"\s+", " ", text)
   return text
 
+def use_jieba_fast() -> bool:
+  """
+  Segment with jieba_fast (Cython rewrite of jieba, same algorithm) if installed.
+  Returns True if it is now active. Call before forking worker processes.
+  """
+  global _jieba
+  try:
+    import jieba_fast  # type: ignore
+  except Exception:
+    return False
+  _jieba = jieba_fast
+  return True
+
+class _RJiebaShim:
+  """rjieba behind the two jieba calls used here (cut(text, cut_all=...), initialize())."""
+
+  def __init__(self, mod) -> None:
+    self._mod = mod
+
+  def cut(self, text: str, cut_all: bool = False) -> List[str]:
+    return self._mod.cut_all(text) if cut_all else self._mod.cut(text)
+
+  def initialize(self) -> None:
+    pass  # rjieba loads its dictionary at import
+
+def use_rjieba() -> bool:
+  """
+  Segment with rjieba (Rust jieba-rs bindings: same dictionary, DAG + HMM algorithm) if installed.
+  Returns True if it is now active. Call before forking worker processes.
+  """
+  global _jieba
+  try:
+    import rjieba  # type: ignore
+  except Exception:
+    return False
+  _jieba = _RJiebaShim(rjieba)
+  return True
+
+def use_jieba_backend(name: str) -> bool:
+  """
+  Activate a segmenter by the name bootstrap records in meta ("jieba", "jieba_fast", "rjieba").
+  The choice is a module global, so pool initializers call this: spawned workers re-import
+  this module and would otherwise segment with plain jieba.
+  """
+  global _jieba
+  if name == "rjieba":
+    return use_rjieba()
+  if name == "jieba_fast":
+    return use_jieba_fast()
+  if name == "jieba":
+    _jieba = jieba
+    return True
+  raise ValueError(f"Unknown jieba backend: {name!r}")
+
+def warm_up_jieba() -> None:
+  """Load the active segmenter's dictionary now, e.g. before forking workers so they inherit it."""
+  _jieba.initialize()
+
 def tokenize_words_jieba(text: str) -> List[str]:
   text = normalize_zh(text)
-  tokens = [t.strip() for t in jieba.cut(text, cut_all=False)]
-  return [t for t in tokens if t and not _PUNCT_RE.fullmatch(t)]
+  punct = _PUNCT_CHARS
+  fullmatch = _PUNCT_RE.fullmatch
+  out: List[str] = []
+  for t in _jieba.cut(text, cut_all=False):
+    t = t.strip()
+    # A stripped token can only be a punctuation run if its first char is punctuation;
+    # the regex is left for multi-char runs.
+    if not t or (t[0] in punct and (len(t) == 1 or fullmatch(t))):
+      continue
+    # Interned: repeated tokens share one object (cheaper dict/set hits, pickled once per worker chunk)
+    out.append(intern(t))
+  return out
 
 def tokenize_chars(text: str) -> List[str]:
-  text = normalize_zh(text)
-  text = _PUNCT_RE.sub("", text)
-  return [ch for ch in text if _is_keep_char(ch)]
+  # Punctuation and whitespace are never keep chars, so filtering alone is enough
+  # (same result as normalize_zh + _PUNCT_RE.sub first).
+  # _is_keep_char inlined: this runs once per char of every sentence.
+  return [ch for ch in (text or "") if "\u4e00" <= ch <= "\u9fff" or ch.isdigit()]
+
+def _is_punct_char(ch: str) -> bool:
+  return ch in _PUNCT_CHARS or ch.isspace()
 
 def tokenize_words_hsk_first(text: str, lexicon) -> List[str]:
   """
   Longest-match segmentation using the HSK trie.
   Non-matching characters become single-character tokens (if kept), punctuation is skipped.
   """
-  text = normalize_zh(text)
-  tokens: List[str] = []
-  i = 0
-  while i < len(text):
-    ch = text[i]
-
-    if _PUNCT_RE.fullmatch(ch):
-      i += 1
-      continue
-
-    m = lexicon.longest_match(text, i)
-    if m is not None:
-      w, j = m
-      tokens.append(w)
-      i = j
-      continue
+  return lexicon.segment(normalize_zh(text), _is_punct_char, _is_keep_char)
 
-    if _is_keep_char(ch):
-      tokens.append(ch)
-    i += 1
+def warm_up_hsk(lexicon) -> None:
+  """Build the lexicon's segmentation links now, e.g. before forking workers so they inherit them."""
+  lexicon.segment("", _is_punct_char, _is_keep_char)
 
-  return tokens
+def tokenize_words_hsk_first_many(texts: List[str], lexicon) -> List[List[str]]:
+  """tokenize_words_hsk_first for a batch (one compiled call when numba is installed)."""
+  return lexicon.segment_many([normalize_zh(t) for t in texts], _is_punct_char, _is_keep_char)
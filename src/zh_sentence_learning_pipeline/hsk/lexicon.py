@@ -7,6 +7,10 @@ Load an HSK vocabulary lexicon from an SQLite database and provide:
 
 1) Fast lookup: word -> metadata
 2) Fast segmentation primitive: Trie-based "longest match" from any index in a string
+3) Whole-string greedy longest-match segmentation in a single left-to-right pass
+   (LinMaxMatch: the trie plus precomputed failure links, no re-scanning)
+4) Batch segmentation of many strings in one compiled call when numba is installed
+5) Optional pickle cache next to the DB (from_sqlite(cache=True)) so later loads skip SQL + trie building
 
 New in this version
 -------------------
@@ -23,9 +27,24 @@ How it's used in the project
 from __future__ import annotations
 
 import os
+import pickle
 import sqlite3
 from dataclasses import dataclass
-from typing import Dict, Optional, Tuple, Iterable, Set
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Iterable, Set
+
+try:
+    import numba  # type: ignore
+    import numpy as np
+except Exception:  # optional JIT for segment_many; the per-string segment() loop is the fallback
+    numba = None
+
+# Skip/keep rules are tabulated per code point for the kernel; chars above this fall back to segment().
+_RULE_TABLE_SIZE = 0x10000
+_RULE_SKIP = 1
+_RULE_KEEP = 2
+
+# Bump when the cached layout (entries + flat trie tables) changes.
+_CACHE_VERSION = 1
 
 
 @dataclass(frozen=True)
@@ -39,6 +58,74 @@ class HSKEntry:
     pos: Optional[str] = None
 
 
+def _child(edge_start, edge_cp, edge_to, node, cp):
+    # Binary search of node's children (edge_cp is sorted within each node's range); -1 if none.
+    lo = edge_start[node]
+    end = edge_start[node + 1]
+    hi = end
+    while lo < hi:
+        mid = (lo + hi) >> 1
+        if edge_cp[mid] < cp:
+            lo = mid + 1
+        else:
+            hi = mid
+    if lo < end and edge_cp[lo] == cp:
+        return edge_to[lo]
+    return -1
+
+
+def _segment_kernel(cps, offsets, edge_start, edge_cp, edge_to, fail, emit_start, emit_tok, rules, out, counts):
+    # cps: code points of all strings back to back; string s is cps[offsets[s]:offsets[s+1]].
+    # Same walk as HSKLexicon.segment(). Tokens go to out as node ids (words) or -(cp + 1)
+    # (single-char fallback); counts[s] is the number of tokens of string s, or -1 if it
+    # hit a char outside the rule table at the root (caller segments that string itself).
+    n = 0
+    for s in range(len(offsets) - 1):
+        start = n
+        node = 0
+        ok = True
+        for i in range(offsets[s], offsets[s + 1]):
+            cp = cps[i]
+            while node:
+                nxt = _child(edge_start, edge_cp, edge_to, node, cp)
+                if nxt >= 0:
+                    node = nxt
+                    break
+                for k in range(emit_start[node], emit_start[node + 1]):
+                    out[n] = emit_tok[k]
+                    n += 1
+                node = fail[node]
+            else:
+                if cp >= len(rules):
+                    ok = False
+                    break
+                r = rules[cp]
+                if r & 1:  # _RULE_SKIP
+                    continue
+                nxt = _child(edge_start, edge_cp, edge_to, 0, cp)
+                if nxt >= 0:
+                    node = nxt
+                elif r & 2:  # _RULE_KEEP
+                    out[n] = -cp - 1
+                    n += 1
+        if not ok:
+            n = start
+            counts[s] = -1
+            continue
+        while node:
+            for k in range(emit_start[node], emit_start[node + 1]):
+                out[n] = emit_tok[k]
+                n += 1
+            node = fail[node]
+        counts[s] = n - start
+    return n
+
+
+if numba is not None:
+    _child = numba.njit(cache=True)(_child)
+    _segment_kernel = numba.njit(cache=True)(_segment_kernel)
+
+
 class TrieNode:
     __slots__ = ("children", "terminal_word")
     def __init__(self) -> None:
@@ -51,12 +138,61 @@ class HSKLexicon:
     Holds:
     - entries: word -> HSKEntry
     - trie: for longest-match segmentation
+
+    The matchers never walk `trie` itself: it is flattened once into parallel
+    lists indexed by node id (root = 0), so a step is a list index plus one
+    dict lookup instead of attribute access on a node object.
+    - _kids[n]: char -> child node id
+    - _terminal[n]: word ending at node n, or None
+    - _fail[n] / _emits[n]: LinMaxMatch links for segment(), see _build_links()
+    With numba, _build_links() also packs these into integer arrays for
+    _segment_kernel (children as sorted code point ranges per node).
     """
 
     def __init__(self, entries: Dict[str, HSKEntry]) -> None:
         self.entries = entries
-        self.trie = TrieNode()
+        self._trie: Optional[TrieNode] = TrieNode()
         self._build_trie(entries.keys())
+        self._kids: List[Dict[str, int]] = []
+        self._terminal: List[Optional[str]] = []
+        self._flatten_trie()
+        self._init_chars()
+        self._reset_links()
+
+    def _init_chars(self) -> None:
+        # Canonical str objects for single-char tokens (one-char words reuse their entries key), so
+        # repeated chars share one object, like trie matches do (and pickle once per batch to the parent).
+        self._chars: Dict[str, str] = {w: w for w in self.entries if len(w) == 1}
+
+    def _reset_links(self) -> None:
+        self._fail: List[int] = []
+        self._emits: List[Tuple[str, ...]] = []
+        self._kernel_tables: Optional[tuple] = None
+        self._link_rules: Optional[Tuple[Callable[[str], bool], Callable[[str], bool]]] = None
+
+    @classmethod
+    def _from_flat(
+        cls,
+        entries: Dict[str, HSKEntry],
+        kids: List[Dict[str, int]],
+        terminal: List[Optional[str]],
+    ) -> "HSKLexicon":
+        """Rebuild from cached flat tables; the node-object trie is only built if `trie` is read."""
+        lex = cls.__new__(cls)
+        lex.entries = entries
+        lex._trie = None
+        lex._kids = kids
+        lex._terminal = terminal
+        lex._init_chars()
+        lex._reset_links()
+        return lex
+
+    @property
+    def trie(self) -> TrieNode:
+        if self._trie is None:
+            self._trie = TrieNode()
+            self._build_trie(self.entries.keys())
+        return self._trie
 
     @staticmethod
     def _table_columns(conn: sqlite3.Connection, table: str) -> Set[str]:
@@ -70,12 +206,24 @@ class HSKLexicon:
         max_level: int = 6,
         include_level7: bool = False,
         table: str = "chinese_words",
+        cache: bool = False,
     ) -> "HSKLexicon":
+        """
+        cache=True keeps the loaded entries + flat trie in `<db_path>.lex.pkl` and reuses it
+        while the DB file (mtime, size) and the level/table arguments are unchanged.
+        """
         if not os.path.exists(db_path):
             raise FileNotFoundError(f"HSK DB not found: {db_path}")
 
+        cache_path = f"{db_path}.lex.pkl"
+        st = os.stat(db_path)
+        cache_key = (_CACHE_VERSION, st.st_mtime_ns, st.st_size, max_level, include_level7, table)
+        if cache:
+            cached = cls._load_cache(cache_path, cache_key)
+            if cached is not None:
+                return cached
+
         conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
         try:
             cols = cls._table_columns(conn, table)
 
@@ -103,19 +251,23 @@ class HSKLexicon:
         finally:
             conn.close()
 
+        # Plain tuples in `wanted` order; optional columns resolved once, not per row
+        i_trad = wanted.index("traditional") if "traditional" in wanted else None
+        i_pos = wanted.index("pos") if "pos" in wanted else None
+
         entries: Dict[str, HSKEntry] = {}
         for r in rows:
-            w = (r["simplified"] or "").strip()
+            w = (r[0] or "").strip()
             if not w:
                 continue
 
-            lvl = int(r["level"]) if r["level"] is not None else 999
+            lvl = int(r[1]) if r[1] is not None else 999
 
-            freq = int(r["frequency"]) if ("frequency" in r.keys() and r["frequency"] is not None) else None
-            pinyin = r["pinyin"] if "pinyin" in r.keys() else None
-            meanings = r["meanings"] if "meanings" in r.keys() else None
-            trad = r["traditional"] if "traditional" in r.keys() else None
-            pos = r["pos"] if "pos" in r.keys() else None
+            freq = int(r[2]) if r[2] is not None else None
+            pinyin = r[3]
+            meanings = r[4]
+            trad = r[i_trad] if i_trad is not None else None
+            pos = r[i_pos] if i_pos is not None else None
 
             cand = HSKEntry(w, lvl, freq, pinyin, meanings, traditional=trad, pos=pos)
 
@@ -130,7 +282,34 @@ class HSKLexicon:
             else:
                 entries[w] = cand
 
-        return cls(entries)
+        lex = cls(entries)
+        if cache:
+            lex._save_cache(cache_path, cache_key)
+        return lex
+
+    @classmethod
+    def _load_cache(cls, cache_path: str, cache_key: tuple) -> Optional["HSKLexicon"]:
+        try:
+            with open(cache_path, "rb") as f:
+                key, entries, kids, terminal = pickle.load(f)
+        except Exception:  # missing, truncated or from an incompatible version: rebuild
+            return None
+        if key != cache_key:
+            return None
+        return cls._from_flat(entries, kids, terminal)
+
+    def _save_cache(self, cache_path: str, cache_key: tuple) -> None:
+        # Write-then-rename so a concurrent reader never sees a partial file.
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump((cache_key, self.entries, self._kids, self._terminal), f, protocol=5)
+            os.replace(tmp_path, cache_path)
+        except OSError:  # read-only location etc.; the cache is only an optimization
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
 
     def _build_trie(self, words: Iterable[str]) -> None:
         """
@@ -147,34 +326,217 @@ class HSKLexicon:
                └─ '生' (terminal_word="学生")
         """
         for w in words:
-            node = self.trie
+            node = self._trie
             for ch in w:
                 node = node.children.setdefault(ch, TrieNode())
             node.terminal_word = w
 
+    def _flatten_trie(self) -> None:
+        """Number the trie nodes in BFS order (root = 0) and fill _kids/_terminal."""
+        order = [self.trie]
+        ids = {id(order[0]): 0}
+        for node in order:
+            for child in node.children.values():
+                ids[id(child)] = len(order)
+                order.append(child)
+        self._kids = [{ch: ids[id(c)] for ch, c in node.children.items()} for node in order]
+        self._terminal = [node.terminal_word for node in order]
+
     def longest_match(self, text: str, start: int) -> Optional[Tuple[str, int]]:
         """
         Returns (word, end_index) for the longest word match starting at `start`, or None.
         end_index is exclusive.
         """
-        node = self.trie
+        kids = self._kids
+        terminal = self._terminal
+        node = 0
         best_word: Optional[str] = None
         best_end = start
 
         i = start
-        while i < len(text):
-            ch = text[i]
-            if ch not in node.children:
+        n = len(text)
+        while i < n:
+            nxt = kids[node].get(text[i])
+            if nxt is None:
                 break
-            node = node.children[ch]
+            node = nxt
             i += 1
-            if node.terminal_word is not None:
-                best_word = node.terminal_word
+            if terminal[node] is not None:
+                best_word = terminal[node]
                 best_end = i
 
         if best_word is None:
             return None
         return best_word, best_end
 
+    def _build_links(self, skip: Callable[[str], bool], keep: Callable[[str], bool]) -> None:
+        """
+        Precompute LinMaxMatch failure links for segment().
+
+        Every non-root node v spells a string s (its path from the root). If the
+        next character has no child at v, greedy longest-match would cut tokens
+        off the front of s until what is left is again "mid-match" (a trie path
+        not starting with a skipped char). Those tokens are _emits[v] and the
+        node for the remainder is _fail[v] (the root if nothing is left).
+
+        The cut follows the same rules as segment(): skipped chars are dropped,
+        otherwise the longest word wins, otherwise a single char is emitted if
+        keep(ch). The links therefore depend on (skip, keep) and are rebuilt if
+        segment() is called with different rules.
+        """
+        kids = self._kids
+        chars = self._chars
+        fail = [0] * len(kids)
+        emits: List[Tuple[str, ...]] = [()] * len(kids)
+        stack: List[Tuple[int, str]] = [(c, ch) for ch, c in kids[0].items()]
+        while stack:
+            v, s = stack.pop()
+            stack.extend((c, s + ch) for ch, c in kids[v].items())
+
+            out: List[str] = []
+            p = 0
+            while p < len(s):
+                ch = s[p]
+                if p > 0 and not skip(ch):
+                    rest: Optional[int] = 0
+                    for c in s[p:]:
+                        rest = kids[rest].get(c)
+                        if rest is None:
+                            break
+                    if rest is not None:
+                        fail[v] = rest
+                        break
+                if skip(ch):
+                    p += 1
+                    continue
+                m = self.longest_match(s, p)
+                if m is not None:
+                    out.append(m[0])
+                    p = m[1]
+                    continue
+                if keep(ch):
+                    out.append(chars.setdefault(ch, ch))
+                p += 1
+            emits[v] = tuple(out)
+
+        self._fail = fail
+        self._emits = emits
+        self._link_rules = (skip, keep)
+        if numba is not None:
+            self._kernel_tables = self._pack_kernel_tables(skip, keep)
+
+    def _pack_kernel_tables(self, skip: Callable[[str], bool], keep: Callable[[str], bool]) -> tuple:
+        node_of = {w: n for n, w in enumerate(self._terminal) if w is not None}
+        edge_start = [0]
+        edge_cp: List[int] = []
+        edge_to: List[int] = []
+        for kids in self._kids:
+            for cp, c in sorted((ord(ch), c) for ch, c in kids.items()):
+                edge_cp.append(cp)
+                edge_to.append(c)
+            edge_start.append(len(edge_cp))
+        emit_start = [0]
+        emit_tok: List[int] = []
+        for toks in self._emits:
+            emit_tok.extend(node_of[t] if t in node_of else -ord(t) - 1 for t in toks)
+            emit_start.append(len(emit_tok))
+        rules = bytes(
+            (_RULE_SKIP if skip(ch) else 0) | (_RULE_KEEP if keep(ch) else 0)
+            for ch in map(chr, range(_RULE_TABLE_SIZE))
+        )
+        return (
+            np.array(edge_start, dtype=np.int64),
+            np.array(edge_cp, dtype=np.int64),
+            np.array(edge_to, dtype=np.int64),
+            np.array(self._fail, dtype=np.int64),
+            np.array(emit_start, dtype=np.int64),
+            np.array(emit_tok, dtype=np.int64),
+            np.frombuffer(rules, dtype=np.uint8),
+        )
+
+    def segment(
+        self,
+        text: str,
+        skip: Callable[[str], bool],
+        keep: Callable[[str], bool],
+    ) -> List[str]:
+        """
+        Greedy longest-match segmentation of the whole string, equivalent to
+        calling longest_match() at every position but in one pass: each char is
+        read once and a mismatch follows precomputed failure links instead of
+        moving back to re-scan.
+
+        Chars where skip(ch) holds are dropped (unless inside a word match);
+        chars that start no word become single-char tokens if keep(ch).
+        """
+        if self._link_rules != (skip, keep):
+            self._build_links(skip, keep)
+
+        kids = self._kids
+        root_kids = kids[0]
+        fail = self._fail
+        emits = self._emits
+        chars = self._chars
+        tokens: List[str] = []
+        node = 0
+        for ch in text:
+            while node:
+                nxt = kids[node].get(ch)
+                if nxt is not None:
+                    node = nxt
+                    break
+                tokens.extend(emits[node])
+                node = fail[node]
+            else:
+                if skip(ch):
+                    continue
+                nxt = root_kids.get(ch)
+                if nxt is not None:
+                    node = nxt
+                elif keep(ch):
+                    tokens.append(chars.setdefault(ch, ch))
+
+        while node:
+            tokens.extend(emits[node])
+            node = fail[node]
+        return tokens
+
+    def segment_many(
+        self,
+        texts: Sequence[str],
+        skip: Callable[[str], bool],
+        keep: Callable[[str], bool],
+    ) -> List[List[str]]:
+        """
+        segment() for each string. With numba the whole batch is one call into
+        _segment_kernel, so the per-char loop runs compiled and the Python cost
+        is only encoding the batch and mapping token ids back to strings.
+        """
+        if self._link_rules != (skip, keep):
+            self._build_links(skip, keep)
+        if self._kernel_tables is None or not texts:
+            return [self.segment(t, skip, keep) for t in texts]
+
+        # int64 so the kernel can negate code points without unsigned wraparound
+        cps = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum([len(t) for t in texts], out=offsets[1:])
+        out = np.empty(len(cps), dtype=np.int64)  # every token consumes at least one char
+        counts = np.empty(len(texts), dtype=np.int64)
+        n = _segment_kernel(cps, offsets, *self._kernel_tables, out, counts)
+
+        terminal = self._terminal
+        chars = self._chars
+        flat = [terminal[t] if t >= 0 else chars.setdefault(c := chr(-t - 1), c) for t in out[:n].tolist()]
+        result: List[List[str]] = []
+        p = 0
+        for text, c in zip(texts, counts.tolist()):
+            if c < 0:
+                result.append(self.segment(text, skip, keep))
+                continue
+            result.append(flat[p:p + c])
+            p += c
+        return result
+
     def meta(self, word: str) -> Optional[HSKEntry]:
         return self.entries.get(word)
\ No newline at end of file
@@ -7,7 +7,7 @@ What this file does:
 
 How it fits:
 - Bootstrapper initializes the DB and writes:
-  - sentences (jieba tokens + HSK tokens + char tokens + patterns + skeleton)
+  - sentences (jieba tokens + HSK tokens + patterns + skeleton; char tokens are recomputed from zh_text)
   - vocab_stats (based on HSK tokens)
   - pattern_personal_stats + realizations (grammar Layer B+C)
   - meta (schema version + config + timestamps)
@@ -37,7 +37,7 @@ CREATE TABLE IF NOT EXISTS sentences (
   zh_text TEXT NOT NULL,
   tokens_jieba_json TEXT NOT NULL,
   tokens_hsk_json TEXT NOT NULL,
-  tokens_char_json TEXT NOT NULL,
+  tokens_char_json TEXT,  -- NULL: recompute with tokenize_chars(zh_text)
   patterns_json TEXT NOT NULL,
   skeleton TEXT,
   source TEXT NOT NULL,
@@ -57,6 +57,9 @@ CREATE TABLE IF NOT EXISTS vocab_stats (
   hsk_frequency INTEGER
 );
 
+-- Covers "top words at HSK level L by count" (index-only scan, stops at LIMIT)
+CREATE INDEX IF NOT EXISTS idx_vocab_queue ON vocab_stats(hsk_level, count DESC, word);
+
 CREATE TABLE IF NOT EXISTS pattern_personal_stats (
   pattern_key TEXT PRIMARY KEY,
   family TEXT NOT NULL,
@@ -67,12 +70,16 @@ CREATE TABLE IF NOT EXISTS pattern_personal_stats (
 );
 
 CREATE INDEX IF NOT EXISTS idx_pattern_personal_family ON pattern_personal_stats(family);
+-- Covers the inspector's "top emerged patterns" query (index scan, stops at LIMIT)
+CREATE INDEX IF NOT EXISTS idx_pattern_personal_counts
+  ON pattern_personal_stats(emerged, count_seen DESC, distinct_sentence_count DESC, pattern_key);
 
+-- WITHOUT ROWID: the (pattern_key, realization) PK b-tree is the table (no rowid table + autoindex copy)
 CREATE TABLE IF NOT EXISTS pattern_personal_realizations (
   pattern_key TEXT NOT NULL,
   realization TEXT NOT NULL,
   PRIMARY KEY (pattern_key, realization)
-);
+) WITHOUT ROWID;
 
 CREATE TABLE IF NOT EXISTS runs (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -86,11 +93,48 @@ CREATE TABLE IF NOT EXISTS runs (
 CREATE INDEX IF NOT EXISTS idx_runs_kind ON runs(kind);
 """
 
+# Single-writer bootstrap: WAL + NORMAL sync only syncs at checkpoints; a bigger page cache keeps the
+# sentences / stats b-trees hot during the batched inserts.
+BULK_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-65536;
+"""
+
 def connect(db_path: str | Path) -> sqlite3.Connection:
   conn = sqlite3.connect(str(db_path))
   conn.row_factory = sqlite3.Row
   return conn
 
+def connect_staged(db_path: str | Path) -> tuple[sqlite3.Connection, sqlite3.Connection]:
+  """
+  (mem, disk): an in-memory working copy of db_path, preloaded with its current contents
+  (so incremental runs keep existing rows). Write it back with write_back_staged().
+  """
+  disk = connect(db_path)
+  mem = connect(":memory:")
+  disk.backup(mem)
+  return mem, disk
+
+def write_back_staged(mem: sqlite3.Connection, disk: sqlite3.Connection) -> None:
+  """Copy the committed in-memory DB over the disk file page by page, restore WAL, close disk."""
+  mem.commit()
+  mem.backup(disk)
+  disk.execute("PRAGMA journal_mode=WAL")
+  disk.close()
+
+def tune_for_bulk_write(conn: sqlite3.Connection) -> None:
+  """Apply bulk-insert PRAGMAs. Call before any transaction is open."""
+  conn.executescript(BULK_PRAGMAS)
+
+def char_tokens_required(conn: sqlite3.Connection) -> bool:
+  """True if sentences.tokens_char_json is still NOT NULL (table created by an older schema)."""
+  for r in conn.execute("PRAGMA table_info(sentences)"):
+    if r[1] == "tokens_char_json":
+      return bool(r[3])
+  return False
+
 def init_db(conn: sqlite3.Connection) -> None:
   conn.executescript(DDL)
   conn.execute(
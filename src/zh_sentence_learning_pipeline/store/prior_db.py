@@ -8,27 +8,32 @@ This DB is built from a huge corpus (e.g., 1M sentences) and stores:
 - pattern_global_realizations: example realizations per pattern (capped)
 
 This DB is NOT learner-specific.
+
+Rows are keyed by pkey_hash (signed 64-bit BLAKE2b of pattern_key, see
+pattern_key_hash) so the b-trees hold integers. pattern_key itself is stored
+once, in pattern_global_stats (with a UNIQUE index for lookups by key);
+realizations carry only pkey_hash, so readers look them up (or join) on
+pattern_key_hash(key). init_prior_db upgrades a v2 file (tables keyed by
+pattern_key TEXT) to this layout in place.
 """
 
 from __future__ import annotations
 
+import hashlib
 import sqlite3
 from pathlib import Path
 
-PRIOR_SCHEMA_VERSION = 2
-
-DDL = """
-PRAGMA journal_mode=WAL;
-PRAGMA synchronous=NORMAL;
-PRAGMA temp_store=MEMORY;
+PRIOR_SCHEMA_VERSION = 3
 
+TABLES_DDL = """
 CREATE TABLE IF NOT EXISTS meta (
   key   TEXT PRIMARY KEY,
   value TEXT NOT NULL
 );
 
 CREATE TABLE IF NOT EXISTS pattern_global_stats (
-  pattern_key TEXT PRIMARY KEY,
+  pkey_hash INTEGER PRIMARY KEY,
+  pattern_key TEXT NOT NULL,
   family TEXT NOT NULL,
   count_sentences INTEGER NOT NULL,
   count_occurrences INTEGER NOT NULL,
@@ -36,26 +41,140 @@ CREATE TABLE IF NOT EXISTS pattern_global_stats (
   p_global REAL NOT NULL
 );
 
+-- WITHOUT ROWID: rows live in the (pkey_hash, realization) PK b-tree itself
 CREATE TABLE IF NOT EXISTS pattern_global_realizations (
-  pattern_key   TEXT NOT NULL,
+  pkey_hash    INTEGER NOT NULL,
   realization  TEXT NOT NULL,
-  PRIMARY KEY (pattern_key, realization)
-);
+  PRIMARY KEY (pkey_hash, realization)
+) WITHOUT ROWID;
+"""
+
+# page_size only takes effect on a new, empty file, so it must precede the switch to WAL
+# (here and in BULK_PRAGMAS).
+DDL = """
+PRAGMA page_size=8192;
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+""" + TABLES_DDL
 
+# Secondary indexes (not needed by the build's UPSERTs); bulk builds create them last.
+# (A pkey_hash collision never reaches the UNIQUE pattern_key index: the build's UPSERT leaves
+# the existing row alone and build_prior_db raises.)
+INDEX_DDL = """
 CREATE INDEX IF NOT EXISTS idx_pgs_count_sentences ON pattern_global_stats(count_sentences);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_pgs_pattern_key ON pattern_global_stats(pattern_key);
+"""
+SECONDARY_INDEXES = ("idx_pgs_count_sentences", "idx_pgs_pattern_key")
+
+
+# Single-writer bulk build: larger page cache + mmap keep the stats b-tree hot.
+BULK_PRAGMAS = """
+PRAGMA page_size=8192;
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-262144;
+PRAGMA mmap_size=268435456;
+"""
+
+# The prior is read far more than it is written: serve reads straight from the OS page cache.
+MMAP_SIZE = 1 << 30
+
+# Lookups against a finished prior DB.
+READ_PRAGMAS = f"""
+PRAGMA query_only=ON;
+PRAGMA temp_store=MEMORY;
+PRAGMA mmap_size={MMAP_SIZE};
 """
 
 
+def pattern_key_hash(pattern_key: str) -> int:
+  """Stable signed 64-bit id for a pattern_key (fits SQLite INTEGER)."""
+  digest = hashlib.blake2b(pattern_key.encode("utf-8"), digest_size=8).digest()
+  return int.from_bytes(digest, "little", signed=True)
+
+
 def connect(db_path: str | Path) -> sqlite3.Connection:
   conn = sqlite3.connect(str(db_path))
   conn.row_factory = sqlite3.Row
+  conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
   return conn
 
 
-def init_prior_db(conn: sqlite3.Connection) -> None:
+def connect_ro(db_path: str | Path) -> sqlite3.Connection:
+  """Read-only connection (mode=ro) for consumers of a built prior DB."""
+  uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+  conn = sqlite3.connect(uri, uri=True)
+  conn.row_factory = sqlite3.Row
+  conn.executescript(READ_PRAGMAS)
+  return conn
+
+
+# v2 -> v3: rows re-keyed by pkey_hash (pattern_key_hash is registered as a SQL function); stats
+# gain the pkey_hash column, realizations swap pattern_key for it.
+MIGRATE_V2_SQL = """
+ALTER TABLE pattern_global_stats RENAME TO pattern_global_stats_v2;
+ALTER TABLE pattern_global_realizations RENAME TO pattern_global_realizations_v2;
+""" + TABLES_DDL + """
+INSERT INTO pattern_global_stats(
+  pkey_hash, pattern_key, family, count_sentences, count_occurrences, distinct_realization_count, p_global
+)
+SELECT pattern_key_hash(pattern_key), pattern_key, family, count_sentences, count_occurrences,
+       distinct_realization_count, p_global
+FROM pattern_global_stats_v2;
+INSERT INTO pattern_global_realizations(pkey_hash, realization)
+SELECT pattern_key_hash(pattern_key), realization FROM pattern_global_realizations_v2;
+DROP TABLE pattern_global_stats_v2;
+DROP TABLE pattern_global_realizations_v2;
+"""
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> list[str]:
+  return [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _migrate_old_schema(conn: sqlite3.Connection) -> None:
+  """
+  Bring an existing prior DB from before pkey_hash keying (v2: pattern_key TEXT PRIMARY KEY)
+  up to the current layout in place, so an incremental build never writes into the old tables.
+  Older layouts (pattern_id-keyed) cannot be mapped and raise.
+  """
+  cols = _table_columns(conn, "pattern_global_stats")
+  if not cols or "pkey_hash" in cols:
+    return
+  real_cols = _table_columns(conn, "pattern_global_realizations")
+  if "pattern_key" not in cols or not {"pattern_key", "realization"} <= set(real_cols):
+    raise ValueError(f"Unsupported prior DB layout (pattern_global_stats columns: {cols}); rebuild it.")
+  conn.create_function("pattern_key_hash", 1, pattern_key_hash, deterministic=True)
+  # Index names travel with a renamed table; drop them so the new tables get their own.
+  drops = "".join(f"DROP INDEX IF EXISTS {name};" for name in SECONDARY_INDEXES)
+  conn.executescript("BEGIN;" + drops + MIGRATE_V2_SQL + "COMMIT;")
+
+
+def init_prior_db(conn: sqlite3.Connection, create_indexes: bool = True) -> None:
+  _migrate_old_schema(conn)
   conn.executescript(DDL)
+  if create_indexes:
+    conn.executescript(INDEX_DDL)
   conn.execute(
     "INSERT OR REPLACE INTO meta(key,value) VALUES(?,?)",
     ("prior_schema_version", str(PRIOR_SCHEMA_VERSION)),
   )
   conn.commit()
+
+
+def tune_for_bulk_build(conn: sqlite3.Connection, exclusive: bool = False) -> None:
+  """
+  Apply bulk-import PRAGMAs. Call before any transaction is open.
+  exclusive=True also takes an exclusive lock for the connection's lifetime
+  (no concurrent readers).
+  """
+  if exclusive:
+    conn.execute("PRAGMA locking_mode=EXCLUSIVE")
+  conn.executescript(BULK_PRAGMAS)
+
+
+def drop_secondary_indexes(conn: sqlite3.Connection) -> None:
+  for name in SECONDARY_INDEXES:
+    conn.execute(f"DROP INDEX IF EXISTS {name}")
@@ -18,13 +18,19 @@ def read_csv_column(path: str | Path, column: str) -> list[str]:
     path = Path(path)
     out: list[str] = []
     with path.open("r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        if reader.fieldnames is None:
+        # Plain csv.reader + one column index: no dict built per row (same values as DictReader)
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
             raise ValueError("CSV has no header row (no fieldnames).")
-        if column not in reader.fieldnames:
-            raise ValueError(f"Column '{column}' not found. Available: {reader.fieldnames}")
+        if column not in header:
+            raise ValueError(f"Column '{column}' not found. Available: {header}")
+        # DictReader keeps the last of duplicated header names
+        idx = len(header) - 1 - header[::-1].index(column)
+        append = out.append
         for row in reader:
-            txt = (row.get(column) or "").strip()
-            if txt:
-                out.append(txt)
+            if idx < len(row):
+                txt = row[idx].strip()
+                if txt:
+                    append(txt)
     return out
@@ -14,6 +14,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from collections import Counter
+from itertools import chain
 import math
 from typing import Iterable
 
@@ -29,7 +30,6 @@ class VocabItem:
 
 
 def count_vocab(token_lists: Iterable[list[str]]) -> Counter[str]:
-  c: Counter[str] = Counter()
-  for toks in token_lists:
-    c.update(toks)
-  return c
+  """Token counts over all lists (consumes token_lists if it is an iterator)."""
+  # One Counter pass over the flattened stream: the counting loop stays in C
+  return Counter(chain.from_iterable(token_lists))